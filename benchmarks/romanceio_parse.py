@@ -0,0 +1,75 @@
+"""
+Compares the two ways of finding the first result link on a romance.io search page:
+the old full BeautifulSoup tree (soup.find("a", class_="book-link")) and the
+streaming find_book_link() used by the bot, reporting CPU time and peak memory
+per lookup.
+
+Usage (from the bot folder):
+    python benchmarks/romanceio_parse.py [page.html ...] [--runs N]
+
+Without page arguments every .html file in benchmarks/samples/ is used. Save a
+real search page from your browser ("Save page as", HTML only) into that folder
+to benchmark against current romance.io markup.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from rich.console import Console
+from rich.table import Table
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)  # the handlers log to ./logs
+from handlers.web_search.romanceio_handler import find_book_link
+
+console = Console()
+
+def soup_book_link(html):
+    book_link = BeautifulSoup(html, "html.parser").find("a", class_="book-link")
+    return book_link.get("href") if book_link else None
+
+def measure(func, html, runs):
+    """Returns (result, CPU ms per lookup, peak KiB allocated during one lookup)."""
+    result = func(html)
+    started = time.process_time()
+    for _ in range(runs):
+        func(html)
+    cpu_ms = (time.process_time() - started) * 1000 / runs
+    tracemalloc.start()
+    func(html)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, cpu_ms, peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pages', nargs='*', help="saved romance.io search pages (default: benchmarks/samples/*.html)")
+    parser.add_argument('--runs', type=int, default=50, help="lookups per page and parser (default: 50)")
+    args = parser.parse_args()
+    pages = args.pages or sorted(glob.glob(os.path.join(ROOT_DIR, 'benchmarks', 'samples', '*.html')))
+    if not pages:
+        console.print("No sample pages found.")
+        return 1
+
+    table = Table(title=f"romance.io result extraction ({args.runs} runs per page)")
+    for column in ("Page", "KiB", "Parser", "CPU ms/lookup", "Peak KiB", "Link"):
+        table.add_column(column)
+    for path in pages:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        name = os.path.basename(path)
+        soup_result, soup_ms, soup_peak = measure(soup_book_link, html, args.runs)
+        fast_result, fast_ms, fast_peak = measure(find_book_link, html, args.runs)
+        if soup_result != fast_result:
+            console.print(f"[red]{name}: results differ: {soup_result!r} vs {fast_result!r}[/]")
+        table.add_row(name, f"{len(html) / 1024:.0f}", "BeautifulSoup", f"{soup_ms:.2f}", f"{soup_peak:.0f}", str(soup_result))
+        table.add_row("", "", "find_book_link", f"{fast_ms:.2f} ({soup_ms / max(fast_ms, 1e-6):.0f}x)", f"{fast_peak:.0f}", str(fast_result))
+    console.print(table)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,10 +7,15 @@ import logging
 from rich.console import Console
 from atproto import Client
 from book_utils import extract_books, write_book_to_csv, activity_logger
-from bookbot import robust_lookup_open_library, lookup_romance_io, lookup_google_books
+from book_store import get_book_store, flush_book_writers, normalize_key
+from bookbot import enrich_post_mention
+from handlers.web_search.cache import cache_stats, cache_stats_since
+from handlers.web_search.http_session import http_stats, http_stats_since
+from handlers.web_search.identifiers import extract_identifiers, identifier_stats, identifier_stats_since
 import datetime
 import urllib.parse
 import os
+import time
 
 # Set up a separate logger for Bluesky post scans
 os.makedirs("logs", exist_ok=True)
@@ -74,6 +79,13 @@ def run_bluesky_scan(config, emit_post_count=False):
         console.print(f"[red]Failed to authenticate with Bluesky: {e}[/]")
         activity_logger.error(f"Failed to authenticate with Bluesky: {e}")
         return
+    # Start from the keys already stored so known books are skipped before any lookup
+    startup_started = time.perf_counter()
+    stored = get_book_store().seen_keys()
+    startup_ms = (time.perf_counter() - startup_started) * 1000
+    cache_before = dict(cache_stats)
+    http_before = dict(http_stats)
+    identifiers_before = dict(identifier_stats)
     seen = set()
     duplicate_count = 0
     found_any = False
@@ -125,32 +137,26 @@ def run_bluesky_scan(config, emit_post_count=False):
                     bluesky_post_logger.info(f"[Bluesky][Scan][Feed] @{author.handle} | {created_at} | {bluesky_url} | {content[:200].replace(chr(10), ' ')}")
                     mentions = extract_books(content)
                     for title, author_name in mentions:
-                        key = (title.lower(), author_name.lower())
+                        key = normalize_key(title, author_name)
                         if key in seen:
                             duplicate_count += 1
                             continue
                         seen.add(key)
-                        # Check CSV before adding
-                        book = robust_lookup_open_library(title, author_name)
-                        if book:
+                        if key in stored:
+                            books_ignored += 1
+                            continue
+                        book, source = enrich_post_mention(title, author_name, extract_identifiers(content), len(mentions))
+                        if source == 'openlibrary':
                             book['bluesky_created_date'] = created_at
                             book['bluesky_url'] = bluesky_url
-                            # Only add if not in CSV
-                            before = books_added
-                            write_book_to_csv(book)
-                            # Check if added
-                            with open('book_mentions.csv', newline='', encoding='utf-8') as csvfile:
-                                import csv
-                                reader = csv.DictReader(csvfile)
-                                count = sum(1 for row in reader if row['title'].strip().lower() == title.lower() and row['author'].strip().lower() == author_name.lower())
-                            if count == 1:
+                            if write_book_to_csv(book):
                                 books_added += 1
                             else:
                                 books_ignored += 1
                             activity_logger.info(f"[Bluesky] Found book mention: {book['title']} by {book['author']}")
                             found_any = True
                             continue
-                        romance_book = lookup_romance_io(title, author_name)
+                        romance_book = book if source == 'romanceio' else None
                         if romance_book:
                             romance_book['bluesky_created_date'] = created_at
                             romance_book['bluesky_url'] = bluesky_url
@@ -158,7 +164,7 @@ def run_bluesky_scan(config, emit_post_count=False):
                             write_book_to_csv(romance_book)
                             found_any = True
                         else:
-                            google_book = lookup_google_books(title, author_name)
+                            google_book = book if source == 'googlebooks' else None
                             if google_book:
                                 google_book['bluesky_created_date'] = created_at
                                 google_book['bluesky_url'] = bluesky_url
@@ -199,30 +205,26 @@ def run_bluesky_scan(config, emit_post_count=False):
                     bluesky_post_logger.info(f"[Bluesky][Scan][Hashtag] @{author.handle} | {created_at} | {bluesky_url} | {content[:200].replace(chr(10), ' ')}")
                     mentions = extract_books(content)
                     for title, author_name in mentions:
-                        key = (title.lower(), author_name.lower())
+                        key = normalize_key(title, author_name)
                         if key in seen:
                             duplicate_count += 1
                             continue
                         seen.add(key)
-                        # Check CSV before adding
-                        book = robust_lookup_open_library(title, author_name)
-                        if book:
+                        if key in stored:
+                            books_ignored += 1
+                            continue
+                        book, source = enrich_post_mention(title, author_name, extract_identifiers(content), len(mentions))
+                        if source == 'openlibrary':
                             book['bluesky_created_date'] = created_at
                             book['bluesky_url'] = bluesky_url
-                            before = books_added
-                            write_book_to_csv(book)
-                            with open('book_mentions.csv', newline='', encoding='utf-8') as csvfile:
-                                import csv
-                                reader = csv.DictReader(csvfile)
-                                count = sum(1 for row in reader if row['title'].strip().lower() == title.lower() and row['author'].strip().lower() == author_name.lower())
-                            if count == 1:
+                            if write_book_to_csv(book):
                                 books_added += 1
                             else:
                                 books_ignored += 1
                             activity_logger.info(f"[Bluesky] Found book mention: {book['title']} by {book['author']}")
                             found_any = True
                             continue
-                        romance_book = lookup_romance_io(title, author_name)
+                        romance_book = book if source == 'romanceio' else None
                         if romance_book:
                             romance_book['bluesky_created_date'] = created_at
                             romance_book['bluesky_url'] = bluesky_url
@@ -230,7 +232,7 @@ def run_bluesky_scan(config, emit_post_count=False):
                             write_book_to_csv(romance_book)
                             found_any = True
                         else:
-                            google_book = lookup_google_books(title, author_name)
+                            google_book = book if source == 'googlebooks' else None
                             if google_book:
                                 google_book['bluesky_created_date'] = created_at
                                 google_book['bluesky_url'] = bluesky_url
@@ -249,12 +251,18 @@ def run_bluesky_scan(config, emit_post_count=False):
             except Exception as e:
                 console.print(f"[yellow]Error searching for hashtag #{hashtag}: {e}[/]")
                 activity_logger.warning(f"Error searching for hashtag #{hashtag}: {e}")
+    flush_book_writers()
+    get_book_store().compact()
     if found_any:
         console.print("[cyan]✅ Bluesky book scan complete.[/]")
         activity_logger.info("✅ Bluesky book scan complete.")
     else:
         console.print("[yellow]No book mentions found on Bluesky.[/]")
         activity_logger.info("No book mentions found on Bluesky.")
+    cache_delta = cache_stats_since(cache_before)
+    http_delta = http_stats_since(http_before)
+    id_delta = identifier_stats_since(identifiers_before)
+    activity_logger.info(f"[STATS] bluesky added={books_added} duplicates={duplicate_count} ignored={books_ignored} startup_ms={startup_ms:.1f} cache_hits={cache_delta['hits']} cache_misses={cache_delta['misses']} coalesced={cache_delta['coalesced']} http_requests={http_delta['requests']} http_reuse={http_delta['reuse_rate']:.0%} http_kb={http_delta['bytes'] / 1024:.0f} parse_ms={http_delta['parse_ms']:.0f} id_tried={id_delta['tried']} id_resolved={id_delta['resolved']}")
     if emit_post_count:
         print(f"[BLUESKY_DUPLICATES] {duplicate_count}")
         print(f"[BLUESKY_ADDED] {books_added}")
@@ -0,0 +1,797 @@
+"""
+Process-wide store for book mentions.
+
+The CSV used to be re-read for every single write just to check whether a book
+was already present. BookStore loads the normalized (title, author) keys once,
+keeps them in sync as rows are appended, and only re-reads the file when it was
+changed by someone else (another process, the GUI, a double-check pass).
+
+Setting `storage_backend = sqlite` in the [general] section of config.ini swaps
+in SQLiteBookStore, which keeps the data in an indexed SQLite database and only
+generates book_mentions.csv for email reports and downloads.
+"""
+import atexit
+import configparser
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from contextlib import contextmanager
+from seen_keys import SeenKeys, load_snapshot, save_snapshot
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+FIELDNAMES = ['title', 'author', 'isbn13', 'tags', 'cover_url', 'romance_io_url', 'google_books_url', 'steam', 'steam_rating', 'datetime_added', 'reddit_created_utc', 'reddit_created_date', 'reddit_url', 'subreddit']
+
+FINGERPRINT_BYTES = 256
+
+activity_logger = logging.getLogger("bot_activity")
+
+def normalize_key(title, author):
+    """Returns the (title, author) key used for de-duplication."""
+    return ((title or '').strip().lower(), (author or '').strip().lower())
+
+def book_to_row(book):
+    """Converts an enriched book dict into a CSV row dict."""
+    return {
+        'title': book['title'],
+        'author': book['author'],
+        'isbn13': book.get('isbn13', 'N/A'),
+        'tags': ', '.join(book.get('tags', [])) if book.get('tags') else '',
+        'cover_url': book.get('cover_url', 'N/A'),
+        'romance_io_url': book.get('romance_io_url', ''),
+        'google_books_url': book.get('google_books_url', ''),
+        'steam': book.get('steam', ''),
+        'steam_rating': book.get('steam_rating', ''),
+        'datetime_added': datetime.datetime.now().isoformat(),
+        'reddit_created_utc': book.get('reddit_created_utc', ''),
+        'reddit_created_date': book.get('reddit_created_date', ''),
+        'reddit_url': book.get('reddit_url', ''),
+        'subreddit': book.get('subreddit', '')
+    }
+
+def _stat_file(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def _csv_fingerprint(path, size):
+    """
+    The first and last FINGERPRINT_BYTES of the first `size` bytes of a file
+    (its header and last row), to tell an append from a rewrite.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(min(size, FINGERPRINT_BYTES))
+            f.seek(max(0, size - FINGERPRINT_BYTES))
+            tail = f.read(size - max(0, size - FINGERPRINT_BYTES))
+    except OSError:
+        return None
+    return head, tail
+
+def _flatten_state(state):
+    signature = []
+    for file_state in state:
+        signature.extend(file_state if file_state is not None else (-1, -1))
+    return tuple(signature)
+
+def _lock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _apply_patch_to_row(row, fields):
+    row.update({k: v for k, v in fields.items() if k})
+    return row
+
+class BookStore:
+    """
+    Keyed index over book_mentions.csv.
+    Appends go straight to the end of the file; the index is updated in place so
+    the next duplicate check is a set lookup instead of a full CSV scan.
+
+    Updates to existing rows are not written into the CSV. They are appended as
+    small JSON patch records to `<csv>.journal`, which all_rows() replays on
+    load. compact() folds the journal back into the CSV once it grows past
+    `journal_compact_bytes` or at the end of a scan.
+    """
+    def __init__(self, csv_path="book_mentions.csv", journal_compact_bytes=256 * 1024):
+        self.csv_path = csv_path
+        self.journal_path = csv_path + ".journal"
+        self.snapshot_path = csv_path + ".seen"
+        self.lock_path = csv_path + ".lock"
+        self.journal_compact_bytes = journal_compact_bytes
+        self.fieldnames = list(FIELDNAMES)
+        self._keys = SeenKeys()
+        self._loaded = False
+        self._file_state = None
+        self._csv_fingerprint = None
+        self.load_seconds = 0.0
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    def _stat(self):
+        return (_stat_file(self.csv_path), _stat_file(self.journal_path))
+
+    @contextmanager
+    def _write_lock(self):
+        """
+        Exclusive cross-process lock on `<csv>.lock` around every write, so the
+        GUI, the web UI and a running scan never interleave appends, journal
+        records and compaction. Re-entrant within this store.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.lock_path, 'a+')
+                _lock_file(self._lock_file)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    _unlock_file(self._lock_file)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _set_file_state(self, state):
+        self._file_state = state
+        self._csv_fingerprint = _csv_fingerprint(self.csv_path, state[0][0]) if state[0] is not None else None
+
+    def _ensure_loaded(self):
+        # Only re-read the CSV if it (or its journal) changed since we last read or wrote it
+        state = self._stat()
+        if self._loaded and state == self._file_state:
+            return
+        if self._loaded and self._load_appended(state):
+            return
+        self._load(state)
+
+    def _load_appended(self, state):
+        """
+        Picks up rows and journal records another process appended since our last
+        read by reading only the new bytes. Returns False if the files were
+        rewritten, edited in place or truncated instead, in which case a full
+        load is needed.
+        """
+        old_csv, old_journal = self._file_state
+        new_csv, new_journal = state
+        if old_csv is None or new_csv is None or old_csv[0] == 0 or new_csv[0] < old_csv[0]:
+            return False
+        if old_journal is not None and (new_journal is None or new_journal[0] < old_journal[0]):
+            return False
+        # Same size but a new mtime: edited in place (e.g. in a spreadsheet), not appended to
+        for old, new in ((old_csv, new_csv), (old_journal, new_journal)):
+            if old is not None and new[0] == old[0] and new[1] != old[1]:
+                return False
+        # The header and last row we read must still be there, or the file was rewritten
+        if self._csv_fingerprint is None or _csv_fingerprint(self.csv_path, old_csv[0]) != self._csv_fingerprint:
+            return False
+        new_keys = []
+        if new_csv[0] > old_csv[0]:
+            with open(self.csv_path, 'rb') as f:
+                f.seek(old_csv[0] - 1)
+                # Our last read must have ended on a row boundary, or the file was rewritten
+                if f.read(1) != b'\n':
+                    return False
+                tail = f.read(new_csv[0] - old_csv[0]).decode('utf-8', errors='replace')
+            for row in csv.DictReader(io.StringIO(tail, newline=''), fieldnames=self.fieldnames):
+                new_keys.append(normalize_key(row.get('title'), row.get('author')))
+        renames = []
+        if new_journal is not None and (old_journal is None or new_journal[0] > old_journal[0]):
+            start = old_journal[0] if old_journal is not None else 0
+            for key, fields in self._read_journal(start):
+                if 'title' in fields or 'author' in fields:
+                    renames.append((key, fields))
+        if new_keys and renames:
+            # Which came first decides which row a rename moved; a full load replays them in order
+            return False
+        for key in new_keys:
+            self._keys.add(key)
+        for key, fields in renames:
+            if key in self._keys:
+                self._keys.discard(key)
+                self._keys.add(normalize_key(fields.get('title', key[0]), fields.get('author', key[1])))
+        self._set_file_state(state)
+        return True
+
+    def data_signature(self):
+        """Sizes and mtimes of the CSV and its journal; changes whenever the data does."""
+        return _flatten_state(self._stat())
+
+    def _load(self, state):
+        self.load_seconds = 0.0
+        started = time.perf_counter()
+        fieldnames = list(FIELDNAMES)
+        if state[0] is not None:
+            with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
+                header = next(csv.reader(csvfile), None)
+                if header:
+                    fieldnames = header
+        # Warm start: reuse the binary key snapshot if it matches the files on disk
+        keys = load_snapshot(self.snapshot_path, _flatten_state(state))
+        if keys is None:
+            # Counted, since a key renamed away can come back with a row appended later
+            key_counts = Counter()
+            if state[0] is not None:
+                with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
+                    for row in csv.DictReader(csvfile):
+                        key_counts[normalize_key(row.get('title'), row.get('author'))] += 1
+            # Journal patches that rename a book move one row to a new key
+            for key, fields in self._read_journal():
+                if ('title' in fields or 'author' in fields) and key_counts[key] > 0:
+                    key_counts[key] -= 1
+                    key_counts[normalize_key(fields.get('title', key[0]), fields.get('author', key[1]))] += 1
+            keys = SeenKeys.from_keys(key for key, count in key_counts.items() if count > 0)
+            self._save_snapshot(keys, state)
+        self._keys = keys
+        self.fieldnames = fieldnames
+        self._set_file_state(state)
+        self._loaded = True
+        self.load_seconds = time.perf_counter() - started
+
+    def _save_snapshot(self, keys, state):
+        try:
+            save_snapshot(self.snapshot_path, _flatten_state(state), keys)
+        except OSError as e:
+            activity_logger.warning(f"Could not write key snapshot {self.snapshot_path}: {e}")
+
+    def _read_journal(self, offset=0):
+        """Yields (key, fields) patches from the journal (from byte `offset`) in the order they were written."""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb') as journal:
+            journal.seek(offset)
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                    yield tuple(record['key']), record['fields']
+                except (ValueError, KeyError, TypeError):
+                    # A half-written last line from a crashed writer; skip it
+                    continue
+
+    def _append_journal(self, patches):
+        with open(self.journal_path, 'a', encoding='utf-8') as journal:
+            for key, fields in patches:
+                journal.write(json.dumps({'key': list(key), 'fields': fields, 'ts': time.time()}, ensure_ascii=False) + "\n")
+        for key, fields in patches:
+            if 'title' in fields or 'author' in fields:
+                self._keys.discard(key)
+                self._keys.add(normalize_key(fields.get('title', key[0]), fields.get('author', key[1])))
+        self._set_file_state(self._stat())
+        if self._file_state[1] and self._file_state[1][0] >= self.journal_compact_bytes:
+            self.compact()
+
+    def contains(self, title, author):
+        with self._lock:
+            self._ensure_loaded()
+            return normalize_key(title, author) in self._keys
+
+    def seen_keys(self):
+        """Returns a copy of the normalized keys currently in the store (for scanners' `seen` sets)."""
+        with self._lock:
+            self._ensure_loaded()
+            return self._keys.copy()
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._keys)
+
+    def add(self, book):
+        """Appends a book if it is not already present. Returns True if it was added."""
+        return self.add_rows([book_to_row(book)]) == 1
+
+    def add_rows(self, rows):
+        """Appends CSV row dicts that are not already present in one write. Returns how many were added."""
+        with self._write_lock():
+            self._ensure_loaded()
+            new_rows = []
+            for row in rows:
+                key = normalize_key(row['title'], row['author'])
+                if key in self._keys:
+                    continue
+                self._keys.add(key)
+                new_rows.append(row)
+            if not new_rows:
+                return 0
+            write_header = self._file_state[0] is None or self._file_state[0][0] == 0
+            with open(self.csv_path, 'a', newline='', encoding='utf-8') as csvfile:
+                # Append using the file's own header so older CSVs stay aligned
+                writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, extrasaction='ignore')
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(new_rows)
+            self._set_file_state(self._stat())
+            return len(new_rows)
+
+    def update(self, title, author, fields):
+        """
+        Records `fields` for the row matching (title, author) in the journal.
+        Returns False without touching any file if the book is not in the store.
+        """
+        with self._lock:
+            if not self.contains(title, author):
+                return False
+            if fields:
+                self.update_rows([(title, author, fields)])
+            return True
+
+    def update_rows(self, patches):
+        """
+        Journals several (title, author, fields) patches in one append.
+        Returns the number of rows that were changed.
+        """
+        with self._write_lock():
+            self._ensure_loaded()
+            records = []
+            # Keys renamed by earlier patches of this batch; _append_journal only applies them to self._keys afterwards
+            added, removed = set(), set()
+            for title, author, fields in patches:
+                key = normalize_key(title, author)
+                present = key in added or (key in self._keys and key not in removed)
+                if not present or not fields:
+                    continue
+                fields = {k: v for k, v in fields.items() if k}
+                records.append((key, fields))
+                if 'title' in fields or 'author' in fields:
+                    new_key = normalize_key(fields.get('title', key[0]), fields.get('author', key[1]))
+                    added.discard(key)
+                    removed.add(key)
+                    removed.discard(new_key)
+                    added.add(new_key)
+            if records:
+                self._append_journal(records)
+            return len(records)
+
+    def iter_rows(self, chunk_size=1000):
+        """
+        Yields lists of up to `chunk_size` row dicts, in file order, with journal
+        patches applied. Rows are streamed from the CSV, so a reader (e.g. the GUI
+        loader thread) never holds the whole file or the store lock.
+        """
+        with self._lock:
+            journal = list(self._read_journal())
+            csv_exists = os.path.exists(self.csv_path)
+        patches_by_key = {}
+        for i, (key, _) in enumerate(journal):
+            patches_by_key.setdefault(key, []).append(i)
+        if not csv_exists:
+            return
+        # Each record patches one row: the first one (in file order) that has its key when it is replayed.
+        # A row appended later under a key that was renamed away must not pick up that rename.
+        consumed = {}  # key -> number of its records already applied to a row
+        chunk = []
+        with open(self.csv_path, newline='', encoding='utf-8') as csvfile:
+            for row in csv.DictReader(csvfile):
+                row = {k: v for k, v in row.items() if k is not None}
+                key = normalize_key(row.get('title'), row.get('author'))
+                applied = -1
+                # Replay this row's patches in journal order, following renames to the new key
+                while key in patches_by_key:
+                    positions = patches_by_key[key]
+                    nxt = max(bisect_right(positions, applied), consumed.get(key, 0))
+                    if nxt == len(positions):
+                        break
+                    consumed[key] = nxt + 1
+                    applied = positions[nxt]
+                    fields = journal[applied][1]
+                    _apply_patch_to_row(row, fields)
+                    if 'title' in fields or 'author' in fields:
+                        key = normalize_key(row.get('title'), row.get('author'))
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def all_rows(self):
+        """Returns every row as a dict, in file order, with journal patches applied."""
+        with self._lock:
+            return [row for chunk in self.iter_rows() for row in chunk]
+
+    def compact(self):
+        """Folds the journal into the CSV with one atomic rewrite and refreshes the key snapshot."""
+        with self._write_lock():
+            compacted = False
+            if os.path.exists(self.journal_path):
+                rows = self.all_rows()
+                fieldnames = list(FIELDNAMES) + [f for f in self.fieldnames if f and f not in FIELDNAMES]
+                tmp_path = self.csv_path + ".tmp"
+                with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+                    writer.writeheader()
+                    writer.writerows(rows)
+                os.replace(tmp_path, self.csv_path)
+                os.remove(self.journal_path)
+                activity_logger.info(f"Compacted update journal into {self.csv_path} ({len(rows)} rows).")
+                compacted = True
+            # Rows appended since the last load are only in memory; persist them for the next warm start
+            self._ensure_loaded()
+            self._save_snapshot(self._keys, self._file_state)
+            return compacted
+
+    def export_csv(self, path=None):
+        """Returns the path of an up-to-date CSV export (the compacted CSV itself for this backend)."""
+        self.compact()
+        return self.csv_path
+
+    def clear(self):
+        with self._write_lock():
+            for path in (self.csv_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._load(self._stat())
+
+class SQLiteBookStore:
+    """
+    Book mentions kept in SQLite (WAL mode) with a unique index on the
+    normalized title/author key. Inserts and single-row updates are index
+    lookups instead of full-file rewrites; CSV is produced on demand by
+    export_csv().
+    """
+    def __init__(self, db_path="book_mentions.db", csv_path="book_mentions.csv"):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.snapshot_path = db_path + ".seen"
+        self.load_seconds = 0.0
+        self.fieldnames = list(FIELDNAMES)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{name} TEXT DEFAULT ''" for name in FIELDNAMES)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS book_mentions (id INTEGER PRIMARY KEY, title_key TEXT NOT NULL, author_key TEXT NOT NULL, {columns})")
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_book_mentions_key ON book_mentions (title_key, author_key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_book_mentions_created ON book_mentions (reddit_created_utc)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_book_mentions_subreddit ON book_mentions (subreddit)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS store_meta (name TEXT PRIMARY KEY, value TEXT)")
+        # First run against an existing CSV: bring the old data across once. Later the CSV is
+        # only an export of the database, so an empty (e.g. cleared) database must not re-import it
+        if self._meta('csv_imported') is None:
+            if len(self) == 0 and os.path.exists(csv_path):
+                imported = self.import_csv(csv_path)
+                activity_logger.info(f"Imported {imported} rows from {csv_path} into {db_path}.")
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO store_meta (name, value) VALUES ('csv_imported', ?)",
+                                   (datetime.datetime.now().isoformat(),))
+
+    def _meta(self, name):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_meta WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def _insert(self, row):
+        title_key, author_key = normalize_key(row.get('title'), row.get('author'))
+        values = [str(row.get(name, '') or '') for name in FIELDNAMES]
+        placeholders = ", ".join("?" for _ in FIELDNAMES)
+        cur = self._conn.execute(
+            f"INSERT OR IGNORE INTO book_mentions (title_key, author_key, {', '.join(FIELDNAMES)}) VALUES (?, ?, {placeholders})",
+            [title_key, author_key] + values)
+        return cur.rowcount == 1
+
+    def _update(self, key, fields):
+        fields = {k: v for k, v in fields.items() if k in FIELDNAMES}
+        if 'title' in fields or 'author' in fields:
+            # Editing title/author moves the row to a new key
+            cur = self._conn.execute("SELECT title, author FROM book_mentions WHERE title_key = ? AND author_key = ?", key)
+            current = cur.fetchone()
+            if current is None:
+                return False
+            fields['title_key'], fields['author_key'] = normalize_key(fields.get('title', current['title']), fields.get('author', current['author']))
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        cur = self._conn.execute(
+            f"UPDATE OR IGNORE book_mentions SET {assignments} WHERE title_key = ? AND author_key = ?",
+            [str(v if v is not None else '') for v in fields.values()] + list(key))
+        return cur.rowcount > 0
+
+    def contains(self, title, author):
+        with self._lock:
+            cur = self._conn.execute("SELECT 1 FROM book_mentions WHERE title_key = ? AND author_key = ?", normalize_key(title, author))
+            return cur.fetchone() is not None
+
+    def keys(self):
+        with self._lock:
+            return {(r[0], r[1]) for r in self._conn.execute("SELECT title_key, author_key FROM book_mentions")}
+
+    def data_signature(self):
+        return _flatten_state((_stat_file(self.db_path), _stat_file(self.db_path + "-wal")))
+
+    def seen_keys(self):
+        """Keys for scanners' `seen` sets, warm-started from the binary snapshot when possible."""
+        with self._lock:
+            started = time.perf_counter()
+            signature = self.data_signature()
+            keys = load_snapshot(self.snapshot_path, signature)
+            if keys is None:
+                keys = SeenKeys.from_keys(self.keys())
+                try:
+                    save_snapshot(self.snapshot_path, signature, keys)
+                except OSError as e:
+                    activity_logger.warning(f"Could not write key snapshot {self.snapshot_path}: {e}")
+            self.load_seconds = time.perf_counter() - started
+            return keys
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM book_mentions").fetchone()[0]
+
+    def add(self, book):
+        with self._lock, self._conn:
+            return self._insert(book_to_row(book))
+
+    def add_rows(self, rows):
+        with self._lock, self._conn:
+            return sum(1 for row in rows if self._insert(row))
+
+    def update(self, title, author, fields):
+        key = normalize_key(title, author)
+        with self._lock, self._conn:
+            if not fields:
+                return self.contains(title, author)
+            return self._update(key, fields)
+
+    def update_rows(self, patches):
+        changed = 0
+        with self._lock, self._conn:
+            for title, author, fields in patches:
+                if fields and self._update(normalize_key(title, author), fields):
+                    changed += 1
+        return changed
+
+    def iter_rows(self, chunk_size=1000):
+        """Yields lists of up to `chunk_size` row dicts in insertion order, one keyset page at a time."""
+        last_id = 0
+        while True:
+            with self._lock:
+                cur = self._conn.execute(
+                    f"SELECT id, {', '.join(FIELDNAMES)} FROM book_mentions WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size))
+                records = cur.fetchall()
+            if not records:
+                return
+            last_id = records[-1]['id']
+            yield [{name: r[name] for name in FIELDNAMES} for r in records]
+
+    def all_rows(self):
+        with self._lock:
+            cur = self._conn.execute(f"SELECT {', '.join(FIELDNAMES)} FROM book_mentions ORDER BY id")
+            return [dict(r) for r in cur]
+
+    def import_csv(self, csv_path):
+        """One-shot import of an existing CSV. Rows already in the database are skipped."""
+        imported = 0
+        with open(csv_path, newline='', encoding='utf-8') as csvfile:
+            reader = csv.DictReader(csvfile)
+            with self._lock, self._conn:
+                for row in reader:
+                    if row.get('title') and row.get('author') and self._insert(row):
+                        imported += 1
+        return imported
+
+    def export_csv(self, path=None):
+        """Writes the database out as CSV (for email reports and downloads) and returns its path."""
+        path = path or self.csv_path
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(self.all_rows())
+        os.replace(tmp_path, path)
+        return path
+
+    def compact(self):
+        """Checkpoints the WAL back into the main database file and refreshes the key snapshot."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.seen_keys()
+        return True
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM book_mentions")
+
+def _int_setting(config, option, default):
+    try:
+        return int(config.get('general', option, fallback=str(default)).strip() or default)
+    except ValueError:
+        return default
+
+def _float_setting(config, option, default):
+    try:
+        return float(config.get('general', option, fallback=str(default)).strip() or default)
+    except ValueError:
+        return default
+
+def _storage_settings():
+    config = configparser.ConfigParser()
+    config.read(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.ini"))
+    return {
+        'backend': config.get('general', 'storage_backend', fallback='csv').strip().lower(),
+        'sqlite_path': config.get('general', 'sqlite_path', fallback='').strip(),
+        'journal_compact_kb': _int_setting(config, 'journal_compact_kb', 256),
+        'write_batch_rows': _int_setting(config, 'write_batch_rows', 50),
+        'write_batch_seconds': _float_setting(config, 'write_batch_seconds', 5.0),
+    }
+
+class BufferedBookWriter:
+    """
+    Group-commit writer in front of a book store.
+    New books and row updates are collected in memory and written with one
+    append per commit: explicitly via commit() (once per post during a scan),
+    or automatically after `batch_rows` changes or `batch_seconds` since the
+    first pending change (by a timer, so an idle long-running process still
+    writes them). Anything still pending is flushed at exit.
+    """
+    def __init__(self, store, batch_rows=50, batch_seconds=5.0):
+        self.store = store
+        self.batch_rows = max(1, batch_rows)
+        self.batch_seconds = batch_seconds
+        self.stats = {'commits': 0, 'rows': 0, 'patches': 0, 'seconds': 0.0}
+        self._pending_rows = {}
+        self._pending_patches = []
+        self._first_pending = None
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _pending_count(self):
+        return len(self._pending_rows) + len(self._pending_patches)
+
+    def _note_pending(self):
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+            self._timer = threading.Timer(self.batch_seconds, self._commit_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+        if self._pending_count() >= self.batch_rows or time.monotonic() - self._first_pending >= self.batch_seconds:
+            self.commit()
+
+    def _commit_on_timer(self):
+        try:
+            self.commit()
+        except Exception as e:
+            activity_logger.error(f"Failed to commit buffered book writes: {e}")
+
+    def contains(self, title, author):
+        with self._lock:
+            return normalize_key(title, author) in self._pending_rows or self.store.contains(title, author)
+
+    def add(self, book):
+        """Queues a book unless it is already stored or pending. Returns True if it was queued."""
+        with self._lock:
+            key = normalize_key(book['title'], book['author'])
+            if key in self._pending_rows or self.store.contains(book['title'], book['author']):
+                return False
+            self._pending_rows[key] = book_to_row(book)
+            self._note_pending()
+            return True
+
+    def update(self, title, author, fields):
+        """Queues an update for an existing (or pending) book. Returns False if the book is unknown."""
+        with self._lock:
+            key = normalize_key(title, author)
+            pending_row = self._pending_rows.get(key)
+            if pending_row is not None:
+                # Not written yet, so just patch the buffered row (moving it to its new key on a rename)
+                pending_row.update(fields)
+                new_key = normalize_key(pending_row['title'], pending_row['author'])
+                if new_key != key:
+                    self._pending_rows = {(new_key if k == key else k): row for k, row in self._pending_rows.items()}
+                return True
+            if not self.store.contains(title, author):
+                return False
+            if fields:
+                self._pending_patches.append((title, author, dict(fields)))
+                self._note_pending()
+            return True
+
+    def commit(self):
+        """Writes everything pending with one append (plus one journal append for updates)."""
+        with self._lock:
+            if not self._pending_count():
+                return 0
+            rows = list(self._pending_rows.values())
+            patches = self._pending_patches
+            self._pending_rows = {}
+            self._pending_patches = []
+            self._first_pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            started = time.perf_counter()
+            added = self.store.add_rows(rows) if rows else 0
+            if patches:
+                self.store.update_rows(patches)
+            elapsed = time.perf_counter() - started
+            self.stats['commits'] += 1
+            self.stats['rows'] += added
+            self.stats['patches'] += len(patches)
+            self.stats['seconds'] += elapsed
+            activity_logger.info(f"Committed {added} new rows and {len(patches)} updates in {elapsed * 1000:.1f} ms.")
+            return added + len(patches)
+
+_stores = {}
+_writers = {}
+_stores_lock = threading.RLock()
+
+def get_book_store(csv_path="book_mentions.csv"):
+    """
+    Returns the shared store for `csv_path` (one per file per process).
+    The backend is picked from `storage_backend` in config.ini.
+    """
+    path = os.path.abspath(csv_path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            settings = _storage_settings()
+            if settings['backend'] == 'sqlite':
+                db_path = settings['sqlite_path']
+                if not db_path:
+                    db_path = os.path.splitext(path)[0] + ".db"
+                elif not os.path.isabs(db_path):
+                    db_path = os.path.join(os.path.dirname(path), db_path)
+                store = SQLiteBookStore(db_path, csv_path)
+            else:
+                store = BookStore(csv_path, journal_compact_bytes=settings['journal_compact_kb'] * 1024)
+            _stores[path] = store
+        return store
+
+def get_book_writer(csv_path="book_mentions.csv"):
+    """Returns the shared BufferedBookWriter for `csv_path`."""
+    path = os.path.abspath(csv_path)
+    with _stores_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            settings = _storage_settings()
+            writer = BufferedBookWriter(get_book_store(csv_path), settings['write_batch_rows'], settings['write_batch_seconds'])
+            _writers[path] = writer
+        return writer
+
+def flush_book_writers():
+    """Commits anything still buffered in any writer (runs automatically at exit)."""
+    with _stores_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        try:
+            writer.commit()
+        except Exception as e:
+            activity_logger.error(f"Failed to flush buffered book writes: {e}")
+
+atexit.register(flush_book_writers)
+
+if __name__ == "__main__":
+    # python3 book_store.py --import-csv [path]  -> one-shot CSV import into SQLite
+    if len(sys.argv) >= 2 and sys.argv[1] == "--import-csv":
+        source = sys.argv[2] if len(sys.argv) > 2 else "book_mentions.csv"
+        db_path = _storage_settings()['sqlite_path'] or os.path.splitext(os.path.abspath(source))[0] + ".db"
+        store = SQLiteBookStore(db_path, source)
+        imported = store.import_csv(source)
+        print(f"Imported {imported} new rows; {len(store)} rows in {db_path}")
+    else:
+        print("Usage: python3 book_store.py --import-csv [book_mentions.csv]")
@@ -1,6 +1,5 @@
 import re
 import configparser
-import requests
 import praw
 import logging
 import os
@@ -16,18 +15,32 @@ from rich.table import Table
 import csv
 import time
 import prawcore
-from bs4 import BeautifulSoup
 import datetime
 from handlers.romance_bot_handler import is_romance_bot, handle_romance_bot_comment
 from book_utils import extract_books, update_csv_with_romance_bot, write_book_to_csv, activity_logger
-from handlers.curly_bracket_handler import is_curly_bracket_comment, handle_curly_bracket_comment
+from book_store import get_book_store, get_book_writer, flush_book_writers, normalize_key
+from handlers.curly_bracket_handler import is_curly_bracket_comment, handle_curly_bracket_comment, extract_curly_bracket_mentions, enrich_curly_bracket_mention, write_curly_bracket_book
 from handlers.csv_double_check_handler import run_csv_double_check
+from handlers.web_search.cache import cached_lookup, lookup_failed, cache_stats, cache_stats_since
+from handlers.web_search.http_session import http_get, http_stats, http_stats_since, parse_json, count_parse_time
+from handlers.web_search.identifiers import enrich_mention, extract_identifiers, identifier_stats, identifier_stats_since, romance_link_for
+from handlers.web_search.openlibrary_handler import SEARCH_FIELDS, SEARCH_LIMIT
+from handlers.web_search.googlebooks_handler import VOLUME_FIELDS
+from handlers.web_search.romanceio_handler import find_book_link
+from handlers.web_search.openlibrary_local import lookup_local
+from handlers.web_search.settings import enrichment_settings
+from handlers.web_search.hedging import lookup_cancelled
+from handlers.web_search.rate_limit import ProviderThrottled, wait_before_retry
+from handlers.web_search.circuit_breaker import is_transient
+from scan_pipeline import ScanPipeline, Lookup
+from functools import partial
 # Add import for Bluesky scanning (to be implemented)
 try:
     from bluesky_scan import run_bluesky_scan
 except ImportError:
     run_bluesky_scan = None
 import sys
+import signal
 
 # Set up error logging
 logging.basicConfig(filename="logs/error.log", level=logging.ERROR,
@@ -85,18 +98,31 @@ DOUBLE_CHECK_ON_RUN = config['general'].get('double_check_csv_on_run', 'false').
 DOUBLE_CHECK_MODE = config['general'].get('double_check_mode', 'missing').strip().lower()
 DOUBLE_CHECK_TIMES = [t.strip() for t in config['general'].get('double_check_times', '').split(',') if t.strip()]
 
+def _int_setting(config, option, default):
+    try:
+        return int(config.get('general', option, fallback=str(default)).strip() or default)
+    except ValueError:
+        return default
+
+# Scan pipeline: concurrent enrichment lookups and how far fetching may run ahead of the writer
+SCAN_WORKERS = max(1, _int_setting(config, 'scan_workers', 4))
+SCAN_QUEUE_DEPTH = max(1, _int_setting(config, 'scan_queue_depth', 32))
+
 def extract_books(text):
     # Matches {Book Title by Author} with curly braces
     pattern = r"\{([^\{\}]+?)\s+by\s+([^\{\}]+?)\}"
     return [(t.strip(), a.strip()) for t, a in re.findall(pattern, text, re.IGNORECASE)]
 
 def lookup_open_library(title, author):
-    url = f"https://openlibrary.org/search.json?title={title}&author={author}"
-    r = requests.get(url)
+    url = "https://openlibrary.org/search.json"
+    r = http_get(url, params={'title': title, 'author': author, 'fields': SEARCH_FIELDS, 'limit': SEARCH_LIMIT})
     if not r.ok:
+        lookup_failed()
+        if is_transient(status=r.status_code):
+            r.raise_for_status()  # retried by robust_lookup_open_library
         return None
 
-    docs = r.json().get("docs", [])
+    docs = parse_json(r).get("docs", [])
     if not docs:
         return None
 
@@ -134,28 +160,44 @@ def display_book(book):
     console.print(table)
     console.print("-" * 60)
 
-def robust_lookup_open_library(title, author, retries=3, delay=2):
+@cached_lookup('openlibrary')
+def robust_lookup_open_library(title, author, retries=3):
+    # The local dump index (import_openlibrary_dump.py) answers without any network request
+    local = lookup_local(title, author)
+    if local:
+        return local
+    if enrichment_settings()['openlibrary_offline']:
+        lookup_failed()
+        return None
+    # Transient errors are retried after Open Library's rate limiter backoff, or backoff_delay without rate limiting (see handlers/web_search/rate_limit.py)
     for attempt in range(retries):
         try:
             return lookup_open_library(title, author)
+        except ProviderThrottled as e:
+            lookup_failed()
+            activity_logger.warning(f"Open Library lookup skipped for {title} by {author}: {e}")
+            return None
         except Exception as e:
-            if attempt < retries - 1:
-                time.sleep(delay)
-            else:
+            if attempt == retries - 1 or lookup_cancelled() or not is_transient(error=e):
+                lookup_failed()
                 activity_logger.error(f"Open Library lookup failed for {title} by {author}: {e}")
                 return None
+            wait_before_retry('openlibrary', attempt + 1)
 
+@cached_lookup('romanceio')
 def lookup_romance_io(title, author):
     search_query = f"{title} {author}".replace(" ", "+")
     url = f"https://www.romance.io/books?search={search_query}"
     try:
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
         if not response.ok:
+            lookup_failed()
             return None
-        soup = BeautifulSoup(response.text, "html.parser")
-        book_link = soup.find("a", class_="book-link")
+        started = time.perf_counter()
+        book_link = find_book_link(response.text)
+        count_parse_time(time.perf_counter() - started)
         if book_link:
-            book_url = "https://www.romance.io" + book_link.get("href")
+            book_url = "https://www.romance.io" + book_link
             return {
                 "title": title,
                 "author": author,
@@ -165,20 +207,22 @@ def lookup_romance_io(title, author):
                 "romance_io_url": book_url
             }
     except Exception as e:
+        lookup_failed()
         activity_logger.error(f"Romance.io lookup failed for {title} by {author}: {e}")
     return None
 
+@cached_lookup('googlebooks')
 def lookup_google_books(title, author):
-    import requests
     params = {
         'q': f'intitle:{title} inauthor:{author}',
-        'maxResults': 1
+        'maxResults': 1,
+        'fields': VOLUME_FIELDS
     }
     url = 'https://www.googleapis.com/books/v1/volumes'
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = http_get(url, params=params)
         if r.ok:
-            items = r.json().get('items', [])
+            items = parse_json(r).get('items', [])
             if items:
                 volume = items[0]['volumeInfo']
                 isbn13 = next((id['identifier'] for id in volume.get('industryIdentifiers', []) if id['type'] == 'ISBN_13'), 'N/A')
@@ -191,47 +235,13 @@ def lookup_google_books(title, author):
                     'romance_io_url': '',
                     'google_books_url': volume.get('infoLink', '')
                 }
+        else:
+            lookup_failed()
     except Exception as e:
+        lookup_failed()
         activity_logger.error(f"Google Books lookup failed for {title} by {author}: {e}")
     return None
 
-def write_book_to_csv(book, csv_path="book_mentions.csv"):
-    existing = set()
-    try:
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                key = (row['title'].strip().lower(), row['author'].strip().lower())
-                existing.add(key)
-    except FileNotFoundError:
-        pass
-    key = (book['title'].strip().lower(), book['author'].strip().lower())
-    if key in existing:
-        # Book already in CSV, return False to indicate ignored
-        return False
-    write_header = not os.path.exists(csv_path)
-    fieldnames = ['title', 'author', 'isbn13', 'tags', 'cover_url', 'romance_io_url', 'google_books_url', 'steam', 'datetime_added', 'reddit_created_utc', 'reddit_created_date']
-    with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if write_header:
-            writer.writeheader()
-        writer.writerow({
-            'title': book['title'],
-            'author': book['author'],
-            'isbn13': book.get('isbn13', 'N/A'),
-            'tags': ', '.join(book.get('tags', [])) if book.get('tags') else '',
-            'cover_url': book.get('cover_url', 'N/A'),
-            'romance_io_url': book.get('romance_io_url', ''),
-            'google_books_url': book.get('google_books_url', ''),
-            'steam': book.get('steam', ''),
-            'datetime_added': datetime.datetime.now().isoformat(),
-            'reddit_created_utc': book.get('reddit_created_utc', ''),
-            'reddit_created_date': book.get('reddit_created_date', '')
-        })
-        csvfile.flush()
-    activity_logger.info(f"Wrote book to CSV: {book['title']} by {book['author']}")
-    return True
-
 def auto_update():
     import subprocess
     import os
@@ -265,6 +275,13 @@ def send_test_email():
     except Exception as e:
         print(f"❌ Failed to send test email: {e}")
 
+# Providers for post mentions, in order of preference
+LOOKUP_PROVIDERS = [
+    ('openlibrary', robust_lookup_open_library),
+    ('romanceio', lookup_romance_io),
+    ('googlebooks', lookup_google_books),
+]
+
 def extract_romance_io_link(text):
     match = re.search(r'(https?://www\.romance\.io/[\w\-/\?=&#.]+)', text)
     return match.group(1) if match else ''
@@ -281,45 +298,18 @@ def extract_romance_bot_data(text):
     steam = steam_match.group(1).strip() if steam_match else ''
     return romance_link, topics, steam
 
-def update_csv_with_romance_bot(title, author, romance_io_url, topics, steam, csv_path="book_mentions.csv"):
-    key = (title.strip().lower(), author.strip().lower())
-    updated = False
-    rows = []
-    try:
-        with open(csv_path, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                row_key = (row['title'].strip().lower(), row['author'].strip().lower())
-                if row_key == key:
-                    if romance_io_url:
-                        row['romance_io_url'] = romance_io_url
-                    if topics:
-                        row['tags'] = ', '.join(topics)
-                    if steam:
-                        row['steam'] = steam
-                    updated = True
-                rows.append(row)
-    except FileNotFoundError:
-        return False
-    if updated:
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = rows[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-    return updated
-
-def process_comments(post, seen, comment_counter, ignored_counter):
-    # Process comments with retry logic for API errors
+def fetch_comments(post):
+    """Loads every comment of a post, or returns [] if Reddit's API fails."""
     try:
         post.comments.replace_more(limit=None)
-        comments = post.comments.list()
+        return post.comments.list()
     except (prawcore.exceptions.RequestException, prawcore.exceptions.ServerError) as e:
         activity_logger.warning(f"Could not fetch comments for post {post.id} due to API error: {e}. Skipping post.")
         console.print(f"⚠️ Could not fetch comments for post {post.id}. Skipping.")
-        return
+        return []
 
-    for comment in comments:
+def process_comments(post, seen, comment_counter, ignored_counter):
+    for comment in fetch_comments(post):
         comment_counter[0] += 1
         # Each handler will now be responsible for calling write_book_to_csv with the correct data
         if is_romance_bot(comment):
@@ -340,7 +330,8 @@ def send_csv_report():
     msg["To"] = EMAIL_TO
     msg["Subject"] = "📚 Book Bot - CSV and Logs Report"
     attachments = []
-    csv_path = "book_mentions.csv"
+    flush_book_writers()
+    csv_path = get_book_store().export_csv()
     botlog_path = os.path.join("logs", "bot.log")
     commentlog_path = os.path.join("logs", "comment_data.log")
     if os.path.exists(csv_path):
@@ -390,99 +381,145 @@ def get_next_run_time(check_times):
     first_run_tomorrow = sorted(today_run_times)[0]
     return tomorrow.replace(hour=first_run_tomorrow.hour, minute=first_run_tomorrow.minute, second=0, microsecond=0)
 
+def post_context(post):
+    """Reddit fields added to every book mentioned in the body of a post."""
+    content = f"{post.title} {post.selftext}"
+    reddit_created_utc = getattr(post, 'created_utc', None)
+    return {
+        'reddit_created_utc': reddit_created_utc,
+        'reddit_created_date': datetime.datetime.utcfromtimestamp(reddit_created_utc).isoformat() if reddit_created_utc else '',
+        'identifiers': extract_identifiers(content),
+        'reddit_url': f"https://reddit.com{getattr(post, 'permalink', '')}",
+    }
+
+def enrich_post_mention(title, author, identifiers=(), mention_count=None):
+    """
+    Looks a post mention up by the identifiers found next to it (see extract_identifiers),
+    then with LOOKUP_PROVIDERS (see provider_mode). Returns (book, source), with book None
+    if nothing was found.
+    """
+    return enrich_mention(title, author, LOOKUP_PROVIDERS, identifiers, mention_count)
+
+def write_post_mention(title, author, context, ignored_counter, result):
+    book, source = result
+    if source == 'openlibrary':
+        book['reddit_created_utc'] = context['reddit_created_utc']
+        book['reddit_created_date'] = context['reddit_created_date']
+        book['romance_io_url'] = romance_link_for(title, context['identifiers'], context.get('mention_count'))
+        book['reddit_url'] = context['reddit_url']
+        activity_logger.info(f"Found book mention: {book['title']} by {book['author']}")
+        added = write_book_to_csv(book)
+        if not added:
+            ignored_counter[0] += 1
+        display_book(book)
+    elif source == 'romanceio':
+        book['reddit_created_utc'] = context['reddit_created_utc']
+        book['reddit_created_date'] = context['reddit_created_date']
+        book['reddit_url'] = context['reddit_url']
+        activity_logger.info(f"Found book mention on romance.io: {book['title']} by {book['author']}")
+        added = write_book_to_csv(book)
+        if not added:
+            ignored_counter[0] += 1
+        console.print(f"[yellow]No data found on Open Library, but found on romance.io: {title} by {author}[/]")
+        activity_logger.info(f"No data found on Open Library, but found on romance.io: {title} by {author}")
+    elif source == 'googlebooks':
+        book['reddit_created_utc'] = context['reddit_created_utc']
+        book['reddit_created_date'] = context['reddit_created_date']
+        book['reddit_url'] = context['reddit_url']
+        activity_logger.info(f"Found book mention on Google Books: {book['title']} by {book['author']}")
+        added = write_book_to_csv(book)
+        if not added:
+            ignored_counter[0] += 1
+        console.print(f"[yellow]No data found on Open Library or romance.io, but found on Google Books: {title} by {author}[/]")
+        activity_logger.info(f"No data found on Open Library or romance.io, but found on Google Books: {title} by {author}")
+    else:
+        no_data_book = {
+            'title': title, 'author': author, 'isbn13': 'N/A', 'tags': [], 'cover_url': 'N/A',
+            'romance_io_url': '', 'google_books_url': '', 'steam': '',
+            'reddit_created_utc': context['reddit_created_utc'], 'reddit_created_date': context['reddit_created_date'], 'reddit_url': context['reddit_url']
+        }
+        activity_logger.info(f"No data found for: {title} by {author}, adding to CSV anyway.")
+        added = write_book_to_csv(no_data_book)
+        if not added:
+            ignored_counter[0] += 1
+        console.print(f"[yellow]No data found for: {title} by {author}[/]")
+        activity_logger.info(f"No data found for: {title} by {author}")
+
 def run_scan_and_enrich(reddit):
-    seen = set()
-    csv_path = "book_mentions.csv"
-    if os.path.exists(csv_path):
-        try:
-            with open(csv_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                next(reader, None)
-                for row in reader:
-                    if row:
-                        title, author = row[0].strip().lower(), row[1].strip().lower()
-                        seen.add((title, author))
-        except (FileNotFoundError, StopIteration):
-            pass
+    # Keys already stored, warm-started from the binary snapshot when the data hasn't changed
+    startup_started = time.perf_counter()
+    seen = get_book_store().seen_keys()
+    startup_ms = (time.perf_counter() - startup_started) * 1000
+    writer = get_book_writer()
+    cache_before = dict(cache_stats)
+    http_before = dict(http_stats)
+    identifiers_before = dict(identifier_stats)
     console.print(f"🔎 Scanning subreddit(s): [bold cyan]{SUBREDDIT_NAME}[/bold cyan]...")
     activity_logger.info(f"Scanning subreddit(s): {SUBREDDIT_NAME}...")
     subreddit = reddit.subreddit(SUBREDDIT_NAME)
-    post_counter = 0
+    post_counter = [0]
     comment_counter = [0]  # Use list for mutability in nested functions
-    ignored_counter = [0]
+    # Duplicates are counted by the extract thread (already seen) and by the writer (already stored)
+    extract_ignored = [0]
+    write_ignored = [0]
+
+    def fetch(post):
+        # Fetch stage: pulls the post's comment tree (the slow Reddit calls)
+        return post, fetch_comments(post)
+
+    def extract(fetched):
+        # Extract stage: turns a post and its comments into lookups and writes, in scan order
+        post, comments = fetched
+        post_counter[0] += 1
+        for comment in comments:
+            comment_counter[0] += 1
+            if is_romance_bot(comment):
+                yield partial(handle_romance_bot_comment, comment, seen, write_ignored)
+                continue
+            if is_curly_bracket_comment(comment):
+                for title, author, context in extract_curly_bracket_mentions(comment, seen, extract_ignored):
+                    yield Lookup(enrich_curly_bracket_mention, (title, author, context), partial(write_curly_bracket_book, ignored_counter=write_ignored))
+        for title, author, context in extract_curly_bracket_mentions(post, seen, extract_ignored):
+            yield Lookup(enrich_curly_bracket_mention, (title, author, context), partial(write_curly_bracket_book, ignored_counter=write_ignored))
+        context = post_context(post)
+        post_mentions = extract_books(f"{post.title} {post.selftext}")
+        context['mention_count'] = len(post_mentions)
+        for title, author in post_mentions:
+            key = normalize_key(title, author)
+            if key in seen:
+                extract_ignored[0] += 1
+                continue
+            seen.add(key)
+            yield Lookup(enrich_post_mention, (title, author, context['identifiers'], context['mention_count']), partial(write_post_mention, title, author, context, write_ignored))
+        # Group-commit everything this post produced in a single write
+        yield writer.commit
+
+    def on_error(e):
+        activity_logger.error(f"Error enriching a book mention, skipping it: {e}")
+
     try:
         if POST_LIMIT:
             posts = subreddit.new(limit=POST_LIMIT)
         else:
             posts = subreddit.new(limit=None)
-        for post in posts:
-            post_counter += 1
-            process_comments(post, seen, comment_counter, ignored_counter)
-            handle_curly_bracket_comment(post, seen, ignored_counter)
-            content = f"{post.title} {post.selftext}"
-            mentions = extract_books(content)
-            reddit_created_utc = getattr(post, 'created_utc', None)
-            reddit_created_date = datetime.datetime.utcfromtimestamp(reddit_created_utc).isoformat() if reddit_created_utc else ''
-            romance_link = extract_romance_io_link(content)
-            reddit_url = f"https://reddit.com{getattr(post, 'permalink', '')}"
-            for title, author in mentions:
-                key = (title, author)
-                if key in seen:
-                    ignored_counter[0] += 1
-                    continue
-                seen.add(key)
-                book = robust_lookup_open_library(title, author)
-                if book:
-                    book['reddit_created_utc'] = reddit_created_utc
-                    book['reddit_created_date'] = reddit_created_date
-                    book['romance_io_url'] = romance_link
-                    book['reddit_url'] = reddit_url
-                    activity_logger.info(f"Found book mention: {book['title']} by {book['author']}")
-                    added = write_book_to_csv(book)
-                    if not added:
-                        ignored_counter[0] += 1
-                    display_book(book)
-                    continue
-                romance_book = lookup_romance_io(title, author)
-                if romance_book:
-                    romance_book['reddit_created_utc'] = reddit_created_utc
-                    romance_book['reddit_created_date'] = reddit_created_date
-                    romance_book['reddit_url'] = reddit_url
-                    activity_logger.info(f"Found book mention on romance.io: {romance_book['title']} by {romance_book['author']}")
-                    added = write_book_to_csv(romance_book)
-                    if not added:
-                        ignored_counter[0] += 1
-                    console.print(f"[yellow]No data found on Open Library, but found on romance.io: {title} by {author}[/]")
-                    activity_logger.info(f"No data found on Open Library, but found on romance.io: {title} by {author}")
-                else:
-                    google_book = lookup_google_books(title, author)
-                    if google_book:
-                        google_book['reddit_created_utc'] = reddit_created_utc
-                        google_book['reddit_created_date'] = reddit_created_date
-                        google_book['reddit_url'] = reddit_url
-                        activity_logger.info(f"Found book mention on Google Books: {google_book['title']} by {google_book['author']}")
-                        added = write_book_to_csv(google_book)
-                        if not added:
-                            ignored_counter[0] += 1
-                        console.print(f"[yellow]No data found on Open Library or romance.io, but found on Google Books: {title} by {author}[/]")
-                        activity_logger.info(f"No data found on Open Library or romance.io, but found on Google Books: {title} by {author}")
-                    else:
-                        no_data_book = {
-                            'title': title, 'author': author, 'isbn13': 'N/A', 'tags': [], 'cover_url': 'N/A',
-                            'romance_io_url': '', 'google_books_url': '', 'steam': '',
-                            'reddit_created_utc': reddit_created_utc, 'reddit_created_date': reddit_created_date, 'reddit_url': reddit_url
-                        }
-                        activity_logger.info(f"No data found for: {title} by {author}, adding to CSV anyway.")
-                        added = write_book_to_csv(no_data_book)
-                        if not added:
-                            ignored_counter[0] += 1
-                        console.print(f"[yellow]No data found for: {title} by {author}[/]")
-                        activity_logger.info(f"No data found for: {title} by {author}")
+        pipeline = ScanPipeline(workers=SCAN_WORKERS, queue_depth=SCAN_QUEUE_DEPTH)
+        try:
+            pipeline.run(posts, fetch, extract, on_error=on_error)
+        finally:
+            activity_logger.info(f"[PIPELINE] {pipeline.summary()}")
         activity_logger.info(f"✅ Book scan complete.")
         console.print(f"[cyan]✅ Book scan complete.[/]")
+        console.print(f"[dim]{pipeline.summary()}[/]")
         activity_logger.info("✅ Book scan complete.")
+        # Fold any romance-bot updates from this scan back into the CSV
+        flush_book_writers()
+        get_book_store().compact()
         # Log scan stats in a parseable format
-        activity_logger.info(f"[STATS] posts={post_counter} comments={comment_counter[0]} ignored={ignored_counter[0]}")
+        cache_delta = cache_stats_since(cache_before)
+        http_delta = http_stats_since(http_before)
+        id_delta = identifier_stats_since(identifiers_before)
+        ignored = extract_ignored[0] + write_ignored[0]
+        activity_logger.info(f"[STATS] posts={post_counter[0]} comments={comment_counter[0]} ignored={ignored} startup_ms={startup_ms:.1f} commits={writer.stats['commits']} commit_ms={writer.stats['seconds'] * 1000:.0f} cache_hits={cache_delta['hits']} cache_misses={cache_delta['misses']} coalesced={cache_delta['coalesced']} http_requests={http_delta['requests']} http_connections={http_delta['connections']} http_reuse={http_delta['reuse_rate']:.0%} http_throttled={http_delta['throttled']} rate_wait_ms={http_delta['wait_ms']} http_kb={http_delta['bytes'] / 1024:.0f} parse_ms={http_delta['parse_ms']:.0f} id_tried={id_delta['tried']} id_resolved={id_delta['resolved']}")
         # Double-check CSV if enabled on run
         if DOUBLE_CHECK_ON_RUN:
             activity_logger.info(f"Running CSV double-check in mode: {DOUBLE_CHECK_MODE}")
@@ -496,8 +533,9 @@ def main():
 
     if DELETE_CSV_ON_START:
         csv_path = "book_mentions.csv"
-        if os.path.exists(csv_path):
-            os.remove(csv_path)
+        store = get_book_store(csv_path)
+        if os.path.exists(csv_path) or len(store):
+            store.clear()
             activity_logger.info("Deleted book_mentions.csv at start of run due to config setting.")
         else:
             activity_logger.info("CSV deletion requested but book_mentions.csv does not exist.")
@@ -549,6 +587,8 @@ def livestream_subreddit():
     )
     subreddit = reddit.subreddit(SUBREDDIT_NAME)
     seen = set()
+    comment_counter = [0]
+    ignored_counter = [0]
     activity_logger.info(f"Livestreaming r/{SUBREDDIT_NAME} for new posts and comments...")
     for post in subreddit.stream.submissions(skip_existing=True):
         content = f"{post.title} {post.selftext}"
@@ -563,12 +603,16 @@ def livestream_subreddit():
                 activity_logger.info(f"[LIVE] Found book mention: {book['title']} by {book['author']}")
                 write_book_to_csv(book)
                 display_book(book)
-        process_comments(post, seen)
+        process_comments(post, seen, comment_counter, ignored_counter)
+        get_book_writer().commit()
 
 if __name__ == "__main__":
+    # Turn SIGTERM (sent by the GUI's Stop button) into a normal exit so buffered writes are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     try:
         main()
     except KeyboardInterrupt:
+        flush_book_writers()
         console.print("\nBot stopped by user.")
         activity_logger.info("Bot stopped by user.")
         exit(0)
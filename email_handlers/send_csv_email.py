@@ -1,6 +1,7 @@
 import configparser
 import os
 from .email_utils import send_email
+from book_store import get_book_store
 
 def send_csv_email():
     """
@@ -21,7 +22,8 @@ def send_csv_email():
         print("📧 CSV email sending is disabled in config.ini. Skipping.")
         return
 
-    csv_path = os.path.join(project_root, "book_mentions.csv")
+    # Regenerate the CSV from the store (needed when the SQLite backend is in use)
+    csv_path = get_book_store(os.path.join(project_root, "book_mentions.csv")).export_csv()
 
     if not os.path.exists(csv_path):
         print(f"⚠️ CSV file not found at {csv_path}. Cannot send report.")
@@ -1,6 +1,7 @@
 import configparser
 import os
 from .email_utils import send_email
+from book_store import get_book_store
 
 def send_full_report():
     # --- Load Config ---
@@ -19,7 +20,7 @@ def send_full_report():
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     
     # Start with the main CSV file
-    files_to_send = [os.path.join(project_root, "book_mentions.csv")]
+    files_to_send = [get_book_store(os.path.join(project_root, "book_mentions.csv")).export_csv()]
 
     # Add all files from the logs directory
     logs_dir = os.path.join(project_root, "logs")
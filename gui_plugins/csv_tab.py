@@ -1,117 +1,112 @@
 import customtkinter as ctk
 import csv
 import os
+import queue
+import threading
+import time
 from gui_plugins.scrollable_frame import ScrollableFrame
 from gui_plugins.user_plugins.lgbt_filter_tab import is_lgbt_filter_enabled, LGBT_TAGS
+from book_store import get_book_store
+from search_index import SearchIndex
+from tag_index import TagIndex, iter_row_ids
 
 CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "book_mentions.csv")
 DEFAULT_COLUMNS = [
     "title", "author", "isbn13", "tags", "cover_url", "romance_io_url", "google_books_url", "steam", "steam_rating", "datetime_added", "reddit_created_utc", "reddit_created_date"
 ]
+PAGE_SIZE = 15
+VISIBLE_COLUMNS = 5
+LOAD_CHUNK_ROWS = 2000
+LOAD_POLL_MS = 50
+DIRTY_BORDER_COLOR = "orange"
 
 def get_tab(parent):
     return {"name": "CSV Viewer", "frame": CSVTab(parent).frame, "top_level": True, "position": 3}
 
 class CSVTab:
+    """
+    Virtualized CSV viewer.
+    Rows are read by a background thread in chunks and handed to the UI thread
+    through a queue. The table is a fixed pool of PAGE_SIZE x VISIBLE_COLUMNS
+    entries built once; paging only re-binds their text, so a page flip costs
+    the same on a 50k-row file as on a 50-row one.
+    """
     def __init__(self, parent):
         self.frame = ScrollableFrame(parent, always_show_scrollbar=True, show_horizontal_scrollbar=True)
         self.inner = self.frame.inner
-        self.entries = []
-        self.header = []
-        self.current_columns = []  # List of selected column indices
+        self.header = list(DEFAULT_COLUMNS)
         self.current_page = 0      # Page index for rows
-        self.rows = []             # All rows loaded from CSV
-        self.column_dropdowns = [] # For dropdown widgets
-        self.column_selector_frame = None
-        self.pagination_frame = None
+        self.rows = []             # All rows loaded so far
+        self.filtered_rows = self.rows  # Rows after search/LGBT filtering
+        self.filtered_ids = None   # Row ids of filtered_rows (None: all rows, in order)
+        self.display_rows = []     # Rows bound to the widget pool
+        self.display_row_ids = []  # Their row ids, which the indexes and dirty use
+        self.display_indices = []  # Header indices bound to the pool's columns
+        self.dirty = {}            # row id -> (row, {col_idx: edited value})
+        self.loading = False
+        self._load_generation = 0
+        self._load_queue = queue.Queue()
+        self._cancel_load = threading.Event()
+        self._index_lock = threading.Lock()  # one index sync at a time, loader or save
         self.lgbt_filter_var = ctk.BooleanVar(value=is_lgbt_filter_enabled())
-        self.load_csv(initial=True)
+        self.search_var = ctk.StringVar()
+        self.search_index = SearchIndex()
+        self.tag_index = TagIndex()
+        self.build_ui()
+        self.load_csv()
 
-    def load_csv(self, initial=False):
-        # Clear previous widgets
-        for widget in self.inner.winfo_children():
-            widget.destroy()
-        self.entries = []
-        # Load CSV
-        if os.path.exists(CSV_PATH):
-            with open(CSV_PATH, newline='', encoding='utf-8') as f:
-                reader = list(csv.reader(f))
-                if reader:
-                    self.header = reader[0]
-                    self.rows = reader[1:]
-                else:
-                    self.header = DEFAULT_COLUMNS
-                    self.rows = []
-        else:
-            self.header = DEFAULT_COLUMNS
-            self.rows = []
-        # LGBT filter UI
+    def build_ui(self):
+        # Filter / search bar
         filter_frame = ctk.CTkFrame(self.inner, fg_color="transparent")
         filter_frame.grid(row=0, column=0, columnspan=10, sticky="w", pady=(0, 5))
-        filter_checkbox = ctk.CTkCheckBox(filter_frame, text="Show only LGBT books", variable=self.lgbt_filter_var, command=self.load_csv)
+        filter_checkbox = ctk.CTkCheckBox(filter_frame, text="Show only LGBT books", variable=self.lgbt_filter_var, command=self.apply_filters)
         filter_checkbox.pack(side="left", padx=(0, 10))
-        # Setup column selection (dropdowns for each slot)
-        if initial or not self.current_columns:
-            self.current_columns = list(range(min(5, len(self.header))))
-        if self.column_selector_frame:
-            self.column_selector_frame.destroy()
+        search_entry = ctk.CTkEntry(filter_frame, textvariable=self.search_var, width=220)
+        search_entry.pack(side="left", padx=(0, 5))
+        search_entry.bind("<Return>", lambda event: self.apply_filters())
+        ctk.CTkButton(filter_frame, text="Search", command=self.apply_filters, text_color="black", width=70).pack(side="left", padx=2)
+        ctk.CTkButton(filter_frame, text="Clear", command=self.clear_search, text_color="black", width=60).pack(side="left", padx=2)
+        # Column selection (dropdowns for each slot)
         self.column_selector_frame = ctk.CTkFrame(self.inner, fg_color="transparent")
         self.column_selector_frame.grid(row=1, column=0, columnspan=10, sticky="w", pady=(0, 5))
         ctk.CTkLabel(self.column_selector_frame, text="Select columns to display:", text_color="black").pack(side="left", padx=(0, 10))
         self.column_dropdowns = []
-        for slot in range(5):
-            var = ctk.StringVar()
-            if slot < len(self.current_columns):
-                var.set(self.header[self.current_columns[slot]])
-            else:
-                var.set(self.header[0])
+        self.column_menus = []
+        for slot in range(VISIBLE_COLUMNS):
+            var = ctk.StringVar(value=self.header[slot])
             dropdown = ctk.CTkOptionMenu(self.column_selector_frame, values=self.header, variable=var, command=lambda value, s=slot: self.update_columns_dropdown(s, value))
             dropdown.pack(side="left", padx=2)
             self.column_dropdowns.append(var)
-        # Setup pagination controls
-        if self.pagination_frame:
-            self.pagination_frame.destroy()
+            self.column_menus.append(dropdown)
+        # Pagination controls
         self.pagination_frame = ctk.CTkFrame(self.inner, fg_color="transparent")
         self.pagination_frame.grid(row=2, column=0, columnspan=10, sticky="w", pady=(0, 5))
-        prev_btn = ctk.CTkButton(self.pagination_frame, text="Prev", command=self.prev_page, text_color="black")
-        prev_btn.pack(side="left", padx=2)
-        page_label = ctk.CTkLabel(self.pagination_frame, text=f"Page {self.current_page+1}", text_color="black")
-        page_label.pack(side="left", padx=5)
-        next_btn = ctk.CTkButton(self.pagination_frame, text="Next", command=self.next_page, text_color="black")
-        next_btn.pack(side="left", padx=2)
-        # LGBT filter logic
-        def is_lgbt_row(row):
-            try:
-                tags_idx = self.header.index("tags")
-                tags = row[tags_idx].lower().split(',') if row[tags_idx] else []
-                return any(tag.strip() in LGBT_TAGS for tag in tags)
-            except Exception:
-                return False
-        filtered_rows = self.rows
-        if self.lgbt_filter_var.get():
-            filtered_rows = [row for row in self.rows if is_lgbt_row(row)]
-        # Display selected columns and paginated rows
-        display_columns = [var.get() for var in self.column_dropdowns if var.get() in self.header]
-        display_indices = [self.header.index(col) for col in display_columns if col in self.header]
-        start_row = self.current_page * 15
-        end_row = start_row + 15
-        display_rows = filtered_rows[start_row:end_row]
-        # Header row
-        for col, name in enumerate(display_columns):
-            ctk.CTkLabel(self.inner, text=name, text_color="black", font=ctk.CTkFont(weight="bold")).grid(row=3, column=col, padx=2, pady=2)
-        # Data rows
-        for r, row in enumerate(display_rows):
+        ctk.CTkButton(self.pagination_frame, text="Prev", command=self.prev_page, text_color="black").pack(side="left", padx=2)
+        self.page_label = ctk.CTkLabel(self.pagination_frame, text="Page 1", text_color="black")
+        self.page_label.pack(side="left", padx=5)
+        ctk.CTkButton(self.pagination_frame, text="Next", command=self.next_page, text_color="black").pack(side="left", padx=2)
+        self.count_label = ctk.CTkLabel(self.pagination_frame, text="", text_color="gray")
+        self.count_label.pack(side="left", padx=10)
+        # Fixed widget pool: header labels plus PAGE_SIZE rows of entries
+        self.header_labels = []
+        for col in range(VISIBLE_COLUMNS):
+            label = ctk.CTkLabel(self.inner, text="", text_color="black", font=ctk.CTkFont(weight="bold"))
+            label.grid(row=3, column=col, padx=2, pady=2)
+            self.header_labels.append(label)
+        self.entries = []
+        for r in range(PAGE_SIZE):
             row_entries = []
-            for c, col_idx in enumerate(display_indices):
-                value = row[col_idx] if col_idx < len(row) else ""
+            for c in range(VISIBLE_COLUMNS):
                 e = ctk.CTkEntry(self.inner, width=120)
-                e.insert(0, value)
-                e.grid(row=r+4, column=c, padx=2, pady=2)
+                e.grid(row=r + 4, column=c, padx=2, pady=2)
+                e.bind("<KeyRelease>", lambda event, r=r, c=c: self.mark_dirty(r, c))
+                e.bind("<FocusOut>", lambda event, r=r, c=c: self.mark_dirty(r, c))
                 row_entries.append(e)
             self.entries.append(row_entries)
-        # Place Save/Reload/Export buttons at the next available row
+        self.entry_border_color = self.entries[0][0].cget("border_color")
+        # Save/Reload/Export buttons below the pool
         btn_frame = ctk.CTkFrame(self.inner, fg_color="transparent")
-        btn_frame.grid(row=len(display_rows)+4, column=0, columnspan=len(display_columns) if display_columns else 1, pady=10, sticky="w")
+        btn_frame.grid(row=PAGE_SIZE + 4, column=0, columnspan=VISIBLE_COLUMNS, pady=10, sticky="w")
         self.save_button = ctk.CTkButton(btn_frame, text="Save Changes", command=self.save_csv, text_color="black")
         self.save_button.pack(side="left", padx=10)
         self.reload_button = ctk.CTkButton(btn_frame, text="Reload", command=self.reload_csv, text_color="black")
@@ -119,7 +114,140 @@ class CSVTab:
         self.export_button = ctk.CTkButton(btn_frame, text="Export with LGBT Column", command=self.export_csv_with_lgbt, text_color="black")
         self.export_button.pack(side="left", padx=10)
         self.status_label = ctk.CTkLabel(self.inner, text="", text_color="green")
-        self.status_label.grid(row=len(display_rows)+5, column=0, columnspan=len(display_columns) if display_columns else 1, pady=(0, 10), sticky="w")
+        self.status_label.grid(row=PAGE_SIZE + 5, column=0, columnspan=VISIBLE_COLUMNS, pady=(0, 10), sticky="w")
+
+    def load_csv(self):
+        # Start a fresh background load; chunks from an older load are ignored
+        self._cancel_load.set()
+        self._cancel_load = threading.Event()
+        self._load_generation += 1
+        self.rows = []
+        self.filtered_rows = self.rows
+        self.filtered_ids = None
+        self.dirty = {}
+        self.loading = True
+        self.count_label.configure(text="Loading...")
+        threading.Thread(target=self._load_rows, args=(self._load_generation, self._cancel_load), daemon=True).start()
+        self.frame.after(LOAD_POLL_MS, self._poll_loader, self._load_generation)
+        self.show_page()
+
+    def _load_rows(self, generation, cancel):
+        # Runs on the loader thread: never touches widgets
+        records = []
+        try:
+            for chunk in get_book_store(CSV_PATH).iter_rows(LOAD_CHUNK_ROWS):
+                if not self._is_current_load(generation, cancel):
+                    return
+                records.extend(chunk)
+                self._load_queue.put((generation, 'rows', chunk))
+            with self._index_lock:
+                # A newer load owns the indexes now; don't overwrite them with this one's rows
+                if not self._is_current_load(generation, cancel):
+                    return
+                self.search_index.sync(records)
+                self.tag_index.sync([record.get('tags') for record in records])
+            self._load_queue.put((generation, 'done', None))
+        except Exception as e:
+            if self._is_current_load(generation, cancel):
+                self._load_queue.put((generation, 'error', str(e)))
+
+    def _is_current_load(self, generation, cancel):
+        return not cancel.is_set() and generation == self._load_generation
+
+    def _poll_loader(self, generation):
+        if generation != self._load_generation:
+            return  # a newer load has its own poll loop
+        refresh = False
+        while True:
+            try:
+                item_generation, kind, payload = self._load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item_generation != generation:
+                continue
+            if kind == 'rows':
+                if not self.rows and payload:
+                    self.set_header(list(payload[0].keys()))
+                self.rows.extend([record.get(col, '') or '' for col in self.header] for record in payload)
+                # Only the visible page needs re-binding, and only while it is not full yet
+                refresh = refresh or len(self.display_rows) < PAGE_SIZE
+            elif kind == 'done':
+                self.loading = False
+                self.apply_filters(reset_page=False)
+            elif kind == 'error':
+                self.loading = False
+                self.status_label.configure(text=f"Error loading CSV: {payload}", text_color="red")
+        if self.loading:
+            self.count_label.configure(text=f"Loading... {len(self.rows):,} rows")
+            if refresh:
+                self.show_page()
+            self.frame.after(LOAD_POLL_MS, self._poll_loader, generation)
+
+    def set_header(self, header):
+        self.header = header
+        for slot, (var, menu) in enumerate(zip(self.column_dropdowns, self.column_menus)):
+            menu.configure(values=self.header)
+            if var.get() not in self.header:
+                var.set(self.header[min(slot, len(self.header) - 1)])
+
+    def apply_filters(self, reset_page=True):
+        # Filters work on row ids; the indexes are only complete once loading has finished
+        row_ids = None
+        query = self.search_var.get().strip()
+        if query and not self.loading:
+            # Ranked matches from the inverted index, best first
+            row_ids = [row_id for row_id, _ in self.search_index.search(query) if row_id < len(self.rows)]
+        if self.lgbt_filter_var.get() and not self.loading:
+            lgbt_ids = [row_id for row_id in iter_row_ids(self.tag_index.rows_with_any(LGBT_TAGS)) if row_id < len(self.rows)]
+            if row_ids is None:
+                row_ids = lgbt_ids
+            else:
+                lgbt_ids = set(lgbt_ids)
+                row_ids = [row_id for row_id in row_ids if row_id in lgbt_ids]
+        self.filtered_rows = self.rows if row_ids is None else [self.rows[row_id] for row_id in row_ids]
+        self.filtered_ids = row_ids
+        if reset_page:
+            self.current_page = 0
+        self.current_page = min(self.current_page, self.max_page())
+        self.show_page()
+
+    def clear_search(self):
+        self.search_var.set("")
+        self.apply_filters()
+
+    def max_page(self):
+        return max(0, (len(self.filtered_rows) - 1) // PAGE_SIZE)
+
+    def show_page(self):
+        # Re-bind the widget pool to the current page; constant work per flip
+        display_columns = [var.get() for var in self.column_dropdowns if var.get() in self.header]
+        display_indices = [self.header.index(col) for col in display_columns]
+        self.display_indices = display_indices
+        start_row = self.current_page * PAGE_SIZE
+        self.display_rows = self.filtered_rows[start_row:start_row + PAGE_SIZE]
+        if self.filtered_ids is None:
+            self.display_row_ids = list(range(start_row, start_row + len(self.display_rows)))
+        else:
+            self.display_row_ids = self.filtered_ids[start_row:start_row + PAGE_SIZE]
+        for c, label in enumerate(self.header_labels):
+            label.configure(text=display_columns[c] if c < len(display_columns) else "")
+        for r, row_entries in enumerate(self.entries):
+            row = self.display_rows[r] if r < len(self.display_rows) else None
+            edits = self.dirty[self.display_row_ids[r]][1] if row is not None and self.display_row_ids[r] in self.dirty else {}
+            for c, e in enumerate(row_entries):
+                e.delete(0, "end")
+                if row is None or c >= len(display_indices):
+                    e.grid_remove()
+                    continue
+                col_idx = display_indices[c]
+                # Unsaved edits survive page flips and are shown instead of the loaded value
+                value = edits.get(col_idx, row[col_idx] if col_idx < len(row) else "")
+                e.insert(0, value)
+                e.configure(border_color=DIRTY_BORDER_COLOR if col_idx in edits else self.entry_border_color)
+                e.grid()
+        self.page_label.configure(text=f"Page {self.current_page + 1} of {self.max_page() + 1}")
+        if not self.loading:
+            self.count_label.configure(text=f"{len(self.filtered_rows):,} of {len(self.rows):,} rows")
 
     def update_columns_dropdown(self, slot, value):
         # Prevent duplicate columns
@@ -133,62 +261,85 @@ class CSVTab:
                         if col not in selected:
                             var.set(col)
                             break
-        # Update current_columns to reflect dropdowns
-        self.current_columns = [self.header.index(var.get()) for var in self.column_dropdowns if var.get() in self.header]
-        self.load_csv(initial=False)
+        self.show_page()
 
     def next_page(self):
-        max_page = max(0, (len(self.rows) - 1) // 15)
-        if self.current_page < max_page:
+        if self.current_page < self.max_page():
             self.current_page += 1
-            self.load_csv(initial=False)
+            self.show_page()
 
     def prev_page(self):
         if self.current_page > 0:
             self.current_page -= 1
-            self.load_csv(initial=False)
+            self.show_page()
+
+    def mark_dirty(self, r, c):
+        # Record (or clear) the edit for one cell of the widget pool
+        if r >= len(self.display_rows) or c >= len(self.display_indices):
+            return
+        row = self.display_rows[r]
+        row_id = self.display_row_ids[r]
+        col_idx = self.display_indices[c]
+        value = self.entries[r][c].get()
+        original = row[col_idx] if col_idx < len(row) else ""
+        edits = self.dirty.setdefault(row_id, (row, {}))[1]
+        if value == original:
+            edits.pop(col_idx, None)
+            if not edits:
+                del self.dirty[row_id]
+        else:
+            edits[col_idx] = value
+        self.entries[r][c].configure(border_color=DIRTY_BORDER_COLOR if col_idx in edits else self.entry_border_color)
+        count = len(self.dirty)
+        self.status_label.configure(text=f"{count} unsaved row{'s' if count != 1 else ''}" if count else "", text_color="orange")
 
     def save_csv(self):
-        # Gather data from entries
-        data = [self.header]
-        # Only update the visible page's rows
-        start_row = self.current_page * 15
-        for i, row_entries in enumerate(self.entries):
-            row_data = [e.get() for e in row_entries]
-            # Update the correct columns in the backing data
-            row_idx = start_row + i
-            if row_idx < len(self.rows):
-                for col_pos, col_idx in enumerate(self.current_columns):
-                    if col_idx < len(self.rows[row_idx]):
-                        self.rows[row_idx][col_idx] = row_data[col_pos]
-        data.extend(self.rows)
-        with open(CSV_PATH, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(data)
+        # Only rows with edited cells are written, as keyed patches appended under the store's file lock
+        if not self.dirty:
+            self.status_label.configure(text="No changes to save.", text_color="gray")
+            self.status_label.after(3000, lambda: self.status_label.configure(text=""))
+            return
+        started = time.perf_counter()
+        title_idx = self.header.index("title")
+        author_idx = self.header.index("author")
+        patches = []
+        for row, edits in self.dirty.values():
+            fields = {self.header[col_idx]: value for col_idx, value in edits.items()}
+            patches.append((row[title_idx], row[author_idx], fields))
+        changed = get_book_store(CSV_PATH).update_rows(patches)
+        for row, edits in self.dirty.values():
+            for col_idx, value in edits.items():
+                row[col_idx] = value
+        if not self.loading:
+            # Only the edited rows are re-indexed
+            records = {row_id: dict(zip(self.header, row)) for row_id, (row, _) in self.dirty.items()}
+            with self._index_lock:
+                self.search_index.update_rows(records)
+                self.tag_index.update_rows({row_id: record.get('tags') for row_id, record in records.items()})
+        self.dirty = {}
+        self.show_page()
+        elapsed_ms = (time.perf_counter() - started) * 1000
         # Show confirmation
-        self.status_label.configure(text="Saved successfully!")
+        self.status_label.configure(text=f"Saved {changed} changed row{'s' if changed != 1 else ''} in {elapsed_ms:.0f} ms.", text_color="green")
         self.status_label.after(3000, lambda: self.status_label.configure(text=""))
 
     def reload_csv(self):
         self.current_page = 0
-        self.load_csv(initial=True)
+        self.load_csv()
 
     def export_csv_with_lgbt(self):
         # Export CSV with an extra 'is_lgbt' column
+        if self.loading:
+            self.status_label.configure(text="Still loading rows, try again in a moment.", text_color="orange")
+            return
+        lgbt_ids = set(iter_row_ids(self.tag_index.rows_with_any(LGBT_TAGS)))
         export_path = os.path.join(os.path.dirname(CSV_PATH), "book_mentions_with_lgbt.csv")
         header_with_lgbt = self.header + ["is_lgbt"]
-        def is_lgbt_row(row):
-            try:
-                tags_idx = self.header.index("tags")
-                tags = row[tags_idx].lower().split(',') if row[tags_idx] else []
-                return any(tag.strip() in LGBT_TAGS for tag in tags)
-            except Exception:
-                return False
         with open(export_path, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(header_with_lgbt)
-            for row in self.rows:
-                lgbt_val = "yes" if is_lgbt_row(row) else "no"
+            for row_id, row in enumerate(self.rows):
+                lgbt_val = "yes" if row_id in lgbt_ids else "no"
                 writer.writerow(row + [lgbt_val])
-        self.status_label.configure(text=f"Exported to {export_path}")
-        self.status_label.after(5000, lambda: self.status_label.configure(text="")) 
\ No newline at end of file
+        self.status_label.configure(text=f"Exported to {export_path}", text_color="green")
+        self.status_label.after(5000, lambda: self.status_label.configure(text=""))
@@ -7,6 +7,9 @@ import os
 import sys
 import signal
 from gui_plugins.scrollable_frame import ScrollableFrame
+from book_store import get_book_store
+from handlers.web_search.circuit_breaker import provider_health, PROVIDER_LABELS
+from handlers.web_search.provider_registry import provider_stats
 
 class DashboardTab:
     def __init__(self, parent):
@@ -46,6 +49,10 @@ class DashboardTab:
         self.last_email_label.pack(pady=(0, 0))
         self.last_email_csv_label = ctk.CTkLabel(inner, text="Last email with CSV: ...", text_color="black", font=ctk.CTkFont(size=13, weight="bold"))
         self.last_email_csv_label.pack(pady=(0, 0))
+        self.providers_label = ctk.CTkLabel(inner, text="Providers: ...", text_color="black", font=ctk.CTkFont(size=13, weight="bold"))
+        self.providers_label.pack(pady=(0, 0))
+        self.provider_stats_label = ctk.CTkLabel(inner, text="Lookup order: ...", text_color="black", font=ctk.CTkFont(size=13, weight="bold"))
+        self.provider_stats_label.pack(pady=(0, 0))
         # ---
         btn_frame = ctk.CTkFrame(inner, fg_color="transparent")
         btn_frame.pack(pady=10)
@@ -69,12 +76,7 @@ class DashboardTab:
         import os
         # Count books in CSV
         csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "book_mentions.csv")
-        books_count = 0
-        if os.path.exists(csv_path):
-            with open(csv_path, newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                next(reader, None)  # skip header
-                books_count = sum(1 for _ in reader)
+        books_count = len(get_book_store(csv_path))
         self.books_count_label.configure(text=f"Books in CSV: {books_count}")
         # Parse bot.log for stats
         log_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "bot.log")
@@ -104,6 +106,29 @@ class DashboardTab:
         self.ignored_comments_label.configure(text=f"Ignored comments: {ignored_comments if ignored_comments is not None else '...'}")
         self.last_email_label.configure(text=f"Last email sent: {last_email_time}")
         self.last_email_csv_label.configure(text=f"Last email with CSV: {last_email_csv_time}")
+        # Circuit breaker state of the enrichment providers, shared by all bot processes
+        providers = provider_health()
+        parts = []
+        for p in providers:
+            if p['state'] == 'open':
+                parts.append(f"{p['label']}: down (retry at {datetime.datetime.fromtimestamp(p['until']).strftime('%H:%M')})")
+            elif p['state'] == 'half-open':
+                parts.append(f"{p['label']}: recovering")
+            else:
+                parts.append(f"{p['label']}: OK")
+        any_down = any(p['state'] != 'closed' for p in providers)
+        self.providers_label.configure(text="Providers: " + " | ".join(parts), text_color="orange" if any_down else "black")
+        # Hit rate, latency and field coverage recorded by the provider registry, in auto order
+        parts = []
+        for p in provider_stats():
+            label = PROVIDER_LABELS.get(p['provider'], p['provider'])
+            if p['hit_rate'] is None:
+                parts.append(f"{label}: no lookups yet")
+                continue
+            latency = f", p50 {p['p50']:.2f}s, p95 {p['p95']:.2f}s" if p['p50'] is not None else ""
+            coverage = f", {p['coverage']:.0%} fields" if p['coverage'] is not None else ""
+            parts.append(f"{label}: {p['hit_rate']:.0%} hits{latency}{coverage}")
+        self.provider_stats_label.configure(text="Lookup order: " + (" → ".join(parts) if parts else "no lookups yet"))
 
     def refresh_version_and_update(self):
         # Get git commit hash
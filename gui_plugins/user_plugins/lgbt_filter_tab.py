@@ -1,9 +1,9 @@
 import customtkinter as ctk
 import configparser
 import os
+from tag_index import LGBT_TAGS
 
 CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'lgbt_filter_config.ini')
-LGBT_TAGS = {'lgbt', 'lgbtq', 'queer', 'gay', 'lesbian', 'trans', 'bisexual', 'nonbinary'}
 
 def is_lgbt_filter_enabled():
     config = configparser.ConfigParser()
@@ -4,10 +4,17 @@ import praw
 import datetime
 import os
 import re
+import time
 from book_utils import extract_books, update_csv_with_romance_bot, write_book_to_csv, activity_logger
-from handlers.web_search.openlibrary_handler import enrich_with_openlibrary
-from handlers.web_search.googlebooks_handler import enrich_with_googlebooks
-from handlers.web_search.romanceio_handler import enrich_with_romanceio
+from book_store import get_book_store, flush_book_writers, normalize_key
+from handlers.double_check_state import get_double_check_state, double_check_settings
+from handlers.gap_fill import plan_gap_fill, fill_gaps, isbn_requests
+from handlers.web_search.hedging import enrich_book
+from handlers.web_search.openlibrary_handler import lookup_isbns, normalize_isbn
+from handlers.curly_bracket_handler import ENRICH_PROVIDERS
+from handlers.web_search.cache import cache_stats, cache_stats_since
+from handlers.web_search.http_session import http_stats, http_stats_since
+from handlers.web_search.provider_registry import expected_lookups
 from rich.console import Console
 
 # Set up a dedicated logger for comment data (shared with other handlers)
@@ -29,73 +36,159 @@ def is_entry_missing_data(row):
         row.get('cover_url', 'N/A') in ('', 'N/A')
     )
 
+def _row_fields(row, enriched_book):
+    """The fields of `enriched_book` that would add to or change `row`."""
+    fields = {}
+    for key, value in enriched_book.items():
+        if value and value != 'N/A': # Only update if new data is meaningful
+            fields[key] = ', '.join(value) if isinstance(value, list) else value
+
+    # If subreddit is missing from the row, try to get it from the reddit_url
+    if not row.get('subreddit') and row.get('reddit_url'):
+        try:
+            match = re.search(r'/r/([^/]+)/', row['reddit_url'])
+            if match:
+                fields['subreddit'] = match.group(1)
+        except Exception:
+            pass # Ignore if regex fails
+    return {key: value for key, value in fields.items() if row.get(key) != value}
+
 def run_csv_double_check(mode='missing', csv_path='book_mentions.csv', praw_reddit=None):
     """
     Re-processes entries in the CSV to fill in missing data.
     mode: 'missing' (only incomplete entries) or 'all' (every entry).
+    In 'missing' mode only the missing fields are filled, each with the cheapest
+    request that can provide it (see gap_fill). In 'all' mode rows with an ISBN
+    are resolved with batched Open Library ISBN lookups; only rows without one
+    (or whose ISBN Open Library doesn't know) get a full search.
+    Updates and per-row state (see double_check_state) are saved every
+    `double_check_checkpoint_rows` rows, so an interrupted run resumes where it
+    stopped, and rows no provider could improve are backed off.
     """
     console.print(f"🔄 Running CSV double-check (mode: {mode})...")
     activity_logger.info(f"Running CSV double-check (mode: {mode})...")
     
-    if not os.path.exists(csv_path):
+    # Make sure anything buffered by a scan in this process is on disk first
+    flush_book_writers()
+    store = get_book_store(csv_path)
+    rows = store.all_rows()
+    if not rows:
         activity_logger.warning("CSV file not found for double-check.")
-        console.print("⚠️ CSV file not found, skipping double-check.")
-        return
-
-    try:
-        with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            rows = list(reader)
-            # Define fieldnames from the header of the existing CSV
-            fieldnames = reader.fieldnames
-            if 'subreddit' not in fieldnames:
-                 fieldnames.append('subreddit') # Backwards compatibility
-    except (FileNotFoundError, StopIteration):
         console.print("⚠️ CSV file is empty or missing, skipping double-check.")
         return
 
-    updates_made = False
-    for i, row in enumerate(rows):
+    settings = double_check_settings()
+    state = get_double_check_state()
+    run_started, rows_done, resumed = state.start_run(mode)
+    if resumed:
+        activity_logger.info(f"Resuming the interrupted double-check (mode: {mode}) after {rows_done} rows.")
+        console.print(f"⏩ Resuming the interrupted double-check after {rows_done} rows.")
+    row_states = state.rows()
+    now = time.time()
+
+    cache_before = dict(cache_stats)
+    http_before = dict(http_stats)
+    checked = updated = skipped_done = skipped_backoff = 0
+    to_check = []
+    for row in rows:
         if mode == 'missing' and not is_entry_missing_data(row):
             continue
 
         title, author = row.get('title'), row.get('author')
         if not title or not author:
             continue
+        row_state = row_states.get(normalize_key(title, author))
+        if row_state and row_state['last_attempt'] >= run_started:
+            skipped_done += 1  # already done by the interrupted run we are resuming
+            continue
+        if row_state and row_state['next_attempt'] > now:
+            skipped_backoff += 1
+            continue
+        checked += 1
+        to_check.append(row)
 
-        # Try to enrich the book data
-        enriched_book = enrich_with_openlibrary(title, author)
-        if not enriched_book:
-            enriched_book = enrich_with_romanceio(title, author)
-        if not enriched_book:
-            enriched_book = enrich_with_googlebooks(title, author)
+    # In 'missing' mode each row only asks for the fields it lacks, cheapest request first (see gap_fill);
+    # in 'all' mode rows with a known ISBN are resolved in bulk and the rest get a full-text search
+    plans = [(row, plan_gap_fill(row, ENRICH_PROVIDERS) if mode == 'missing' else None) for row in to_check]
+    isbn_rows = [(row, normalize_isbn(row.get('isbn13'))) for row in to_check]
+    batched_isbns = [isbn for (row, plan), (_, isbn) in zip(plans, isbn_rows)
+                     if isbn and (plan is None or any(step == 'isbn' for step, _ in plan))]
+    isbn_results = lookup_isbns(batched_isbns)
+    isbn_resolved = 0
+    searches = chain_rows = 0
+    patches = []
+    attempts = []
 
-        if enriched_book:
-            # Merge enriched data into the existing row, preserving original data
-            for key, value in enriched_book.items():
-                if value and value != 'N/A': # Only update if new data is meaningful
-                    row[key] = value
-            
-            # If subreddit is missing from the row, try to get it from the reddit_url
-            if not row.get('subreddit') and row.get('reddit_url'):
-                try:
-                    match = re.search(r'/r/([^/]+)/', row['reddit_url'])
-                    if match:
-                        row['subreddit'] = match.group(1)
-                except Exception:
-                    pass # Ignore if regex fails
+    def checkpoint():
+        # Rows first: if the state were saved first, a crash in between would skip their updates
+        if patches:
+            store.update_rows(patches)
+        if attempts:
+            state.checkpoint(mode, attempts)
+        patches.clear()
+        attempts.clear()
+
+    try:
+        for (row, plan), (_, isbn) in zip(plans, isbn_rows):
+            title, author = row.get('title'), row.get('author')
+            tried = []
+            if plan is not None:
+                fields, outcome = fill_gaps(row, plan, ENRICH_PROVIDERS, isbn_results, tried)
+                if fields:
+                    fields.update(_row_fields(row, {}))  # the subreddit, if the row lacks one
+                searches += sum(1 for name in tried if name != 'openlibrary_isbn')
+                if isbn_results.get(isbn):
+                    isbn_resolved += 1
+                # The full chain would have run for rows without an ISBN or whose ISBN Open Library doesn't know
+                if not isbn or (isbn in isbn_results and not isbn_results[isbn]):
+                    chain_rows += 1
+            else:
+                if isbn:
+                    tried.append('openlibrary_isbn')
+                    if isbn not in isbn_results:
+                        # the bulk request failed; try again next run rather than searching
+                        attempts.append((title, author, tried, 'error'))
+                        continue
+                enriched_book = isbn_results.get(isbn) if isbn else None
+                if enriched_book:
+                    isbn_resolved += 1
+                else:
+                    # Try to enrich the book data
+                    enriched_book, source = enrich_book(title, author, ENRICH_PROVIDERS, tried=tried)
+                # Merge enriched data into the existing row, preserving original data
+                fields = _row_fields(row, enriched_book) if enriched_book else {}
+                outcome = 'updated' if fields else ('unchanged' if enriched_book else 'not_found')
+
+            if fields:
+                patches.append((title, author, fields))
+                updated += 1
+                activity_logger.info(f"Double-check updated '{title}' by '{author}'.")
+            attempts.append((title, author, tried, outcome))
+            if len(attempts) >= settings['checkpoint_rows']:
+                checkpoint()
+        checkpoint()
+    except BaseException:
+        # Keep what was done so far; the next run resumes after it
+        try:
+            checkpoint()
+        except Exception as e:
+            activity_logger.error(f"Failed to save double-check progress: {e}")
+        raise
+    state.finish_run(mode)
 
-            rows[i] = row # Update the row in the list
-            updates_made = True
-            activity_logger.info(f"Double-check updated '{title}' by '{author}'.")
+    cache_delta = cache_stats_since(cache_before)
+    http_delta = http_stats_since(http_before)
+    if mode == 'missing':
+        # Requests the full chain would have needed for the same rows, vs. what gap filling sent
+        gap_requests = isbn_requests(len(batched_isbns)) + searches
+        baseline_requests = isbn_requests(sum(1 for _, isbn in isbn_rows if isbn)) + chain_rows * expected_lookups(ENRICH_PROVIDERS)
+        activity_logger.info(f"[STATS] gap_fill rows={len(to_check)} requests={gap_requests} baseline_requests={baseline_requests:.0f} requests_saved={max(0, baseline_requests - gap_requests):.0f}")
+    activity_logger.info(f"[STATS] double_check mode={mode} checked={checked} updated={updated} resumed={int(resumed)} skipped_done={skipped_done} skipped_backoff={skipped_backoff} cache_hits={cache_delta['hits']} cache_misses={cache_delta['misses']} coalesced={cache_delta['coalesced']} http_requests={http_delta['requests']} http_reuse={http_delta['reuse_rate']:.0%} http_kb={http_delta['bytes'] / 1024:.0f} parse_ms={http_delta['parse_ms']:.0f} isbn_rows={len(batched_isbns)} isbn_resolved={isbn_resolved}")
 
-    # After checking all rows, write the updated data back to the file
-    if updates_made:
+    # Updates were applied to the store as the run went; fold the journal into the CSV
+    if updated:
         try:
-            with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(rows)
+            store.compact()
             activity_logger.info("CSV double-check completed with updates.")
             console.print("✅ CSV double-check finished. Data was updated.")
         except Exception as e:
@@ -1,13 +1,22 @@
 import logging
-from book_utils import extract_books, write_book_to_csv, activity_logger, extract_romance_io_link
+from book_utils import extract_books, write_book_to_csv, activity_logger
+from book_store import normalize_key
 from handlers.web_search.openlibrary_handler import enrich_with_openlibrary
 from handlers.web_search.googlebooks_handler import enrich_with_googlebooks
 from handlers.web_search.romanceio_handler import enrich_with_romanceio
+from handlers.web_search.identifiers import enrich_mention, extract_identifiers, romance_link_for
 import datetime
 import os
 from rich.console import Console
 console = Console()
 
+# Providers for curly bracket mentions, in order of preference
+ENRICH_PROVIDERS = [
+    ('openlibrary', enrich_with_openlibrary),
+    ('romanceio', enrich_with_romanceio),
+    ('googlebooks', enrich_with_googlebooks),
+]
+
 # Set up a dedicated logger for comment data (shared with romance-bot handler)
 os.makedirs("logs", exist_ok=True)
 comment_data_logger = logging.getLogger("comment_data")
@@ -26,8 +35,12 @@ def is_curly_bracket_comment(item):
         content = item.selftext
     return extract_books(content)
 
-def handle_curly_bracket_comment(item, seen, ignored_counter=None):
-    """Handles posts or comments with curly bracket mentions."""
+def extract_curly_bracket_mentions(item, seen, ignored_counter=None):
+    """
+    Returns the new (title, author, context) mentions in a post or comment, where
+    context holds the reddit fields every book from this item gets. Mentions already
+    in `seen` are counted as ignored; the rest are added to it.
+    """
     content = ""
     if hasattr(item, 'body'): # It's a comment
         content = item.body
@@ -36,13 +49,18 @@ def handle_curly_bracket_comment(item, seen, ignored_counter=None):
 
     mentions = extract_books(content)
     if not mentions:
-        return
+        return []
 
     subreddit_name = item.subreddit.display_name
     reddit_created_utc = getattr(item, 'created_utc', None)
-    reddit_created_date = datetime.datetime.utcfromtimestamp(reddit_created_utc).isoformat() if reddit_created_utc else ''
-    romance_link = extract_romance_io_link(content)
-    reddit_url = f"https://reddit.com{getattr(item, 'permalink', '')}"
+    context = {
+        'reddit_created_utc': reddit_created_utc,
+        'reddit_created_date': datetime.datetime.utcfromtimestamp(reddit_created_utc).isoformat() if reddit_created_utc else '',
+        'reddit_url': f"https://reddit.com{getattr(item, 'permalink', '')}",
+        'subreddit': subreddit_name,
+        'identifiers': extract_identifiers(content),
+        'mention_count': len(mentions),
+    }
     
     # Log the raw data
     try:
@@ -51,36 +69,48 @@ def handle_curly_bracket_comment(item, seen, ignored_counter=None):
     except Exception as e:
         comment_data_logger.warning(f"[RAW DATA LOGGING FAILED] Could not log full object: {e}")
 
+    new_mentions = []
     for title, author in mentions:
-        key = (title.lower(), author.lower())
+        key = normalize_key(title, author)
         if key in seen:
             if ignored_counter is not None:
                 ignored_counter[0] += 1
             continue
         seen.add(key)
+        new_mentions.append((title, author, context))
+    return new_mentions
 
-        book = {'title': title, 'author': author}
-        
-        # Enrich book data
-        enriched_book = enrich_with_openlibrary(title, author)
-        if not enriched_book:
-            enriched_book = enrich_with_romanceio(title, author)
-        if not enriched_book:
-            enriched_book = enrich_with_googlebooks(title, author)
+def enrich_curly_bracket_mention(title, author, context):
+    """
+    Looks the mention up by any identifier in the item (see identifiers), then with
+    ENRICH_PROVIDERS (see provider_mode), and returns the book to write.
+    """
+    book = {'title': title, 'author': author}
+    
+    # Enrich book data
+    enriched_book, source = enrich_mention(title, author, ENRICH_PROVIDERS, context.get('identifiers', ()), context.get('mention_count'))
 
-        if enriched_book:
-            book.update(enriched_book)
-        
-        # Always add standard reddit data
-        book['reddit_created_utc'] = reddit_created_utc
-        book['reddit_created_date'] = reddit_created_date
-        book['reddit_url'] = reddit_url
-        book['subreddit'] = subreddit_name
-        # Always overwrite with a direct romance.io link if one was in the comment
-        if romance_link:
-            book['romance_io_url'] = romance_link
-        
-        activity_logger.info(f"Found mention for '{title}' by '{author}' in r/{subreddit_name}. Writing to CSV.")
-        added = write_book_to_csv(book)
-        if ignored_counter is not None and not added:
-            ignored_counter[0] += 1 
\ No newline at end of file
+    if enriched_book:
+        book.update(enriched_book)
+    
+    # Always add standard reddit data
+    book['reddit_created_utc'] = context['reddit_created_utc']
+    book['reddit_created_date'] = context['reddit_created_date']
+    book['reddit_url'] = context['reddit_url']
+    book['subreddit'] = context['subreddit']
+    # Always overwrite with a direct romance.io link if the comment had one for this book
+    romance_link = romance_link_for(title, context.get('identifiers', ()), context.get('mention_count'))
+    if romance_link:
+        book['romance_io_url'] = romance_link
+    return book
+
+def write_curly_bracket_book(book, ignored_counter=None):
+    activity_logger.info(f"Found mention for '{book['title']}' by '{book['author']}' in r/{book['subreddit']}. Writing to CSV.")
+    added = write_book_to_csv(book)
+    if ignored_counter is not None and not added:
+        ignored_counter[0] += 1
+
+def handle_curly_bracket_comment(item, seen, ignored_counter=None):
+    """Handles posts or comments with curly bracket mentions."""
+    for title, author, context in extract_curly_bracket_mentions(item, seen, ignored_counter):
+        write_curly_bracket_book(enrich_curly_bracket_mention(title, author, context), ignored_counter)
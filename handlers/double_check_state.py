@@ -0,0 +1,130 @@
+"""
+Per-row enrichment state for the CSV double-check, kept in a small SQLite
+database next to the CSV (`double_check_state_path` in the [general] section
+of config.ini).
+
+For every row it checks, the double-check records when it last tried, which
+providers it asked and what came of it:
+
+- updated: new data was written to the row;
+- unchanged: the providers found nothing the row didn't already have;
+- not_found: no provider found the book;
+- error: the lookup failed (e.g. the bulk ISBN request), try again next run.
+
+Rows that came back unchanged or not found are skipped for
+`double_check_retry_hours`, doubling after each further attempt (at most
+MAX_RETRY_DAYS), so books no provider knows stop costing lookups on every run.
+
+Each double-check mode has a run record. A run that was interrupted (crash,
+Ctrl+C, a cron job overlapping the next one) is resumed by the next run of
+the same mode, which skips the rows already attempted since it started.
+"""
+import configparser
+import os
+import sqlite3
+import threading
+import time
+from book_store import normalize_key
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKOFF_OUTCOMES = ('unchanged', 'not_found')
+MAX_RETRY_DAYS = 30
+
+_state = None
+_state_lock = threading.Lock()
+
+def double_check_settings():
+    config = configparser.ConfigParser()
+    config.read(os.path.join(ROOT_DIR, "config.ini"))
+
+    def number(option, default, kind):
+        try:
+            return kind(config.get('general', option, fallback='').strip() or default)
+        except ValueError:
+            return default
+    return {
+        'state_path': config.get('general', 'double_check_state_path', fallback='double_check_state.db').strip(),
+        'checkpoint_rows': max(1, number('double_check_checkpoint_rows', 25, int)),
+        'retry_hours': number('double_check_retry_hours', 6.0, float),
+    }
+
+class DoubleCheckState:
+    def __init__(self, path, retry_hours=6.0):
+        self.path = path
+        self.retry_seconds = retry_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS row_state ("
+                "title_key TEXT NOT NULL, author_key TEXT NOT NULL, last_attempt REAL NOT NULL, "
+                "providers TEXT, outcome TEXT, failures INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (title_key, author_key))")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "mode TEXT PRIMARY KEY, started_at REAL NOT NULL, checkpoint_at REAL, rows_done INTEGER NOT NULL DEFAULT 0, "
+                "finished INTEGER NOT NULL DEFAULT 0)")
+
+    def rows(self):
+        """(title_key, author_key) -> {'last_attempt', 'providers', 'outcome', 'failures', 'next_attempt'}."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT title_key, author_key, last_attempt, providers, outcome, failures, next_attempt FROM row_state")
+            return {
+                (title_key, author_key): {'last_attempt': last_attempt, 'providers': providers, 'outcome': outcome,
+                                          'failures': failures, 'next_attempt': next_attempt}
+                for title_key, author_key, last_attempt, providers, outcome, failures, next_attempt in cursor
+            }
+
+    def start_run(self, mode):
+        """Starts a run of `mode`, or resumes the unfinished one. Returns (started_at, rows_done, resumed)."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT started_at, rows_done, finished FROM runs WHERE mode = ?", (mode,)).fetchone()
+            if row and not row[2]:
+                return row[0], row[1], True
+            started_at = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs (mode, started_at, checkpoint_at, rows_done, finished) VALUES (?, ?, ?, 0, 0)",
+                (mode, started_at, started_at))
+            return started_at, 0, False
+
+    def checkpoint(self, mode, attempts):
+        """
+        Saves the outcome of a batch of rows, `attempts` being (title, author,
+        providers, outcome) tuples, and counts them towards the current run.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            for title, author, providers, outcome in attempts:
+                key = normalize_key(title, author)
+                row = self._conn.execute(
+                    "SELECT failures FROM row_state WHERE title_key = ? AND author_key = ?", key).fetchone()
+                failures = row[0] if row else 0
+                next_attempt = 0.0
+                if outcome in BACKOFF_OUTCOMES:
+                    failures += 1
+                    next_attempt = now + min(MAX_RETRY_DAYS * 86400, self.retry_seconds * 2 ** (failures - 1))
+                elif outcome == 'updated':
+                    failures = 0
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO row_state (title_key, author_key, last_attempt, providers, outcome, failures, next_attempt) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    key + (now, ','.join(providers), outcome, failures, next_attempt))
+            self._conn.execute("UPDATE runs SET checkpoint_at = ?, rows_done = rows_done + ? WHERE mode = ?",
+                               (now, len(attempts), mode))
+
+    def finish_run(self, mode):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE runs SET finished = 1, checkpoint_at = ? WHERE mode = ?", (time.time(), mode))
+
+def get_double_check_state():
+    global _state
+    with _state_lock:
+        if _state is None:
+            settings = double_check_settings()
+            path = settings['state_path'] or 'double_check_state.db'
+            if not os.path.isabs(path):
+                path = os.path.join(ROOT_DIR, path)
+            _state = DoubleCheckState(path, retry_hours=settings['retry_hours'])
+        return _state
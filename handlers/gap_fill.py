@@ -0,0 +1,94 @@
+"""
+Field-targeted gap filling for the CSV double-check in 'missing' mode.
+
+Instead of running the whole provider chain for every incomplete row, each
+row gets a plan: for each missing field (ISBN, tags, cover, romance.io link),
+the cheapest step that can fill it from what the row already has, cheapest
+first:
+
+- isbn: a row with an ISBN that lacks tags or a cover is resolved through the
+  bulk ISBN lookup (a share of one request per BIBKEYS_PER_REQUEST rows),
+  which only returns a cover Open Library actually has;
+- a provider search, only with providers that can return a missing field, in
+  `provider_order`: romance.io only for the romance.io link, Open Library and
+  Google Books for the rest.
+
+Steps whose fields have been filled by an earlier one are skipped, and only
+missing fields are written; existing values are never overwritten.
+"""
+import math
+from handlers.web_search.hedging import enrich_book
+from handlers.web_search.openlibrary_handler import normalize_isbn, BIBKEYS_PER_REQUEST
+from handlers.web_search.provider_registry import order_providers
+
+GAP_FIELDS = ('isbn13', 'tags', 'cover_url', 'romance_io_url')
+# Gap fields the bulk ISBN lookup and each search provider can fill in
+ISBN_FIELDS = {'tags', 'cover_url'}
+PROVIDER_FIELDS = {
+    'openlibrary': {'isbn13', 'tags', 'cover_url'},
+    'googlebooks': {'isbn13', 'tags', 'cover_url'},
+    'romanceio': {'romance_io_url'},
+}
+EMPTY_VALUES = (None, '', 'N/A', [])
+
+def missing_fields(row):
+    """The gap fields a row lacks (see is_entry_missing_data, which decides whether a row is checked at all)."""
+    return {field for field in GAP_FIELDS if row.get(field) in EMPTY_VALUES}
+
+def plan_gap_fill(row, providers):
+    """
+    Returns the steps for a row as (step, fields) pairs, cheapest first: step is
+    'isbn' or the name of one of `providers` ((name, lookup) pairs).
+    """
+    missing = missing_fields(row)
+    isbn = normalize_isbn(row.get('isbn13'))
+    plan = []
+    if isbn and missing & ISBN_FIELDS:
+        plan.append(('isbn', missing & ISBN_FIELDS))
+    for name, _ in order_providers(providers):
+        fields = PROVIDER_FIELDS.get(name, set(GAP_FIELDS)) & missing
+        if fields:
+            plan.append((name, fields))
+    return plan
+
+def fill_gaps(row, plan, providers, isbn_results, tried):
+    """
+    Runs a row's plan. `isbn_results` is the bulk ISBN lookup result and the
+    names of the providers asked are appended to `tried`. Returns
+    (fields, outcome) with outcome 'updated', 'unchanged', 'not_found' or
+    'error' (the bulk ISBN request for the row failed).
+    """
+    title, author = row.get('title'), row.get('author')
+    missing = missing_fields(row)
+    lookups = dict(providers)
+    fields = {}
+    found = False
+
+    def take(book, wanted):
+        for field in wanted:
+            value = book.get(field)
+            if value not in EMPTY_VALUES:
+                fields[field] = ', '.join(value) if isinstance(value, list) else value
+                missing.discard(field)
+
+    for step, step_fields in plan:
+        wanted = step_fields & missing
+        if not wanted:
+            continue
+        if step == 'isbn':
+            tried.append('openlibrary_isbn')
+            isbn = normalize_isbn(row.get('isbn13'))
+            if isbn not in isbn_results:
+                return fields, 'error'  # the bulk request failed; try again next run rather than searching
+            book = isbn_results[isbn]
+        else:
+            book, _ = enrich_book(title, author, [(step, lookups[step])], tried=tried)
+        if book:
+            found = True
+            take(book, wanted)
+    if fields:
+        return fields, 'updated'
+    return fields, 'unchanged' if found else 'not_found'
+
+def isbn_requests(isbn_count):
+    return math.ceil(isbn_count / BIBKEYS_PER_REQUEST)
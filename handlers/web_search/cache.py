@@ -0,0 +1,287 @@
+"""
+Disk-backed cache for web enrichment lookups.
+
+Results are keyed by provider plus the normalized (title, author) and kept in a
+small SQLite database (enrichment_cache.db by default) shared by the scanner,
+the double-check and the Bluesky scan. Found books are kept for
+`cache_hit_ttl_days`; "not found" answers are remembered for
+`cache_miss_ttl_hours` so the same unknown book is not looked up over and over.
+Lookups that failed (network errors, server errors) are never cached. The
+least recently used entries are evicted once the cache grows past
+`cache_max_entries`.
+
+Lookups are also single-flight: threads asking a provider for the same book
+at the same time share one call and its result, and a process that finds
+another process (a Bluesky scan, a double-check started from the web GUI)
+already looking the book up waits for that answer to land in the cache
+instead of sending its own request. cache_stats['coalesced'] counts lookups
+answered this way.
+"""
+import copy
+import functools
+import json
+import sqlite3
+import threading
+import time
+from book_store import normalize_key
+from book_utils import activity_logger
+from handlers.web_search.settings import enrichment_settings, resolve_path
+
+MISSING = object()
+EVICT_CHECK_EVERY = 100
+# A claim older than this is from a process that died mid-lookup
+CLAIM_TTL_SECONDS = 120
+# How long to wait for another process's answer before looking the book up ourselves
+CLAIM_WAIT_SECONDS = 45
+CLAIM_POLL_SECONDS = 0.2
+
+# Process-wide counters, reported in the [STATS] log lines
+cache_stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'stored': 0, 'evicted': 0, 'coalesced': 0}
+_stats_lock = threading.Lock()
+_local = threading.local()
+_cache = None
+_cache_lock = threading.Lock()
+# (provider, title_key, author_key) -> _Flight for lookups running in this process
+_flights = {}
+_flights_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        cache_stats[name] += amount
+
+def cache_stats_since(before):
+    """Counter deltas since `before` (a copy of cache_stats taken earlier)."""
+    with _stats_lock:
+        return {name: value - before.get(name, 0) for name, value in cache_stats.items()}
+
+def provider_calls():
+    """Number of lookups this thread has sent to a provider rather than answering from the cache."""
+    return getattr(_local, 'calls', 0)
+
+def lookup_failed():
+    """
+    Providers call this when a lookup failed rather than found nothing, so the
+    None they return is not cached as a "not found".
+    """
+    _local.failed = True
+
+class EnrichmentCache:
+    """Provider + (title, author) -> result dict (or None for "not found") with TTLs and LRU eviction."""
+    def __init__(self, path, hit_ttl_seconds, miss_ttl_seconds, max_entries):
+        self.path = path
+        self.hit_ttl_seconds = hit_ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS enrichment_cache ("
+                "provider TEXT NOT NULL, title_key TEXT NOT NULL, author_key TEXT NOT NULL, "
+                "value TEXT, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (provider, title_key, author_key))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_cache_accessed ON enrichment_cache (accessed_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS enrichment_inflight ("
+                "provider TEXT NOT NULL, title_key TEXT NOT NULL, author_key TEXT NOT NULL, claimed_at REAL NOT NULL, "
+                "PRIMARY KEY (provider, title_key, author_key))")
+        self.evict()
+
+    def get(self, provider, title, author):
+        """Returns the cached result, None for a cached "not found", or MISSING if there is no fresh entry."""
+        title_key, author_key = normalize_key(title, author)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM enrichment_cache WHERE provider = ? AND title_key = ? AND author_key = ?",
+                (provider, title_key, author_key)).fetchone()
+            if row is None:
+                return MISSING
+            value, stored_at = row
+            ttl = self.hit_ttl_seconds if value is not None else self.miss_ttl_seconds
+            if now - stored_at > ttl:
+                return MISSING
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE enrichment_cache SET accessed_at = ? WHERE provider = ? AND title_key = ? AND author_key = ?",
+                    (now, provider, title_key, author_key))
+        return json.loads(value) if value is not None else None
+
+    def put(self, provider, title, author, value):
+        title_key, author_key = normalize_key(title, author)
+        now = time.time()
+        encoded = json.dumps(value, ensure_ascii=False) if value is not None else None
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO enrichment_cache (provider, title_key, author_key, value, stored_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (provider, title_key, author_key, encoded, now, now))
+            self._writes += 1
+            if self._writes % EVICT_CHECK_EVERY == 0:
+                self.evict()
+        _count('stored')
+
+    def claim(self, provider, title, author):
+        """Marks a lookup as in flight. Returns False if another process is already doing it."""
+        title_key, author_key = normalize_key(title, author)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM enrichment_inflight WHERE provider = ? AND title_key = ? AND author_key = ? AND claimed_at < ?",
+                (provider, title_key, author_key, now - CLAIM_TTL_SECONDS))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO enrichment_inflight (provider, title_key, author_key, claimed_at) VALUES (?, ?, ?, ?)",
+                (provider, title_key, author_key, now))
+            return cursor.rowcount == 1
+
+    def release_claim(self, provider, title, author):
+        title_key, author_key = normalize_key(title, author)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM enrichment_inflight WHERE provider = ? AND title_key = ? AND author_key = ?",
+                (provider, title_key, author_key))
+
+    def wait_for(self, provider, title, author, timeout):
+        """Waits for another process's in-flight lookup. Returns its cached result, or MISSING if it never came."""
+        title_key, author_key = normalize_key(title, author)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(CLAIM_POLL_SECONDS)
+            cached = self.get(provider, title, author)
+            if cached is not MISSING:
+                return cached
+            with self._lock:
+                claimed = self._conn.execute(
+                    "SELECT 1 FROM enrichment_inflight WHERE provider = ? AND title_key = ? AND author_key = ?",
+                    (provider, title_key, author_key)).fetchone()
+            if not claimed:
+                return self.get(provider, title, author)  # finished (or failed) just now
+        return MISSING
+
+    def evict(self):
+        """Drops the least recently used entries once the cache is over `max_entries` (down to 90%)."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM enrichment_cache").fetchone()[0]
+            if count <= self.max_entries:
+                return 0
+            excess = count - int(self.max_entries * 0.9)
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM enrichment_cache WHERE rowid IN "
+                    "(SELECT rowid FROM enrichment_cache ORDER BY accessed_at LIMIT ?)", (excess,))
+        _count('evicted', excess)
+        activity_logger.info(f"Evicted {excess} least recently used entries from the enrichment cache.")
+        return excess
+
+    def clear(self, provider=None):
+        with self._lock, self._conn:
+            if provider:
+                self._conn.execute("DELETE FROM enrichment_cache WHERE provider = ?", (provider,))
+            else:
+                self._conn.execute("DELETE FROM enrichment_cache")
+
+def get_enrichment_cache():
+    """Returns the process-wide cache, or None if caching is disabled or the database can't be opened."""
+    global _cache
+    settings = enrichment_settings()
+    if not settings['cache_enabled']:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = EnrichmentCache(
+                    resolve_path(settings['cache_path']),
+                    hit_ttl_seconds=settings['cache_hit_ttl_days'] * 86400,
+                    miss_ttl_seconds=settings['cache_miss_ttl_hours'] * 3600,
+                    max_entries=settings['cache_max_entries'])
+            except sqlite3.Error as e:
+                activity_logger.warning(f"Enrichment cache disabled, could not open {settings['cache_path']}: {e}")
+                settings['cache_enabled'] = False
+                return None
+        return _cache
+
+class _Flight:
+    """A lookup running in this process that other threads can wait for."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = True
+
+def _lookup(cache, provider, func, title, author, args, kwargs):
+    """Runs the provider lookup (unless another process already is) and caches it. Returns (result, failed)."""
+    claimed = False
+    if cache is not None:
+        try:
+            claimed = cache.claim(provider, title, author)
+            if not claimed:
+                cached = cache.wait_for(provider, title, author, CLAIM_WAIT_SECONDS)
+                if cached is not MISSING:
+                    _count('coalesced')
+                    return cached, False
+        except sqlite3.Error as e:
+            activity_logger.warning(f"Enrichment cache claim failed for {provider}: {e}")
+    try:
+        _count('misses')
+        _local.calls = provider_calls() + 1
+        _local.failed = False
+        result = func(title, author, *args, **kwargs)
+        if cache is not None and (result is not None or not _local.failed):
+            try:
+                cache.put(provider, title, author, result)
+            except sqlite3.Error as e:
+                activity_logger.warning(f"Enrichment cache write failed for {provider}: {e}")
+        return result, _local.failed
+    finally:
+        if claimed:
+            try:
+                cache.release_claim(provider, title, author)
+            except sqlite3.Error as e:
+                activity_logger.warning(f"Enrichment cache claim release failed for {provider}: {e}")
+
+def cached_lookup(provider):
+    """Decorator for `lookup(title, author, ...)` functions that return a book dict or None."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(title, author, *args, **kwargs):
+            cache = get_enrichment_cache()
+            if cache is not None:
+                try:
+                    cached = cache.get(provider, title, author)
+                except sqlite3.Error as e:
+                    activity_logger.warning(f"Enrichment cache read failed for {provider}: {e}")
+                    cached = MISSING
+                if cached is not MISSING:
+                    _count('hits')
+                    if cached is None:
+                        _count('negative_hits')
+                    return cached
+
+            flight_key = (provider,) + normalize_key(title, author)
+            with _flights_lock:
+                flight = _flights.get(flight_key)
+                leader = flight is None
+                if leader:
+                    flight = _flights[flight_key] = _Flight()
+            if not leader:
+                flight.done.wait()
+                if not flight.failed:
+                    _count('coalesced')
+                    # Callers add their own fields to the book, so each gets its own copy
+                    return copy.deepcopy(flight.result)
+                # The shared lookup failed (or was cancelled); try again on our own
+                return _lookup(cache, provider, func, title, author, args, kwargs)[0]
+            try:
+                result, failed = _lookup(cache, provider, func, title, author, args, kwargs)
+                flight.result = copy.deepcopy(result)
+                flight.failed = failed
+                return result
+            finally:
+                with _flights_lock:
+                    _flights.pop(flight_key, None)
+                flight.done.set()
+        return wrapper
+    return decorator
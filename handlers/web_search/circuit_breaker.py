@@ -0,0 +1,157 @@
+"""
+Retry classification and per-provider circuit breakers for enrichment requests.
+
+Only transient failures (network errors, timeouts, HTTP 408/425/429/5xx) are
+worth retrying; anything else (a 4xx, a response that doesn't parse) fails the
+lookup straight away.
+
+Each provider has a breaker (see http_get). After `breaker_failures`
+consecutive network errors or 5xx answers it opens, and requests to that
+provider fail immediately with ProviderUnavailable for
+`breaker_cooldown_seconds` instead of each paying the full timeout. Then it
+goes half-open and lets a single probe request through: if that succeeds the
+breaker closes, otherwise it opens again. State changes are logged with a
+[BREAKER] prefix and saved next to the rate limiter state, so every bot
+process skips a provider that is down and the dashboards can show it.
+"""
+import threading
+import time
+import requests
+from book_utils import activity_logger
+from handlers.web_search.rate_limit import ProviderThrottled, get_state_store, PROVIDER_HOSTS
+from handlers.web_search.settings import enrichment_settings
+
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+PROVIDER_LABELS = {'openlibrary': 'Open Library', 'googlebooks': 'Google Books', 'romanceio': 'romance.io'}
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+class ProviderUnavailable(ProviderThrottled):
+    """Raised instead of sending a request while the provider's circuit breaker is open."""
+
+def is_transient(error=None, status=None):
+    """True if a request that failed with `error` or HTTP `status` may succeed when retried."""
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if isinstance(error, ProviderThrottled):
+        return False
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in TRANSIENT_STATUSES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, cooldown_seconds, store=None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.store = store
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.changed_at = 0.0
+        self._probe = None  # token of the half-open probe request in flight
+        self._applied_version = None
+        self._lock = threading.Lock()
+
+    def _apply_shared_state(self):
+        if self.store is None:
+            return
+        data, version = self.store.refresh()
+        if version == self._applied_version:
+            return
+        self._applied_version = version
+        entry = data.get(self.name, {})
+        # Another process changed the breaker more recently than we did
+        if entry.get('breaker_changed_at', 0.0) > self.changed_at:
+            self.state = entry.get('breaker', CLOSED)
+            self.open_until = entry.get('breaker_until', 0.0)
+            self.changed_at = entry['breaker_changed_at']
+            if self.state == CLOSED:
+                self.failures = 0
+
+    def _set_state(self, state):
+        self.state = state
+        self.changed_at = time.time()
+        if self.store is not None:
+            self.store.save(self.name, breaker=state, breaker_until=self.open_until, breaker_changed_at=self.changed_at)
+
+    def before_request(self):
+        """
+        Raises ProviderUnavailable if the request must not be sent. Returns a
+        probe token if the request is the half-open probe (None otherwise), to
+        be passed to record().
+        """
+        with self._lock:
+            self._apply_shared_state()
+            if self.state == OPEN:
+                if time.time() < self.open_until:
+                    raise ProviderUnavailable(f"{self.name} is unavailable (circuit breaker open)")
+                self._set_state(HALF_OPEN)
+                activity_logger.info(f"[BREAKER] {self.name} half-open, sending a probe request.")
+            if self.state == HALF_OPEN:
+                if self._probe is not None:
+                    raise ProviderUnavailable(f"{self.name} is unavailable (waiting for the probe request)")
+                self._probe = object()
+                return self._probe
+            return None
+
+    def record(self, healthy, probe=None):
+        """
+        Records the outcome of a request: True (answered), False (network error
+        or 5xx) or None (not sent). `probe` is what before_request returned.
+        """
+        with self._lock:
+            was_probe = probe is not None and probe is self._probe
+            if was_probe:
+                self._probe = None
+            if healthy is None:
+                return
+            # Only the probe decides whether an open breaker closes; a request sent before it opened doesn't count
+            if self.state != CLOSED and not was_probe:
+                return
+            if healthy:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._set_state(CLOSED)
+                    activity_logger.info(f"[BREAKER] {self.name} closed, the provider is answering again.")
+                return
+            self.failures += 1
+            if was_probe or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.open_until = time.time() + self.cooldown_seconds
+                self._set_state(OPEN)
+                activity_logger.warning(f"[BREAKER] {self.name} open after {self.failures} consecutive failures, skipping it for {self.cooldown_seconds:.0f}s.")
+
+def get_breaker(provider):
+    """Returns the process-wide breaker for a provider, or None if breakers are disabled."""
+    settings = enrichment_settings()
+    if settings['breaker_failures'] <= 0:
+        return None
+    store = get_state_store()
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(
+                provider,
+                failure_threshold=settings['breaker_failures'],
+                cooldown_seconds=settings['breaker_cooldown_seconds'],
+                store=store)
+        return _breakers[provider]
+
+def provider_health():
+    """
+    Breaker state of every provider as saved by any bot process, for the dashboards:
+    a list of {'provider', 'label', 'state', 'until'} dicts.
+    """
+    store = get_state_store()
+    data = store.refresh()[0] if store is not None else {}
+    health = []
+    for provider in PROVIDER_HOSTS.values():
+        entry = data.get(provider, {})
+        state = entry.get('breaker', CLOSED)
+        until = entry.get('breaker_until', 0.0)
+        if state == OPEN and until <= time.time():
+            state = HALF_OPEN  # the next request will probe it
+        health.append({'provider': provider, 'label': PROVIDER_LABELS.get(provider, provider), 'state': state, 'until': until})
+    return health
@@ -1,6 +1,11 @@
-import requests
 from book_utils import activity_logger
+from handlers.web_search.cache import cached_lookup, lookup_failed
+from handlers.web_search.http_session import http_get, parse_json
 
+# Partial response: only the volume fields the enricher reads
+VOLUME_FIELDS = 'items(volumeInfo(title,authors,industryIdentifiers,categories,imageLinks/thumbnail,infoLink))'
+
+@cached_lookup('googlebooks')
 def enrich_with_googlebooks(title, author):
     """
     Try to enrich book data using Google Books API.
@@ -8,13 +13,14 @@ def enrich_with_googlebooks(title, author):
     """
     params = {
         'q': f'intitle:{title} inauthor:{author}',
-        'maxResults': 1
+        'maxResults': 1,
+        'fields': VOLUME_FIELDS
     }
     url = 'https://www.googleapis.com/books/v1/volumes'
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = http_get(url, params=params)
         if r.ok:
-            items = r.json().get('items', [])
+            items = parse_json(r).get('items', [])
             if items:
                 volume = items[0]['volumeInfo']
                 isbn13 = next((id['identifier'] for id in volume.get('industryIdentifiers', []) if id['type'] == 'ISBN_13'), 'N/A')
@@ -27,6 +33,9 @@ def enrich_with_googlebooks(title, author):
                     'romance_io_url': '',
                     'google_books_url': volume.get('infoLink', '')
                 }
+        else:
+            lookup_failed()
     except Exception as e:
+        lookup_failed()
         activity_logger.error(f"Google Books lookup failed for {title} by {author}: {e}")
     return None 
\ No newline at end of file
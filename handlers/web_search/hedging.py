@@ -0,0 +1,168 @@
+"""
+Runs the enrichment providers for a book according to `provider_mode` in the
+[enrichment] section of config.ini:
+
+- sequential: one provider at a time, in order, until one finds the book.
+- hedged: the first provider starts right away; the next one starts when the
+  previous one comes back empty or has not answered within `hedge_delay_ms`.
+- race: every provider starts at once.
+
+Outside sequential mode the first provider to find the book wins and the
+others are cancelled: lookups that have not started are dropped, and running
+ones stop at their next retry (see lookup_cancelled). With `merge_results` all
+providers are queried and their answers merged field by field instead, earlier
+providers taking precedence.
+
+The chain is first put in the order set by `provider_order` (see
+provider_registry), and every lookup is recorded there. Before that, a chain
+with Open Library in it checks the local Open Library index (see
+openlibrary_local): no provider is asked about a book the index knows,
+whatever the order.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from book_utils import activity_logger
+from handlers.web_search.cache import provider_calls
+from handlers.web_search.openlibrary_local import lookup_local
+from handlers.web_search.provider_registry import get_provider_registry, order_providers
+from handlers.web_search.settings import enrichment_settings
+
+EMPTY_VALUES = (None, '', 'N/A', [])
+# The provider the local index answers for
+LOCAL_PROVIDER = 'openlibrary'
+
+_local = threading.local()
+_pool = None
+_pool_lock = threading.Lock()
+
+def lookup_cancelled():
+    """True inside a hedged lookup that another provider has already answered."""
+    cancel = getattr(_local, 'cancel', None)
+    return cancel is not None and cancel.is_set()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Enough for every provider of each concurrent scan worker
+            workers = max(4, enrichment_settings()['http_pool_size'] * 3)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='provider')
+        return _pool
+
+def _timed_lookup(name, func, title, author):
+    """Runs one provider lookup and records its outcome in the provider registry, unless it was cancelled."""
+    calls = provider_calls()
+    started = time.perf_counter()
+    book = func(title, author)
+    # Cache answers say nothing about the provider's latency
+    elapsed = time.perf_counter() - started if provider_calls() > calls else None
+    # A lookup cut short because another provider answered first is not a miss
+    if not lookup_cancelled():
+        get_provider_registry().record(name, book, elapsed)
+    return book
+
+def _run_provider(name, func, title, author, cancel):
+    _local.cancel = cancel
+    try:
+        return _timed_lookup(name, func, title, author)
+    finally:
+        _local.cancel = None
+
+def merge_books(results):
+    """Merges (source, book) pairs field by field; a field is only taken from a later book if it is still empty."""
+    merged = {}
+    for source, book in results:
+        for key, value in book.items():
+            if merged.get(key) in EMPTY_VALUES and value not in EMPTY_VALUES:
+                merged[key] = value
+            else:
+                merged.setdefault(key, value)
+    return merged
+
+def _finish(results, providers):
+    found = [(name, results[name]) for name, _ in providers if results.get(name)]
+    if not found:
+        return None, None
+    if len(found) == 1:
+        return found[0][1], found[0][0]
+    return merge_books(found), found[0][0]
+
+def enrich_book(title, author, providers, mode=None, hedge_delay=None, merge=None, tried=None):
+    """
+    Looks a book up with `providers`, a list of (name, lookup(title, author)) in
+    order of preference (used for merging; the lookup order follows
+    `provider_order`). Returns (book, source), where source is the name of the
+    provider the book came from (the first contributing one when merging), or
+    (None, None) if no provider found it. The names of the providers that were
+    started are appended to `tried` if given.
+    """
+    settings = enrichment_settings()
+    mode = (mode or settings['provider_mode']).lower()
+    hedge_delay = settings['hedge_delay_ms'] / 1000 if hedge_delay is None else hedge_delay
+    merge = settings['merge_results'] if merge is None else merge
+    local = lookup_local(title, author) if any(name == LOCAL_PROVIDER for name, _ in providers) else None
+    if local:
+        if tried is not None:
+            tried.append(LOCAL_PROVIDER)
+        if not merge:
+            return local, LOCAL_PROVIDER
+        # Merging still asks the other providers; Open Library's answer is the local one
+        providers = [(name, (lambda t, a: local) if name == LOCAL_PROVIDER else func) for name, func in providers]
+    preference, providers = providers, order_providers(providers)
+
+    if mode not in ('hedged', 'race') or len(providers) == 1:
+        results = {}
+        for name, func in providers:
+            if tried is not None:
+                tried.append(name)
+            results[name] = _timed_lookup(name, func, title, author)
+            if results[name] and not merge:
+                return results[name], name
+        return _finish(results, preference)
+
+    pool = _get_pool()
+    cancel = threading.Event()
+    pending = {}
+    results = {}
+    next_index = 0
+    last_start = 0.0
+
+    def start_next():
+        nonlocal next_index, last_start
+        name, func = providers[next_index]
+        if tried is not None:
+            tried.append(name)
+        pending[pool.submit(_run_provider, name, func, title, author, cancel)] = name
+        next_index += 1
+        last_start = time.monotonic()
+
+    start_next()
+    while mode == 'race' and next_index < len(providers):
+        start_next()
+
+    while pending:
+        timeout = None
+        if next_index < len(providers):
+            timeout = max(0.0, last_start + hedge_delay - time.monotonic())
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            # Hedge: the running providers are slow, start the next one alongside them
+            start_next()
+            continue
+        for future in done:
+            name = pending.pop(future)
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                activity_logger.error(f"{name} lookup failed for {title} by {author}: {e}")
+                results[name] = None
+            if not results[name] and next_index < len(providers):
+                start_next()
+        if not merge and any(results.get(name) for name, _ in providers):
+            winner = next(name for name, _ in providers if results.get(name))
+            cancel.set()
+            for future in pending:
+                future.cancel()
+            return results[winner], winner
+    return _finish(results, preference)
@@ -0,0 +1,136 @@
+"""
+Shared HTTP client for the enrichment providers.
+
+All lookups go through one module-level requests.Session, so connections to
+openlibrary.org, googleapis.com and romance.io are kept alive and reused
+instead of paying a new TCP + TLS handshake per lookup. Every request gets the
+User-Agent and the connect/read timeouts from the [enrichment] section of
+config.ini unless the caller passes its own, waits for the provider's rate
+limiter (see rate_limit.py) and fails fast while the provider's circuit
+breaker is open (see circuit_breaker.py). http_stats counts requests, newly opened
+connections, 429 responses, time spent waiting for the limiters, bytes
+received (as sent over the wire, i.e. still compressed) and time spent
+parsing responses so they can be logged.
+"""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from handlers.web_search.settings import enrichment_settings
+from handlers.web_search.rate_limit import limiter_for_url, provider_for_url
+from handlers.web_search.circuit_breaker import get_breaker, is_transient
+
+http_stats = {'requests': 0, 'connections': 0, 'throttled': 0, 'wait_ms': 0, 'bytes': 0, 'parse_ms': 0.0}
+_stats_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+def _count(name, amount=1):
+    with _stats_lock:
+        http_stats[name] += amount
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count('connections')
+        return super()._new_conn()
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose per-host pools count the connections they open."""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+def get_http_session():
+    """Returns the process-wide session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            settings = enrichment_settings()
+            session = requests.Session()
+            # One pool per host; pool_maxsize connections kept alive per host for concurrent lookups
+            adapter = _PooledAdapter(pool_connections=8, pool_maxsize=settings['http_pool_size'])
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = settings['user_agent']
+            _session = session
+        return _session
+
+def default_timeout():
+    settings = enrichment_settings()
+    return (settings['http_connect_timeout'], settings['http_read_timeout'])
+
+def http_get(url, params=None, timeout=None, **kwargs):
+    """GET through the shared session with the configured timeouts, rate limit and circuit breaker."""
+    provider = provider_for_url(url)
+    breaker = get_breaker(provider) if provider else None
+    limiter = limiter_for_url(url)
+    probe = breaker.before_request() if breaker is not None else None
+    try:
+        if limiter is not None:
+            waited = limiter.acquire()
+            if waited:
+                _count('wait_ms', int(waited * 1000))
+    except BaseException:
+        if breaker is not None:
+            breaker.record(None, probe)
+        raise
+    _count('requests')
+    try:
+        response = get_http_session().get(url, params=params, timeout=timeout or default_timeout(), **kwargs)
+    except requests.exceptions.RequestException as e:
+        if limiter is not None:
+            limiter.release(error=True)
+        if breaker is not None:
+            breaker.record(False if is_transient(error=e) else None, probe)
+        raise
+    except BaseException:
+        if limiter is not None:
+            limiter.release()
+        if breaker is not None:
+            breaker.record(None, probe)
+        raise
+    _count('bytes', _wire_bytes(response))
+    if response.status_code == 429:
+        _count('throttled')
+    if limiter is not None:
+        limiter.release(response.status_code, response.headers.get('Retry-After'))
+    if breaker is not None:
+        # A 429 means the provider is up but throttling us; that's the rate limiter's job
+        breaker.record(response.status_code < 500 and response.status_code != 408, probe)
+    return response
+
+def _wire_bytes(response):
+    try:
+        # Bytes read from the socket, before gzip decoding
+        return response.raw.tell() or len(response.content)
+    except (AttributeError, TypeError):
+        return len(response.content)
+
+def count_parse_time(seconds):
+    """Adds time spent parsing a response (e.g. HTML) to http_stats['parse_ms']."""
+    _count('parse_ms', seconds * 1000)
+
+def parse_json(response):
+    """response.json(), timed into http_stats['parse_ms']."""
+    started = time.perf_counter()
+    try:
+        return response.json()
+    finally:
+        count_parse_time(time.perf_counter() - started)
+
+def http_stats_since(before):
+    """Request/connection deltas since `before` (a copy of http_stats) plus the connection reuse rate."""
+    with _stats_lock:
+        delta = {name: value - before.get(name, 0) for name, value in http_stats.items()}
+    reused = max(0, delta['requests'] - delta['connections'])
+    delta['reuse_rate'] = reused / delta['requests'] if delta['requests'] else 0.0
+    return delta
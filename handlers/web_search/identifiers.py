@@ -0,0 +1,121 @@
+"""
+Identifier fast path for book mentions.
+
+Posts and comments often carry an exact identifier next to the {Title by
+Author} mention: an ISBN, an Open Library or Goodreads link, or a romance.io
+link. enrich_mention resolves those with one exact-ID Open Library request
+(cached like any other lookup) before falling back to the fuzzy title/author
+search chain. A resolved book is only used if its title matches the mention,
+so a link to a different book in the same comment can't be attached to it.
+
+A romance.io link says which book it is for only through its slug, so it is
+only used for a mention when the text has no other mention or the slug starts
+with the mention's title (see romance_link_for). Then the link is attached to
+what the other providers find, and romance.io is only searched if none of them
+found the book.
+"""
+import re
+import threading
+from urllib.parse import urlparse
+from book_utils import extract_romance_io_link
+from handlers.web_search.hedging import enrich_book
+from handlers.web_search.openlibrary_handler import lookup_openlibrary_id, normalize_isbn
+
+# ISBN-13s are recognised anywhere, ISBN-10s only after "ISBN" (bare 10-digit numbers are too often something else)
+ISBN13_RE = re.compile(r'(?<![\w-])(97[89](?:[\s-]?\d){10})(?![\w-])')
+ISBN10_RE = re.compile(r'\bISBN(?:-?10)?:?\s*((?:\d[\s-]?){9}[\dXx])(?![\w-])', re.IGNORECASE)
+OPENLIBRARY_RE = re.compile(r'openlibrary\.org/(?:works|books)/(OL\d+[WM])\b')
+GOODREADS_RE = re.compile(r'goodreads\.com/book/show/(\d+)')
+
+# Process-wide counters, reported in the [STATS] log lines
+identifier_stats = {'tried': 0, 'resolved': 0}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        identifier_stats[name] += 1
+
+def identifier_stats_since(before):
+    with _stats_lock:
+        return {name: value - before.get(name, 0) for name, value in identifier_stats.items()}
+
+def _isbn_checksum_ok(isbn):
+    if len(isbn) == 13:
+        return sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(isbn)) % 10 == 0
+    return sum((10 - i) * (10 if d == 'X' else int(d)) for i, d in enumerate(isbn)) % 11 == 0
+
+def extract_identifiers(text):
+    """
+    Returns the identifiers in a post or comment as (kind, value) pairs, kind
+    being 'isbn', 'edition', 'work', 'goodreads' or 'romanceio'.
+    """
+    text = text or ''
+    identifiers = []
+    for match in list(ISBN13_RE.finditer(text)) + list(ISBN10_RE.finditer(text)):
+        isbn = normalize_isbn(match.group(1))
+        if isbn and _isbn_checksum_ok(isbn):
+            identifiers.append(('isbn', isbn))
+    for key in OPENLIBRARY_RE.findall(text):
+        identifiers.append(('work' if key.endswith('W') else 'edition', key))
+    for book_id in GOODREADS_RE.findall(text):
+        identifiers.append(('goodreads', book_id))
+    romance_link = extract_romance_io_link(text)
+    if romance_link:
+        identifiers.append(('romanceio', romance_link))
+    return list(dict.fromkeys(identifiers))
+
+def _words(title):
+    # Ignore a subtitle or series suffix: "Title: A Novel", "Title (Series #2)"
+    title = re.split(r'[:(\[]', title or '')[0]
+    return re.findall(r'\w+', title.lower())
+
+def title_matches(mention_title, book_title):
+    """True if both titles have the same words, ignoring case, punctuation and any subtitle or series suffix."""
+    mention = _words(mention_title)
+    return bool(mention) and mention == _words(book_title)
+
+def romance_link_for(title, identifiers, mention_count=None):
+    """
+    The romance.io link among `identifiers` if it belongs to this mention: the
+    text mentions only this book (`mention_count` is 1) or the link's slug
+    starts with the title. Otherwise ''.
+    """
+    link = next((value for kind, value in identifiers if kind == 'romanceio'), '')
+    if not link or mention_count == 1:
+        return link
+    slug = re.findall(r'[a-z0-9]+', urlparse(link).path.rstrip('/').rsplit('/', 1)[-1].lower())
+    words = _words(title)
+    return link if words and slug[:len(words)] == words else ''
+
+def resolve_mention(title, identifiers):
+    """Returns the book one of `identifiers` resolves to if its title matches the mention's, otherwise None."""
+    for kind, value in identifiers:
+        if kind == 'romanceio':
+            continue
+        _count('tried')
+        book = lookup_openlibrary_id(value, kind)
+        if book and title_matches(title, book.get('title')):
+            _count('resolved')
+            return book
+    return None
+
+def enrich_mention(title, author, providers, identifiers=(), mention_count=None):
+    """
+    enrich_book with the identifier fast path in front: returns (book, source)
+    like enrich_book, source being 'openlibrary' for books resolved by identifier.
+    `mention_count` is the number of mentions in the text the identifiers came from.
+    """
+    book = resolve_mention(title, identifiers)
+    if book:
+        return book, 'openlibrary'
+    romance_link = romance_link_for(title, identifiers, mention_count)
+    if not romance_link:
+        return enrich_book(title, author, providers)
+    # The link already is what a romance.io search would find, so only search it if nothing else knows the book
+    others = [p for p in providers if p[0] != 'romanceio']
+    book, source = enrich_book(title, author, others) if others else (None, None)
+    if not book:
+        book, source = enrich_book(title, author, [p for p in providers if p[0] == 'romanceio'])
+    if book:
+        book['romance_io_url'] = romance_link
+    return book, source
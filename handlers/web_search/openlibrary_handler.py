@@ -1,21 +1,69 @@
-import requests
-import time
+import re
+import sqlite3
 from book_utils import activity_logger
+from handlers.web_search.cache import cached_lookup, lookup_failed, get_enrichment_cache, MISSING
+from handlers.web_search.http_session import http_get, parse_json
+from handlers.web_search.hedging import lookup_cancelled
+from handlers.web_search.rate_limit import ProviderThrottled, wait_before_retry
+from handlers.web_search.circuit_breaker import is_transient
+from handlers.web_search.openlibrary_local import lookup_local, lookup_local_isbn
+from handlers.web_search.settings import enrichment_settings
 
-def enrich_with_openlibrary(title, author, retries=3, delay=2):
+# Only what the enrichers read, and a few candidates to pick the best title/author match from
+SEARCH_FIELDS = 'title,author_name,subject,cover_i,isbn'
+SEARCH_LIMIT = 5
+# ISBNs resolved per api/books request; keeps the URL well under common length limits
+BIBKEYS_PER_REQUEST = 100
+
+def _book_from_search_doc(doc, title, author):
+    isbn_list = doc.get("isbn", [])
+    isbn13 = next((i for i in isbn_list if len(i) == 13), None)
+    isbn10 = next((i for i in isbn_list if len(i) == 10), None)
+    isbn_value = isbn13 or isbn10 or (isbn_list[0] if isbn_list else "N/A")
+    return {
+        "title": doc.get("title", title),
+        "author": ", ".join(doc.get("author_name", [author])),
+        "tags": doc.get("subject", [])[:10],
+        "cover_url": f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-L.jpg" if doc.get("cover_i") else "N/A",
+        "isbn13": isbn_value
+    }
+
+@cached_lookup('openlibrary')
+def enrich_with_openlibrary(title, author, retries=3):
     """
     Try to enrich book data using Open Library API.
-    Returns a dict with book data or None if not found.
+    Returns a dict with book data or None if not found. Transient failures are
+    retried once the rate limiter's backoff for Open Library has passed (or,
+    with rate limiting disabled, after backoff_delay).
     """
-    url = f"https://openlibrary.org/search.json?title={title}&author={author}"
+    local = lookup_local(title, author)
+    if local:
+        return local
+    if enrichment_settings()['openlibrary_offline']:
+        # Not in the local dump; don't remember that as "not found" in case a newer dump has it
+        lookup_failed()
+        return None
+    url = "https://openlibrary.org/search.json"
+    params = {'title': title, 'author': author, 'fields': SEARCH_FIELDS, 'limit': SEARCH_LIMIT}
     for attempt in range(retries):
+        if lookup_cancelled():
+            # Another provider already answered; don't cache this as "not found"
+            lookup_failed()
+            return None
         try:
-            r = requests.get(url)
+            r = http_get(url, params=params)
             if not r.ok:
-                continue
-            docs = r.json().get("docs", [])
+                lookup_failed()
+                if is_transient(status=r.status_code):
+                    if attempt < retries - 1:
+                        wait_before_retry('openlibrary', attempt + 1)
+                    continue
+                activity_logger.error(f"Open Library lookup failed for {title} by {author}: HTTP {r.status_code}")
+                return None
+            docs = parse_json(r).get("docs", [])
             if not docs:
-                continue
+                # Open Library has no such book, retrying won't change that
+                return None
             doc = None
             for d in docs:
                 doc_title = d.get("title", "").lower()
@@ -25,21 +73,124 @@ def enrich_with_openlibrary(title, author, retries=3, delay=2):
                     break
             if not doc:
                 doc = docs[0]  # fallback to first
-            isbn_list = doc.get("isbn", [])
-            isbn13 = next((i for i in isbn_list if len(i) == 13), None)
-            isbn10 = next((i for i in isbn_list if len(i) == 10), None)
-            isbn_value = isbn13 or isbn10 or (isbn_list[0] if isbn_list else "N/A")
-            return {
-                "title": doc.get("title", title),
-                "author": ", ".join(doc.get("author_name", [author])),
-                "tags": doc.get("subject", [])[:10],
-                "cover_url": f"https://covers.openlibrary.org/b/id/{doc['cover_i']}-L.jpg" if doc.get("cover_i") else "N/A",
-                "isbn13": isbn_value
-            }
+            return _book_from_search_doc(doc, title, author)
+        except ProviderThrottled as e:
+            lookup_failed()
+            activity_logger.warning(f"Open Library lookup skipped for {title} by {author}: {e}")
+            return None
         except Exception as e:
-            if attempt < retries - 1:
-                print(f"[INFO] Open Library API error, cooling down for {delay} seconds before retrying...")
-                time.sleep(delay)
-            else:
+            if attempt == retries - 1 or lookup_cancelled() or not is_transient(error=e):
+                lookup_failed()
                 activity_logger.error(f"Open Library lookup failed for {title} by {author}: {e}")
-    return None 
\ No newline at end of file
+                return None
+            wait_before_retry('openlibrary', attempt + 1)
+    return None 
+
+def normalize_isbn(value):
+    """Returns the ISBN-10/13 in `value` without dashes or spaces, or None if it isn't one."""
+    isbn = re.sub(r'[\s-]', '', value or '').upper()
+    if re.fullmatch(r'\d{13}|\d{9}[\dX]', isbn):
+        return isbn
+    return None
+
+def _book_from_bibkey_data(isbn, data):
+    subjects = [s['name'] if isinstance(s, dict) else s for s in data.get('subjects', [])]
+    cover = data.get('cover', {})
+    isbn_13 = data.get('identifiers', {}).get('isbn_13', [])
+    return {
+        "tags": subjects[:10],
+        "cover_url": cover.get('large') or cover.get('medium') or "N/A",
+        "isbn13": isbn_13[0] if isbn_13 else isbn,
+    }
+
+def lookup_isbns(isbns):
+    """
+    Resolves many ISBNs from the local Open Library index, then with batched
+    api/books?bibkeys= requests (unless `openlibrary_offline` is set).
+    Returns {isbn: book or None}; None means Open Library doesn't know the ISBN.
+    ISBNs whose request failed are left out. Books only carry the fields an ISBN
+    lookup can fill in (tags, cover_url, isbn13) and each ISBN is cached on its own.
+    """
+    cache = get_enrichment_cache()
+    results = {}
+    todo = []
+    offline = enrichment_settings()['openlibrary_offline']
+    for isbn in dict.fromkeys(isbns):
+        local = lookup_local_isbn(isbn)
+        if local or offline:
+            results[isbn] = local
+            continue
+        cached = MISSING
+        if cache is not None:
+            try:
+                cached = cache.get('openlibrary_isbn', isbn, '')
+            except sqlite3.Error as e:
+                activity_logger.warning(f"Enrichment cache read failed for openlibrary_isbn: {e}")
+        if cached is MISSING:
+            todo.append(isbn)
+        else:
+            results[isbn] = cached
+    for start in range(0, len(todo), BIBKEYS_PER_REQUEST):
+        batch = todo[start:start + BIBKEYS_PER_REQUEST]
+        params = {'bibkeys': ','.join(f"ISBN:{isbn}" for isbn in batch), 'format': 'json', 'jscmd': 'data'}
+        try:
+            r = http_get("https://openlibrary.org/api/books", params=params)
+            if not r.ok:
+                activity_logger.error(f"Open Library bulk ISBN lookup failed for {len(batch)} ISBNs: HTTP {r.status_code}")
+                continue
+            found = parse_json(r)
+        except Exception as e:
+            activity_logger.error(f"Open Library bulk ISBN lookup failed for {len(batch)} ISBNs: {e}")
+            continue
+        for isbn in batch:
+            data = found.get(f"ISBN:{isbn}")
+            book = _book_from_bibkey_data(isbn, data) if data else None
+            results[isbn] = book
+            if cache is not None:
+                try:
+                    cache.put('openlibrary_isbn', isbn, '', book)
+                except sqlite3.Error as e:
+                    activity_logger.warning(f"Enrichment cache write failed for openlibrary_isbn: {e}")
+    return results
+
+@cached_lookup('openlibrary_id')
+def lookup_openlibrary_id(identifier, kind):
+    """
+    Looks one book up by an exact identifier: kind is 'isbn', 'edition' (an
+    OL...M key), 'work' (an OL...W key) or 'goodreads' (a Goodreads book id).
+    Returns a book dict like enrich_with_openlibrary's, or None.
+    """
+    if kind == 'isbn':
+        local = lookup_local_isbn(identifier)
+        if local:
+            return local
+    if enrichment_settings()['openlibrary_offline']:
+        lookup_failed()
+        return None
+    try:
+        if kind in ('isbn', 'edition'):
+            bibkey = f"{'ISBN' if kind == 'isbn' else 'OLID'}:{identifier}"
+            r = http_get("https://openlibrary.org/api/books", params={'bibkeys': bibkey, 'format': 'json', 'jscmd': 'data'})
+            if not r.ok:
+                lookup_failed()
+                activity_logger.error(f"Open Library lookup failed for {bibkey}: HTTP {r.status_code}")
+                return None
+            data = parse_json(r).get(bibkey)
+            if not data:
+                return None
+            book = _book_from_bibkey_data(identifier if kind == 'isbn' else "N/A", data)
+            book["title"] = data.get("title", "")
+            book["author"] = ", ".join(a.get("name", "") for a in data.get("authors", []))
+            return book
+        query = f"key:/works/{identifier}" if kind == 'work' else f"id_goodreads:{identifier}"
+        r = http_get("https://openlibrary.org/search.json", params={'q': query, 'fields': SEARCH_FIELDS, 'limit': 1})
+        if not r.ok:
+            lookup_failed()
+            activity_logger.error(f"Open Library lookup failed for {query}: HTTP {r.status_code}")
+            return None
+        docs = parse_json(r).get("docs", [])
+        return _book_from_search_doc(docs[0], "", "") if docs else None
+    except Exception as e:
+        lookup_failed()
+        activity_logger.error(f"Open Library lookup failed for {kind} {identifier}: {e}")
+        return None
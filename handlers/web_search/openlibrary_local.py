@@ -0,0 +1,245 @@
+"""
+Local Open Library index built from the official data dumps
+(https://openlibrary.org/developers/dumps), so Open Library lookups can be
+answered without touching openlibrary.org.
+
+The index is a SQLite database (`local_index_path` in the [enrichment] section
+of config.ini) holding only what enrich_with_openlibrary returns: title,
+author, up to 10 subjects, cover URL and ISBN, keyed by the normalized
+(title, author) and by ISBN. Dumps are imported with
+import_openlibrary_dump.py, one line at a time, committing progress every
+IMPORT_BATCH_LINES so an interrupted import resumes where it stopped.
+
+Import the authors dump first, then works, then editions: editions are
+stored under their author names (taken from the edition, or from its work),
+and fall back to the work's subjects when they have none of their own.
+"""
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+from book_store import normalize_key
+from book_utils import activity_logger
+from handlers.web_search.settings import enrichment_settings, resolve_path
+
+IMPORT_BATCH_LINES = 20000
+MAX_TAGS = 10
+
+_index = None
+_index_lock = threading.Lock()
+
+def _cover_url(cover_ids):
+    cover_id = next((c for c in cover_ids or [] if isinstance(c, int) and c > 0), None)
+    return f"https://covers.openlibrary.org/b/id/{cover_id}-L.jpg" if cover_id else "N/A"
+
+def _parse_dump_line(line):
+    """Returns (type, key, record) for a TSV dump line (type, key, revision, modified, JSON) or a JSON line."""
+    if line.startswith('{'):
+        record = json.loads(line)
+        return record.get('type', {}).get('key', ''), record.get('key', ''), record
+    parts = line.rstrip('\n').split('\t')
+    if len(parts) < 5:
+        return None, None, None
+    return parts[0], parts[1], json.loads(parts[4])
+
+class LocalOpenLibraryIndex:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit; import_dump manages its own batched transactions
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS authors (key TEXT PRIMARY KEY, name TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS works (key TEXT PRIMARY KEY, authors TEXT, tags TEXT);
+            CREATE TABLE IF NOT EXISTS books (
+                title_key TEXT NOT NULL, author_key TEXT NOT NULL,
+                title TEXT, author TEXT, tags TEXT, cover_url TEXT, isbn13 TEXT,
+                PRIMARY KEY (title_key, author_key));
+            CREATE TABLE IF NOT EXISTS isbns (
+                isbn TEXT PRIMARY KEY, title TEXT, author TEXT, tags TEXT, cover_url TEXT, isbn13 TEXT);
+            CREATE TABLE IF NOT EXISTS import_progress (
+                path TEXT PRIMARY KEY, offset INTEGER NOT NULL, lines INTEGER NOT NULL, done INTEGER NOT NULL);
+        """)
+
+    @staticmethod
+    def _book(row):
+        title, author, tags, cover_url, isbn13 = row
+        return {
+            "title": title,
+            "author": author,
+            "tags": tags.split('|') if tags else [],
+            "cover_url": cover_url or "N/A",
+            "isbn13": isbn13 or "N/A",
+        }
+
+    def lookup(self, title, author):
+        """Returns the book in the same shape as enrich_with_openlibrary, or None."""
+        title_key, author_key = normalize_key(title, author)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, author, tags, cover_url, isbn13 FROM books WHERE title_key = ? AND author_key = ?",
+                (title_key, author_key)).fetchone()
+        return self._book(row) if row else None
+
+    def lookup_isbn(self, isbn):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, author, tags, cover_url, isbn13 FROM isbns WHERE isbn = ?", (isbn,)).fetchone()
+        return self._book(row) if row else None
+
+    # --- Import ---
+
+    def _store_author(self, key, record):
+        name = record.get('name') or record.get('personal_name')
+        if name:
+            self._conn.execute("INSERT OR REPLACE INTO authors (key, name) VALUES (?, ?)", (key, name))
+
+    def _author_names(self, author_refs):
+        names = []
+        for ref in author_refs or []:
+            # Editions use {"key": ...}, works use {"author": {"key": ...}}
+            key = (ref.get('author') or {}).get('key') if 'author' in ref else ref.get('key')
+            row = self._conn.execute("SELECT name FROM authors WHERE key = ?", (key,)).fetchone() if key else None
+            if row:
+                names.append(row[0])
+        return names
+
+    def _store_work(self, key, record):
+        names = self._author_names(record.get('authors'))
+        tags = [s for s in record.get('subjects', []) if isinstance(s, str)][:MAX_TAGS]
+        self._conn.execute("INSERT OR REPLACE INTO works (key, authors, tags) VALUES (?, ?, ?)",
+                           (key, '|'.join(names), '|'.join(tags)))
+
+    def _store_edition(self, record):
+        title = record.get('title')
+        if not title:
+            return
+        names = self._author_names(record.get('authors'))
+        tags = [s for s in record.get('subjects', []) if isinstance(s, str)][:MAX_TAGS]
+        if not names or not tags:
+            work_key = next((w.get('key') for w in record.get('works', []) if w.get('key')), None)
+            work = self._conn.execute("SELECT authors, tags FROM works WHERE key = ?", (work_key,)).fetchone() if work_key else None
+            if work:
+                names = names or [n for n in work[0].split('|') if n]
+                tags = tags or [t for t in work[1].split('|') if t]
+        isbns = record.get('isbn_13', []) + record.get('isbn_10', [])
+        isbn_value = isbns[0] if isbns else "N/A"
+        values = (title, ', '.join(names), '|'.join(tags), _cover_url(record.get('covers')), isbn_value)
+        for name in names:
+            # One row per author so "{Title by Any Co-Author}" matches; the first edition with data wins,
+            # later editions only fill in what it was missing
+            self._conn.execute(
+                "INSERT INTO books (title_key, author_key, title, author, tags, cover_url, isbn13) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (title_key, author_key) DO UPDATE SET "
+                "tags = CASE WHEN books.tags = '' THEN excluded.tags ELSE books.tags END, "
+                "cover_url = CASE WHEN books.cover_url = 'N/A' THEN excluded.cover_url ELSE books.cover_url END, "
+                "isbn13 = CASE WHEN books.isbn13 = 'N/A' THEN excluded.isbn13 ELSE books.isbn13 END",
+                normalize_key(title, name) + values)
+        for isbn in isbns:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO isbns (isbn, title, author, tags, cover_url, isbn13) VALUES (?, ?, ?, ?, ?, ?)",
+                (isbn,) + values)
+
+    def import_dump(self, path, progress=None):
+        """
+        Streams a dump (.txt/.json, optionally .gz) into the index and returns the
+        number of lines processed. Resumes from the last committed line if an
+        earlier import of the same file was interrupted. `progress(lines)` is
+        called after each committed batch.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self._conn.execute("SELECT offset, lines, done FROM import_progress WHERE path = ?", (path,)).fetchone()
+        offset, lines, done = row if row else (0, 0, 0)
+        if done:
+            activity_logger.info(f"Open Library dump {path} was already imported ({lines} lines).")
+            return lines
+        opener = gzip.open if path.endswith('.gz') else open
+        started = time.perf_counter()
+        with opener(path, 'rb') as f:
+            if offset:
+                # Offsets are in uncompressed bytes; gzip seeks by decompressing up to it
+                f.seek(offset)
+                activity_logger.info(f"Resuming Open Library dump import of {path} at line {lines}.")
+            batch = 0
+            self._lock.acquire()
+            try:
+                self._conn.execute("BEGIN")
+                for raw in f:
+                    offset += len(raw)
+                    lines += 1
+                    batch += 1
+                    try:
+                        record_type, key, record = _parse_dump_line(raw.decode('utf-8'))
+                        if record_type == '/type/author':
+                            self._store_author(key, record)
+                        elif record_type == '/type/work':
+                            self._store_work(key, record)
+                        elif record_type == '/type/edition':
+                            self._store_edition(record)
+                    except (ValueError, UnicodeDecodeError, AttributeError, TypeError) as e:
+                        activity_logger.warning(f"Skipping bad line {lines} of {path}: {e}")
+                    if batch >= IMPORT_BATCH_LINES:
+                        self._save_progress(path, offset, lines, False)
+                        self._conn.execute("COMMIT")
+                        self._conn.execute("BEGIN")
+                        batch = 0
+                        if progress:
+                            progress(lines)
+                self._save_progress(path, offset, lines, True)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._lock.release()
+        activity_logger.info(f"Imported Open Library dump {path}: {lines} lines in {time.perf_counter() - started:.0f}s.")
+        return lines
+
+    def _save_progress(self, path, offset, lines, done):
+        self._conn.execute("INSERT OR REPLACE INTO import_progress (path, offset, lines, done) VALUES (?, ?, ?, ?)",
+                           (path, offset, lines, int(done)))
+
+def get_local_index():
+    """Returns the local Open Library index, or None if it is disabled or hasn't been imported yet."""
+    global _index
+    settings = enrichment_settings()
+    if not settings['local_index_path']:
+        return None
+    path = resolve_path(settings['local_index_path'])
+    with _index_lock:
+        if _index is None:
+            if not os.path.exists(path):
+                return None
+            try:
+                _index = LocalOpenLibraryIndex(path)
+            except sqlite3.Error as e:
+                activity_logger.warning(f"Local Open Library index disabled, could not open {path}: {e}")
+                settings['local_index_path'] = ''
+                return None
+        return _index
+
+def lookup_local(title, author):
+    """Looks a book up in the local index; None if it isn't there or there is no index."""
+    index = get_local_index()
+    if index is None:
+        return None
+    try:
+        return index.lookup(title, author)
+    except sqlite3.Error as e:
+        activity_logger.warning(f"Local Open Library lookup failed: {e}")
+        return None
+
+def lookup_local_isbn(isbn):
+    index = get_local_index()
+    if index is None:
+        return None
+    try:
+        return index.lookup_isbn(isbn)
+    except sqlite3.Error as e:
+        activity_logger.warning(f"Local Open Library lookup failed: {e}")
+        return None
@@ -0,0 +1,184 @@
+"""
+Records how each enrichment provider performs and orders the provider chain
+from it (`provider_order` in the [enrichment] section of config.ini).
+
+For every lookup enrich_book makes, the registry records whether the provider
+found the book, how long it took and how many of the fields the double-check
+cares about (ISBN, tags, cover) it filled in. Latency is only sampled when the
+provider was actually called, not when the answer came from the cache.
+
+With `provider_order = auto` the chain is sorted by hit rate x field coverage
+divided by median latency, i.e. by how much of a record each provider is
+expected to complete per second. For a chain that stops at the first answer,
+this order minimizes the expected time to a complete record. Providers with
+fewer than MIN_LOOKUPS lookups go first until they have been measured.
+`provider_order = fixed` keeps the order from the code, and a comma-separated
+list of provider names (e.g. `romanceio, openlibrary, googlebooks`) pins it.
+
+Stats are saved to `provider_stats_path`, merged with what the other bot
+processes recorded, and shown on the GUI and web dashboards.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from book_utils import activity_logger
+from handlers.web_search.settings import enrichment_settings, resolve_path
+
+COVERAGE_FIELDS = ('isbn13', 'tags', 'cover_url')
+EMPTY_VALUES = (None, '', 'N/A', [])
+MIN_LOOKUPS = 20
+MAX_SAMPLES = 200
+SAVE_EVERY_SECONDS = 30.0
+MIN_LATENCY = 0.05
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def _new_entry():
+    return {'lookups': 0, 'hits': 0, 'fields': 0, 'latencies': []}
+
+class ProviderRegistry:
+    """Per-provider lookup, hit, field coverage and latency stats, persisted to a JSON file."""
+    def __init__(self, path=None):
+        self.path = path
+        self.stats = self._read()
+        self._pending = {}  # recorded since the last save
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {name: {**_new_entry(), **entry} for name, entry in data.items() if isinstance(entry, dict)}
+
+    def record(self, provider, book, seconds=None):
+        """Records one lookup: the book it returned (or None) and, if the provider was called, how long it took."""
+        fields = sum(1 for field in COVERAGE_FIELDS if book.get(field) not in EMPTY_VALUES) if book else 0
+        with self._lock:
+            for entries in (self.stats, self._pending):
+                entry = entries.setdefault(provider, _new_entry())
+                entry['lookups'] += 1
+                entry['hits'] += 1 if book else 0
+                entry['fields'] += fields
+                if seconds is not None:
+                    entry['latencies'] = (entry['latencies'] + [round(seconds, 3)])[-MAX_SAMPLES:]
+            if time.monotonic() - self._saved_at >= SAVE_EVERY_SECONDS:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        if not self.path or not self._pending:
+            return
+        # Add what this process recorded to what the other processes saved meanwhile
+        data = self._with_pending(self._read())
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            activity_logger.warning(f"Could not save provider stats to {self.path}: {e}")
+            return
+        self.stats = data
+        self._pending = {}
+
+    def _with_pending(self, data):
+        for provider, pending in self._pending.items():
+            entry = data.setdefault(provider, _new_entry())
+            for counter in ('lookups', 'hits', 'fields'):
+                entry[counter] += pending[counter]
+            entry['latencies'] = (entry['latencies'] + pending['latencies'])[-MAX_SAMPLES:]
+        return data
+
+    def reload(self):
+        """Picks up the stats other processes saved since this one started."""
+        with self._lock:
+            self.stats = self._with_pending(self._read())
+
+    def summary(self, provider):
+        """Hit rate, field coverage (of found books), p50/p95 latency in seconds and lookup count for a provider."""
+        with self._lock:
+            entry = self.stats.get(provider, _new_entry())
+            latencies = list(entry['latencies'])
+        lookups, hits = entry['lookups'], entry['hits']
+        return {
+            'provider': provider,
+            'lookups': lookups,
+            'hit_rate': hits / lookups if lookups else None,
+            'coverage': entry['fields'] / (hits * len(COVERAGE_FIELDS)) if hits else None,
+            'p50': _percentile(latencies, 0.5),
+            'p95': _percentile(latencies, 0.95),
+        }
+
+    def score(self, provider):
+        """Expected share of a record completed per second of lookup, or None if not measured yet."""
+        stats = self.summary(provider)
+        if stats['lookups'] < MIN_LOOKUPS or stats['p50'] is None:
+            return None
+        return stats['hit_rate'] * (stats['coverage'] or 0.0) / max(MIN_LATENCY, stats['p50'])
+
+    def order(self, providers):
+        """Sorts (name, lookup) pairs by score, unmeasured providers first; ties keep their given order."""
+        scores = {name: self.score(name) for name, _ in providers}
+        return sorted(providers, key=lambda p: (scores[p[0]] is not None, -(scores[p[0]] or 0.0)))
+
+def get_provider_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            path = enrichment_settings()['provider_stats_path']
+            _registry = ProviderRegistry(resolve_path(path) if path else None)
+            atexit.register(_registry.save)
+        return _registry
+
+def order_providers(providers):
+    """Returns the provider chain in the order set by `provider_order`."""
+    setting = enrichment_settings()['provider_order'].strip().lower()
+    if setting == 'fixed' or len(providers) < 2:
+        return list(providers)
+    if setting == 'auto':
+        return get_provider_registry().order(providers)
+    pinned = [name.strip() for name in setting.split(',') if name.strip()]
+    # Providers missing from the list keep their place after the listed ones
+    return sorted(providers, key=lambda p: pinned.index(p[0]) if p[0] in pinned else len(pinned))
+
+def expected_lookups(providers):
+    """
+    Expected number of providers asked per enrich_book call with this chain:
+    each one is only asked if all before it missed. Providers without a
+    recorded hit rate count as always hitting, so this errs low.
+    """
+    if enrichment_settings()['merge_results']:
+        return float(len(providers))
+    registry = get_provider_registry()
+    expected, reach = 0.0, 1.0
+    for name, _ in order_providers(providers):
+        expected += reach
+        hit_rate = registry.summary(name)['hit_rate']
+        reach *= 1.0 - (hit_rate if hit_rate is not None else 1.0)
+    return expected
+
+def provider_stats():
+    """Stats of every provider recorded so far (by any bot process) for the dashboards, in the current auto order."""
+    registry = get_provider_registry()
+    registry.reload()
+    names = list(registry.stats)
+    ordered = [name for name, _ in registry.order([(name, None) for name in names])]
+    return [registry.summary(name) for name in ordered]
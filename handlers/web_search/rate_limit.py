@@ -0,0 +1,239 @@
+"""
+Per-provider rate limiting for enrichment requests.
+
+Every request to Open Library, Google Books or romance.io passes through the
+provider's limiter (see http_get), which combines:
+
+- a token bucket capping requests per second (`<provider>_rate` in the
+  [enrichment] section of config.ini);
+- an AIMD concurrency limit: each success raises the number of requests
+  allowed in flight by 1/limit (about +1 per round of requests, up to
+  `max_concurrency`), and a 429, a 5xx or a network error halves it;
+- a cooldown after a 429/5xx/network error, taken from the Retry-After header
+  when there is one, otherwise 1s doubling per consecutive failure (max 60s),
+  with random jitter so processes and workers don't retry in lockstep.
+
+Cooldowns and concurrency limits are saved to `rate_state_path` so the bot
+started by cron, the GUI and the web GUI all back off from a provider that is
+throttling any of them. The token bucket itself is per process.
+"""
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from book_utils import activity_logger
+from handlers.web_search.hedging import lookup_cancelled
+from handlers.web_search.settings import enrichment_settings, resolve_path
+
+# Host suffix -> provider name, as used in the cache and the settings
+PROVIDER_HOSTS = {
+    'openlibrary.org': 'openlibrary',
+    'googleapis.com': 'googlebooks',
+    'romance.io': 'romanceio',
+}
+MAX_BACKOFF_SECONDS = 60.0
+SAVE_EVERY_SECONDS = 5.0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_state_store = None
+
+class ProviderThrottled(requests.exceptions.RequestException):
+    """Raised instead of sending a request when the provider is cooling down for longer than `rate_max_wait`."""
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(failures):
+    """Exponential backoff with jitter: 1, 2, 4... seconds (max 60), each scaled by a random 50-100%."""
+    return min(MAX_BACKOFF_SECONDS, 2.0 ** (failures - 1)) * random.uniform(0.5, 1.0)
+
+def provider_for_url(url):
+    host = urlparse(url).hostname or ''
+    for suffix, provider in PROVIDER_HOSTS.items():
+        if host == suffix or host.endswith('.' + suffix):
+            return provider
+    return None
+
+class ProviderStateStore:
+    """Per-provider throttling and circuit breaker state shared between processes through a small JSON file."""
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self.data = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def refresh(self):
+        """Re-reads the file if another process changed it. Returns the data and its version."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return self.data, self.version
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self.data = self._read()
+                self.version += 1
+            return self.data, self.version
+
+    def save(self, provider, **fields):
+        with self._lock:
+            data = self._read()
+            entry = data.get(provider, {})
+            if 'cooldown_until' in fields:
+                # Keep a longer cooldown written by another process meanwhile
+                fields['cooldown_until'] = max(fields['cooldown_until'], entry.get('cooldown_until', 0.0))
+            entry.update(fields)
+            data[provider] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self._mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                activity_logger.warning(f"Could not save provider rate limit state to {self.path}: {e}")
+            self.data = data
+
+class ProviderLimiter:
+    def __init__(self, name, rate, max_concurrency, max_wait, store=None):
+        self.name = name
+        self.rate = max(0.01, rate)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_wait = max_wait
+        self.store = store
+        self.limit = min(2.0, float(self.max_concurrency))
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.failures = 0
+        self.tokens = 1.0
+        self._refilled_at = time.monotonic()
+        self._applied_version = None
+        self._saved_at = 0.0
+        self._cond = threading.Condition()
+
+    def _apply_shared_state(self):
+        if self.store is None:
+            return
+        data, version = self.store.refresh()
+        if version == self._applied_version:
+            return
+        self._applied_version = version
+        entry = data.get(self.name)
+        if entry:
+            self.cooldown_until = max(self.cooldown_until, entry.get('cooldown_until', 0.0))
+            self.limit = min(float(self.max_concurrency), max(1.0, entry.get('limit', self.limit)))
+
+    def _save(self, force=False):
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if force or now - self._saved_at >= SAVE_EVERY_SECONDS:
+            self._saved_at = now
+            self.store.save(self.name, cooldown_until=self.cooldown_until, limit=round(self.limit, 2))
+
+    def acquire(self):
+        """Waits for a free slot and a token. Returns the seconds spent waiting."""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                self._apply_shared_state()
+                now = time.monotonic()
+                self.tokens = min(max(1.0, self.rate), self.tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                cooldown = self.cooldown_until - time.time()
+                if cooldown > 0:
+                    wait = cooldown
+                elif self.in_flight >= int(self.limit):
+                    wait = 1.0  # woken up by release()
+                elif self.tokens < 1.0:
+                    wait = (1.0 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    return now - started
+                if lookup_cancelled():
+                    raise ProviderThrottled(f"{self.name} lookup cancelled while waiting for the rate limiter")
+                if cooldown > 0 and now - started + cooldown > self.max_wait:
+                    raise ProviderThrottled(f"{self.name} is cooling down for another {cooldown:.0f}s")
+                self._cond.wait(min(wait, 1.0))
+
+    def release(self, status=None, retry_after=None, error=False):
+        """Records how a request went: success raises the concurrency limit, throttling or failure backs off."""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if error or status == 429 or (status is not None and status >= 500):
+                self._back_off(status, parse_retry_after(retry_after))
+            else:
+                self.failures = 0
+                if self.limit < self.max_concurrency:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                    self._save()
+            self._cond.notify_all()
+
+    def _back_off(self, status, retry_after):
+        self.failures += 1
+        self.limit = max(1.0, self.limit / 2)
+        delay = retry_after if retry_after is not None else backoff_delay(self.failures)
+        self.cooldown_until = max(self.cooldown_until, time.time() + delay)
+        self._save(force=True)
+        reason = f"HTTP {status}" if status else "a network error"
+        activity_logger.warning(f"{self.name} backing off for {delay:.1f}s after {reason} (concurrency limit now {int(self.limit)}).")
+
+def get_state_store():
+    """Returns the process-wide shared state store, or None if `rate_state_path` is blank."""
+    global _state_store
+    with _limiters_lock:
+        path = enrichment_settings()['rate_state_path']
+        if _state_store is None and path:
+            _state_store = ProviderStateStore(resolve_path(path))
+        return _state_store
+
+def get_limiter(provider):
+    """Returns the process-wide limiter for a provider, or None if rate limiting is disabled."""
+    settings = enrichment_settings()
+    if not settings['rate_limit_enabled']:
+        return None
+    store = get_state_store()
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                rate=settings[f'{provider}_rate'],
+                max_concurrency=settings['max_concurrency'],
+                max_wait=settings['rate_max_wait'],
+                store=store)
+        return _limiters[provider]
+
+def wait_before_retry(provider, failures):
+    """
+    Sleeps backoff_delay(failures) before retrying a failed request, unless the
+    provider's limiter already holds the next request back for its cooldown.
+    """
+    if get_limiter(provider) is None:
+        time.sleep(backoff_delay(failures))
+
+def limiter_for_url(url):
+    provider = provider_for_url(url)
+    return get_limiter(provider) if provider else None
@@ -1,7 +1,39 @@
-import requests
-from bs4 import BeautifulSoup
+import time
+from html.parser import HTMLParser
 from book_utils import activity_logger
+from handlers.web_search.cache import cached_lookup, lookup_failed
+from handlers.web_search.http_session import http_get, count_parse_time
 
+class _FoundBookLink(Exception):
+    pass
+
+class _BookLinkFinder(HTMLParser):
+    """Stops at the first <a class="book-link" href=...>, without building a tree of the page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        attrs = dict(attrs)
+        if 'book-link' in (attrs.get('class') or '').split() and attrs.get('href'):
+            self.href = attrs['href']
+            raise _FoundBookLink()
+
+def find_book_link(html):
+    """Returns the href of the first search result link on a romance.io search page, or None."""
+    if 'book-link' not in html:
+        return None
+    finder = _BookLinkFinder()
+    try:
+        finder.feed(html)
+        finder.close()
+    except _FoundBookLink:
+        pass
+    return finder.href
+
+@cached_lookup('romanceio')
 def enrich_with_romanceio(title, author):
     """
     Try to enrich book data using romance.io.
@@ -10,13 +42,15 @@ def enrich_with_romanceio(title, author):
     search_query = f"{title} {author}".replace(" ", "+")
     url = f"https://www.romance.io/books?search={search_query}"
     try:
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
         if not response.ok:
+            lookup_failed()
             return None
-        soup = BeautifulSoup(response.text, "html.parser")
-        book_link = soup.find("a", class_="book-link")
+        started = time.perf_counter()
+        book_link = find_book_link(response.text)
+        count_parse_time(time.perf_counter() - started)
         if book_link:
-            book_url = "https://www.romance.io" + book_link.get("href")
+            book_url = "https://www.romance.io" + book_link
             return {
                 "title": title,
                 "author": author,
@@ -26,5 +60,6 @@ def enrich_with_romanceio(title, author):
                 "romance_io_url": book_url
             }
     except Exception as e:
+        lookup_failed()
         activity_logger.error(f"Romance.io lookup failed for {title} by {author}: {e}")
     return None 
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Settings shared by the web enrichment providers, read once per process from
+the [enrichment] section of config.ini.
+"""
+import configparser
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CONFIG_PATH = os.path.join(ROOT_DIR, "config.ini")
+
+DEFAULTS = {
+    'cache_enabled': True,
+    'cache_path': 'enrichment_cache.db',
+    'cache_hit_ttl_days': 30.0,
+    'cache_miss_ttl_hours': 24.0,
+    'cache_max_entries': 50000,
+    'user_agent': 'bookbot/1.0 (+https://github.com/Dictation9/bookbot)',
+    'http_connect_timeout': 5.0,
+    'http_read_timeout': 15.0,
+    'http_pool_size': 4,
+    'provider_mode': 'sequential',
+    'hedge_delay_ms': 1000.0,
+    'merge_results': False,
+    'rate_limit_enabled': True,
+    'openlibrary_rate': 2.0,
+    'googlebooks_rate': 5.0,
+    'romanceio_rate': 1.0,
+    'max_concurrency': 4,
+    'rate_max_wait': 60.0,
+    'rate_state_path': '.provider_state.json',
+    'breaker_failures': 5,
+    'breaker_cooldown_seconds': 300.0,
+    'local_index_path': 'openlibrary_local.db',
+    'openlibrary_offline': False,
+    'provider_order': 'auto',
+    'provider_stats_path': '.provider_stats.json',
+}
+
+_settings = None
+
+def _read_setting(config, option, default):
+    raw = config.get('enrichment', option, fallback='').strip()
+    if not raw:
+        return default
+    try:
+        if isinstance(default, bool):
+            return raw.lower() in ('true', 'yes', '1', 'on')
+        return type(default)(raw)
+    except ValueError:
+        return default
+
+def enrichment_settings():
+    """Returns the [enrichment] settings as a dict, falling back to DEFAULTS for anything missing."""
+    global _settings
+    if _settings is None:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_PATH)
+        _settings = {option: _read_setting(config, option, default) for option, default in DEFAULTS.items()}
+    return _settings
+
+def resolve_path(path):
+    """Relative paths in the [enrichment] section are relative to the bot's folder."""
+    return path if os.path.isabs(path) else os.path.join(ROOT_DIR, path)
@@ -0,0 +1,48 @@
+"""
+Imports Open Library data dumps into the local index used for offline
+enrichment (see handlers/web_search/openlibrary_local.py).
+
+Download the dumps from https://openlibrary.org/developers/dumps and import
+them in this order:
+
+    python import_openlibrary_dump.py ol_dump_authors_latest.txt.gz
+    python import_openlibrary_dump.py ol_dump_works_latest.txt.gz
+    python import_openlibrary_dump.py ol_dump_editions_latest.txt.gz
+
+Several files can be given at once. Imports stream the dump, so memory use
+stays flat, and can be stopped with Ctrl+C and resumed by running the same
+command again.
+"""
+import argparse
+import os
+import sys
+from rich.console import Console
+from handlers.web_search.openlibrary_local import LocalOpenLibraryIndex
+from handlers.web_search.settings import enrichment_settings, resolve_path
+
+console = Console()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import Open Library dumps into the local enrichment index.")
+    parser.add_argument('dumps', nargs='+', help="dump files (.txt/.json lines, optionally gzipped): authors, then works, then editions")
+    parser.add_argument('--index', help="index database (default: local_index_path from config.ini)")
+    args = parser.parse_args()
+
+    index_path = args.index or enrichment_settings()['local_index_path'] or 'openlibrary_local.db'
+    index = LocalOpenLibraryIndex(resolve_path(index_path))
+    console.print(f"📚 Importing into [bold cyan]{index.path}[/bold cyan]")
+    for dump in args.dumps:
+        if not os.path.exists(dump):
+            console.print(f"❌ {dump} not found.")
+            return 1
+        console.print(f"Importing {dump}...")
+        try:
+            lines = index.import_dump(dump, progress=lambda n: console.print(f"  {n:,} lines", end="\r"))
+        except KeyboardInterrupt:
+            console.print("\nImport stopped. Run the same command again to resume.")
+            return 1
+        console.print(f"✅ {dump}: {lines:,} lines imported.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
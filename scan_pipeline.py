@@ -0,0 +1,160 @@
+"""
+Staged scan pipeline.
+
+    fetch (thread) -> extract (thread) -> bounded queue -> writer (caller's thread)
+                                  \\-> enrichment worker pool -/
+
+The fetch stage pulls items from the source (e.g. posts and their comments),
+the extract stage turns each fetched item into tasks, and the writer applies
+the tasks strictly in the order they were produced. A task is either a plain
+callable (run by the writer, e.g. a romance-bot update or a commit) or a
+Lookup, whose function runs on the worker pool as soon as it is extracted and
+whose `then` callback is run by the writer once the result is in. Network
+waits for lookups therefore overlap with fetching and extracting the next
+posts, while writes keep the same order as a serial scan.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+Lookup = namedtuple('Lookup', ['func', 'args', 'then'])
+
+_DONE = object()
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds, count=1):
+        with self._lock:
+            self.count += count
+            self.seconds += seconds
+
+    def rate(self, wall_seconds):
+        return self.count / wall_seconds if wall_seconds > 0 else 0.0
+
+class ScanPipeline:
+    def __init__(self, workers=4, queue_depth=32):
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+        self.stats = {name: StageStats() for name in ('fetch', 'extract', 'enrich', 'write')}
+        self.wall_seconds = 0.0
+        self._stop = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item):
+        # Blocks while the next stage is behind (backpressure), but gives up once the pipeline is stopping
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_stage(self, source, fetch, fetched_q):
+        try:
+            iterator = iter(source)
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                fetched = fetch(item)
+                self.stats['fetch'].add(time.perf_counter() - started)
+                if not self._put(fetched_q, fetched):
+                    return
+        except Exception as e:
+            self._errors.append(('fetch', e))
+        finally:
+            self._put(fetched_q, _DONE)
+
+    def _timed_lookup(self, func, args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.stats['enrich'].add(time.perf_counter() - started)
+
+    def _extract_stage(self, extract, fetched_q, task_q, pool):
+        try:
+            while not self._stop.is_set():
+                try:
+                    fetched = fetched_q.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if fetched is _DONE:
+                    break
+                started = time.perf_counter()
+                tasks = list(extract(fetched))
+                self.stats['extract'].add(time.perf_counter() - started)
+                for task in tasks:
+                    if isinstance(task, Lookup):
+                        future = pool.submit(self._timed_lookup, task.func, task.args)
+                        task = (future, task.then)
+                    if not self._put(task_q, task):
+                        return
+        except Exception as e:
+            self._errors.append(('extract', e))
+        finally:
+            self._put(task_q, _DONE)
+
+    def run(self, source, fetch, extract, on_error=None):
+        """
+        Runs the pipeline to completion on the calling thread (which is the writer).
+        `fetch(item)` is called for each item of `source`; `extract(fetched)` returns
+        an iterable of tasks. `on_error(exc)` is called by the writer when a task or
+        lookup raises; without it the exception propagates. Errors in the fetch or
+        extract stage are re-raised once the writer has drained what was queued.
+        """
+        started = time.perf_counter()
+        fetched_q = queue.Queue(maxsize=self.queue_depth)
+        task_q = queue.Queue(maxsize=self.queue_depth)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='enrich')
+        threads = [
+            threading.Thread(target=self._fetch_stage, args=(source, fetch, fetched_q), name='scan-fetch', daemon=True),
+            threading.Thread(target=self._extract_stage, args=(extract, fetched_q, task_q, pool), name='scan-extract', daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                task = task_q.get()
+                if task is _DONE:
+                    break
+                try:
+                    if isinstance(task, tuple):
+                        future, then = task
+                        result = future.result()
+                        write_started = time.perf_counter()
+                        then(result)
+                    else:
+                        write_started = time.perf_counter()
+                        task()
+                    self.stats['write'].add(time.perf_counter() - write_started)
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(e)
+        finally:
+            # Stops the other stages early if the writer bailed out (error or Ctrl+C)
+            self._stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.wall_seconds = time.perf_counter() - started
+        if self._errors:
+            stage, error = self._errors[0]
+            raise error
+
+    def summary(self):
+        """One-line per-stage throughput, for the activity log."""
+        wall = self.wall_seconds
+        parts = [f"wall={wall:.1f}s workers={self.workers} queue_depth={self.queue_depth}"]
+        for name, label in (('fetch', 'items'), ('extract', 'items'), ('enrich', 'lookups'), ('write', 'tasks')):
+            stage = self.stats[name]
+            parts.append(f"{name}: {stage.count} {label} busy={stage.seconds:.1f}s rate={stage.rate(wall):.2f}/s")
+        return " | ".join(parts)
@@ -0,0 +1,153 @@
+"""
+In-memory full-text index over book mentions.
+
+Maps each token of a row's title, author and tags to the ids (positions in
+all_rows()) of the rows containing it. sync() only re-tokenizes rows whose
+title/author/tags changed or that were appended since the last call, so keeping
+the index current after a scan is cheap. search() supports prefix matching and
+ranks title hits above author hits above tag hits.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+
+FIELD_WEIGHTS = {'title': 3.0, 'author': 2.0, 'tags': 1.0}
+PREFIX_FACTOR = 0.6
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text):
+    """Lowercased, accent-folded word tokens of `text`."""
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(text)
+
+def _row_text(row):
+    return tuple((row.get(field) or '') for field in FIELD_WEIGHTS)
+
+class SearchIndex:
+    """Inverted index token -> {row_id: weight} with prefix lookups over a sorted token list."""
+    def __init__(self):
+        self._postings = {}
+        self._row_tokens = []
+        self._row_texts = []
+        self._rows = []
+        self._sorted_tokens = []
+        self._tokens_dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _index_row(self, row_id, text):
+        weights = {}
+        for field, value in zip(FIELD_WEIGHTS, text):
+            for token in set(tokenize(value)):
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._tokens_dirty = True
+            postings[row_id] = weight
+        return weights
+
+    def _unindex_row(self, row_id):
+        for token in self._row_tokens[row_id]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(row_id, None)
+            if not postings:
+                del self._postings[token]
+                self._tokens_dirty = True
+
+    def sync(self, rows):
+        """Brings the index in line with `rows` (a list of row dicts in store order)."""
+        with self._lock:
+            # Rows were removed (store cleared or rewritten): drop the tail
+            while len(self._row_texts) > len(rows):
+                self._unindex_row(len(self._row_texts) - 1)
+                self._row_texts.pop()
+                self._row_tokens.pop()
+            for row_id, row in enumerate(rows):
+                text = _row_text(row)
+                if row_id < len(self._row_texts):
+                    if self._row_texts[row_id] == text:
+                        continue
+                    self._unindex_row(row_id)
+                    self._row_tokens[row_id] = self._index_row(row_id, text)
+                    self._row_texts[row_id] = text
+                else:
+                    self._row_tokens.append(self._index_row(row_id, text))
+                    self._row_texts.append(text)
+            self._rows = rows
+
+    def update_rows(self, rows_by_id):
+        """Re-indexes just the given rows ({row_id: row dict}) after an edit, without walking the others."""
+        with self._lock:
+            for row_id, row in rows_by_id.items():
+                if row_id >= len(self._row_texts):
+                    continue
+                text = _row_text(row)
+                if self._row_texts[row_id] != text:
+                    self._unindex_row(row_id)
+                    self._row_tokens[row_id] = self._index_row(row_id, text)
+                    self._row_texts[row_id] = text
+                if row_id < len(self._rows):
+                    self._rows[row_id] = row
+
+    def _matching_tokens(self, term):
+        if self._tokens_dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._tokens_dirty = False
+        start = bisect_left(self._sorted_tokens, term)
+        for i in range(start, len(self._sorted_tokens)):
+            token = self._sorted_tokens[i]
+            if not token.startswith(term):
+                break
+            yield token
+
+    def _term_scores(self, term):
+        scores = {}
+        for token in self._matching_tokens(term):
+            factor = 1.0 if token == term else PREFIX_FACTOR
+            for row_id, weight in self._postings[token].items():
+                score = weight * factor
+                if score > scores.get(row_id, 0.0):
+                    scores[row_id] = score
+        return scores
+
+    def _match(self, query):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return {}
+        per_term = sorted((self._term_scores(term) for term in terms), key=len)
+        totals = per_term[0]
+        for scores in per_term[1:]:
+            if not totals:
+                break
+            totals = {row_id: total + scores[row_id] for row_id, total in totals.items() if row_id in scores}
+        return totals
+
+    def search(self, query, limit=None):
+        """
+        Returns [(row_id, score), ...] for rows matching every term of `query`,
+        best first. Each term also matches tokens it is a prefix of.
+        """
+        with self._lock:
+            totals = self._match(query)
+        # Ties go to the most recently added rows
+        rank = lambda item: (-item[1], -item[0])
+        if limit is not None:
+            return heapq.nsmallest(limit, totals.items(), key=rank)
+        return sorted(totals.items(), key=rank)
+
+    def search_rows(self, query, offset=0, limit=50):
+        """Returns (matching row dicts for the requested page, total match count)."""
+        with self._lock:
+            totals = self._match(query)
+            rows = self._rows
+        page = heapq.nsmallest(offset + limit, totals.items(), key=lambda item: (-item[1], -item[0]))[offset:]
+        return [rows[row_id] for row_id, _ in page], len(totals)
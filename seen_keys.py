@@ -0,0 +1,103 @@
+"""
+Compact set of normalized (title, author) keys for de-duplication.
+
+Keys are stored as 64-bit fingerprints: a sorted array('Q') loaded from a
+snapshot file, plus small sets for keys added or removed since. The snapshot
+records the signature (sizes and mtimes) of the data files it was built from,
+so a scanner can warm-start in milliseconds and only rebuild from the CSV or
+database when the data has changed.
+"""
+import array
+import hashlib
+import os
+import struct
+import sys
+from bisect import bisect_left
+
+SNAPSHOT_MAGIC = b'BKSN'
+SNAPSHOT_VERSION = 1
+
+def key_fingerprint(key):
+    """64-bit fingerprint of an already-normalized (title, author) key."""
+    title, author = key
+    digest = hashlib.blake2b(f"{title}\x1f{author}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+class SeenKeys:
+    """Set-like container of (title, author) keys backed by sorted fingerprints."""
+    def __init__(self, fingerprints=None):
+        self._sorted = fingerprints if fingerprints is not None else array.array('Q')
+        self._added = set()
+        self._removed = set()
+
+    @classmethod
+    def from_keys(cls, keys):
+        return cls(array.array('Q', sorted({key_fingerprint(k) for k in keys})))
+
+    def _in_sorted(self, fp):
+        i = bisect_left(self._sorted, fp)
+        return i < len(self._sorted) and self._sorted[i] == fp
+
+    def __contains__(self, key):
+        fp = key_fingerprint(key)
+        if fp in self._added:
+            return True
+        return fp not in self._removed and self._in_sorted(fp)
+
+    def add(self, key):
+        fp = key_fingerprint(key)
+        self._removed.discard(fp)
+        if not self._in_sorted(fp):
+            self._added.add(fp)
+
+    def discard(self, key):
+        fp = key_fingerprint(key)
+        if fp in self._added:
+            self._added.discard(fp)
+        elif self._in_sorted(fp):
+            self._removed.add(fp)
+
+    def __len__(self):
+        return len(self._sorted) - len(self._removed) + len(self._added)
+
+    def fingerprints(self):
+        """Returns all current fingerprints as a sorted array."""
+        if not self._added and not self._removed:
+            return array.array('Q', self._sorted)
+        merged = set(self._sorted)
+        merged.difference_update(self._removed)
+        merged.update(self._added)
+        return array.array('Q', sorted(merged))
+
+    def copy(self):
+        return SeenKeys(self.fingerprints())
+
+def save_snapshot(path, signature, seen):
+    """Writes `seen` to `path`, tagged with the data-file `signature` it reflects."""
+    fingerprints = seen.fingerprints()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<4sBBH', SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == 'little', len(signature)))
+        f.write(struct.pack(f'<{len(signature)}q', *signature))
+        f.write(struct.pack('<Q', len(fingerprints)))
+        fingerprints.tofile(f)
+    os.replace(tmp_path, path)
+
+def load_snapshot(path, signature):
+    """Returns a SeenKeys from `path` if it was built for `signature`, otherwise None."""
+    try:
+        with open(path, 'rb') as f:
+            magic, version, little, sig_len = struct.unpack('<4sBBH', f.read(8))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or sig_len != len(signature):
+                return None
+            stored = struct.unpack(f'<{sig_len}q', f.read(8 * sig_len))
+            if tuple(stored) != tuple(signature):
+                return None
+            count = struct.unpack('<Q', f.read(8))[0]
+            fingerprints = array.array('Q')
+            fingerprints.fromfile(f, count)
+    except (OSError, struct.error, EOFError, ValueError):
+        return None
+    if bool(little) != (sys.byteorder == 'little'):
+        fingerprints.byteswap()
+    return SeenKeys(fingerprints)
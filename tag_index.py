@@ -0,0 +1,139 @@
+"""
+Interned tag index over book mentions.
+
+Each distinct tag gets a small integer id, and each tag id has a bitmap with
+one bit per row (row id = position in all_rows()). Tag filters, the LGBT
+filter and tag counts become bitwise operations on those bitmaps instead of
+splitting every row's `tags` string on each redraw. sync() only re-parses rows
+whose tags string changed or that were appended since the last call.
+"""
+import threading
+
+LGBT_TAGS = {'lgbt', 'lgbtq', 'queer', 'gay', 'lesbian', 'trans', 'bisexual', 'nonbinary'}
+
+def parse_tags(tags):
+    """Splits a comma-separated tags string into normalized tags."""
+    return [t.strip().lower() for t in (tags or '').split(',') if t.strip()]
+
+class TagIndex:
+    """Tag -> id interning plus a per-tag row bitmap."""
+    def __init__(self):
+        self._tag_ids = {}
+        self._tags = []
+        self._bitmaps = []       # One bytearray per tag id, bit i = row i has the tag
+        self._row_strings = []   # Raw tags string per row, to detect changes on sync
+        self._row_tag_ids = []   # frozenset of tag ids per row
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._row_tag_ids)
+
+    def _intern(self, tag):
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self._tags)
+            self._tags.append(tag)
+            self._bitmaps.append(bytearray())
+        return tag_id
+
+    def _set_bit(self, tag_id, row_id, on):
+        bitmap = self._bitmaps[tag_id]
+        byte = row_id >> 3
+        if byte >= len(bitmap):
+            if not on:
+                return
+            bitmap.extend(bytes(byte + 1 - len(bitmap)))
+        if on:
+            bitmap[byte] |= 1 << (row_id & 7)
+        else:
+            bitmap[byte] &= ~(1 << (row_id & 7)) & 0xFF
+
+    def _set_row(self, row_id, tags_string):
+        tag_ids = frozenset(self._intern(tag) for tag in parse_tags(tags_string))
+        if row_id < len(self._row_tag_ids):
+            for tag_id in self._row_tag_ids[row_id] - tag_ids:
+                self._set_bit(tag_id, row_id, False)
+            self._row_strings[row_id] = tags_string
+            self._row_tag_ids[row_id] = tag_ids
+        else:
+            self._row_strings.append(tags_string)
+            self._row_tag_ids.append(tag_ids)
+        for tag_id in tag_ids:
+            self._set_bit(tag_id, row_id, True)
+
+    def sync(self, tag_strings):
+        """Brings the index in line with `tag_strings` (the tags column of every row, in store order)."""
+        with self._lock:
+            while len(self._row_tag_ids) > len(tag_strings):
+                row_id = len(self._row_tag_ids) - 1
+                for tag_id in self._row_tag_ids[row_id]:
+                    self._set_bit(tag_id, row_id, False)
+                self._row_strings.pop()
+                self._row_tag_ids.pop()
+            for row_id, tags_string in enumerate(tag_strings):
+                tags_string = tags_string or ''
+                if row_id < len(self._row_strings) and self._row_strings[row_id] == tags_string:
+                    continue
+                self._set_row(row_id, tags_string)
+
+    def update_rows(self, tags_by_id):
+        """Re-parses just the given rows ({row_id: tags string}) after an edit, without walking the others."""
+        with self._lock:
+            for row_id, tags_string in tags_by_id.items():
+                tags_string = tags_string or ''
+                if row_id < len(self._row_strings) and self._row_strings[row_id] != tags_string:
+                    self._set_row(row_id, tags_string)
+
+    def _mask(self, tag):
+        tag_id = self._tag_ids.get(tag.strip().lower())
+        if tag_id is None:
+            return 0
+        return int.from_bytes(self._bitmaps[tag_id], 'little')
+
+    def rows_with_any(self, tags):
+        """Bitmask of rows that have at least one of `tags`."""
+        mask = 0
+        with self._lock:
+            for tag in tags:
+                mask |= self._mask(tag)
+        return mask
+
+    def rows_with_all(self, tags):
+        """Bitmask of rows that have every one of `tags`."""
+        tags = list(tags)
+        if not tags:
+            return 0
+        with self._lock:
+            mask = self._mask(tags[0])
+            for tag in tags[1:]:
+                mask &= self._mask(tag)
+        return mask
+
+    def row_has_any(self, row_id, tags):
+        with self._lock:
+            if row_id >= len(self._row_tag_ids):
+                return False
+            tag_ids = {self._tag_ids[t] for t in tags if t in self._tag_ids}
+            return not self._row_tag_ids[row_id].isdisjoint(tag_ids)
+
+    def counts(self, mask=None):
+        """{tag: number of rows} for every tag, optionally restricted to the rows in `mask`."""
+        with self._lock:
+            result = {}
+            for tag_id, tag in enumerate(self._tags):
+                bits = int.from_bytes(self._bitmaps[tag_id], 'little')
+                if mask is not None:
+                    bits &= mask
+                count = bin(bits).count('1')
+                if count:
+                    result[tag] = count
+            return result
+
+def iter_row_ids(mask):
+    """Yields the row ids set in `mask`, in ascending order."""
+    for byte_index, byte in enumerate(mask.to_bytes((mask.bit_length() + 7) // 8, 'little')):
+        if not byte:
+            continue
+        for bit in range(8):
+            if byte >> bit & 1:
+                yield (byte_index << 3) | bit
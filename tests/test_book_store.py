@@ -0,0 +1,191 @@
+import os
+import time
+from book_store import BookStore, BufferedBookWriter, SQLiteBookStore
+
+def make_store(tmp_path, **kwargs):
+    return BookStore(str(tmp_path / "book_mentions.csv"), **kwargs)
+
+def add_books(store, *books):
+    return store.add_rows([{'title': title, 'author': author, 'tags': ''} for title, author in books])
+
+def rows_by_title(store):
+    return {row['title']: row for row in store.all_rows()}
+
+def test_add_rows_skips_duplicates(tmp_path):
+    store = make_store(tmp_path)
+    assert add_books(store, ("Beach Read", "Emily Henry"), ("Book Lovers", "Emily Henry")) == 2
+    assert add_books(store, (" beach read ", "EMILY HENRY")) == 0
+    assert len(store) == 2
+
+def test_journal_is_replayed_by_a_new_store(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert store.update("Beach Read", "Emily Henry", {'tags': 'romance, contemporary'})
+    assert store.update("Beach Read", "Emily Henry", {'isbn13': '9781984806734'})
+    assert os.path.exists(store.journal_path)
+
+    row = rows_by_title(make_store(tmp_path))["Beach Read"]
+    assert row['tags'] == 'romance, contemporary'
+    assert row['isbn13'] == '9781984806734'
+
+def test_update_of_unknown_book_writes_nothing(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert not store.update("Unknown", "Nobody", {'tags': 'x'})
+    assert store.update_rows([("Unknown", "Nobody", {'tags': 'x'})]) == 0
+    assert not os.path.exists(store.journal_path)
+
+def test_rename_moves_the_key(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Raed", "Emily Henry"))
+    store.update("Beach Raed", "Emily Henry", {'title': 'Beach Read'})
+    for reader in (store, make_store(tmp_path)):
+        assert reader.contains("Beach Read", "Emily Henry")
+        assert not reader.contains("Beach Raed", "Emily Henry")
+    assert list(rows_by_title(store)) == ["Beach Read"]
+
+def test_patches_follow_a_rename_in_the_same_batch(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Raed", "Emily Henry"))
+    changed = store.update_rows([
+        ("Beach Raed", "Emily Henry", {'title': 'Beach Read'}),
+        ("Beach Read", "Emily Henry", {'tags': 'romance'}),
+        ("Beach Raed", "Emily Henry", {'tags': 'stale'}),
+    ])
+    assert changed == 2
+    row = rows_by_title(make_store(tmp_path))["Beach Read"]
+    assert row['tags'] == 'romance'
+
+def test_compact_folds_the_journal_into_the_csv(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Raed", "Emily Henry"), ("Book Lovers", "Emily Henry"))
+    store.update("Beach Raed", "Emily Henry", {'title': 'Beach Read'})
+    store.update("Book Lovers", "Emily Henry", {'tags': 'romance'})
+    before = store.all_rows()
+
+    assert store.compact()
+    assert not os.path.exists(store.journal_path)
+    assert not store.compact()
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.all_rows() == before
+    assert reloaded.contains("Beach Read", "Emily Henry")
+    assert rows_by_title(reloaded)["Book Lovers"]['tags'] == 'romance'
+
+def test_journal_compacts_once_it_grows_past_the_limit(tmp_path):
+    store = make_store(tmp_path, journal_compact_bytes=1)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    store.update("Beach Read", "Emily Henry", {'tags': 'romance'})
+    assert not os.path.exists(store.journal_path)
+    assert rows_by_title(make_store(tmp_path))["Beach Read"]['tags'] == 'romance'
+
+def test_rows_appended_by_another_process_are_picked_up(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert len(store) == 1
+    other = make_store(tmp_path)
+    add_books(other, ("Book Lovers", "Emily Henry"))
+    other.update("Beach Read", "Emily Henry", {'title': 'Beach Read (Special Edition)'})
+    assert store.contains("Book Lovers", "Emily Henry")
+    assert store.contains("Beach Read (Special Edition)", "Emily Henry")
+    assert not store.contains("Beach Read", "Emily Henry")
+
+def make_sqlite_store(tmp_path):
+    return SQLiteBookStore(str(tmp_path / "book_mentions.db"), str(tmp_path / "book_mentions.csv"))
+
+def test_sqlite_store_imports_an_existing_csv_once(tmp_path):
+    add_books(make_store(tmp_path), ("Beach Read", "Emily Henry"))
+    store = make_sqlite_store(tmp_path)
+    assert store.contains("Beach Read", "Emily Henry")
+    add_books(store, ("Book Lovers", "Emily Henry"))
+    assert len(make_sqlite_store(tmp_path)) == 2
+
+def test_cleared_sqlite_store_does_not_reimport_its_export(tmp_path):
+    store = make_sqlite_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"), ("Book Lovers", "Emily Henry"))
+    store.export_csv()
+    store.clear()
+    assert len(store) == 0
+    assert len(make_sqlite_store(tmp_path)) == 0
+
+def rewrite_csv(store, text):
+    stat = os.stat(store.csv_path)
+    with open(store.csv_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    # Make sure the mtime moves even on filesystems with coarse timestamps
+    os.utime(store.csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_same_size_edit_outside_the_bot_is_noticed(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert len(store) == 1
+    with open(store.csv_path, encoding='utf-8') as f:
+        text = f.read()
+    rewrite_csv(store, text.replace("Beach Read", "Beach Raed"))
+    assert store.contains("Beach Raed", "Emily Henry")
+    assert not store.contains("Beach Read", "Emily Henry")
+
+def test_longer_rewrite_is_not_read_as_an_append(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert len(store) == 1
+    with open(store.csv_path, encoding='utf-8') as f:
+        header = f.readline()
+    rewrite_csv(store, header + "Book Lovers,Emily Henry\r\nPeople We Meet on Vacation,Emily Henry\r\n")
+    assert not store.contains("Beach Read", "Emily Henry")
+    assert len(store) == 2
+
+def test_rows_written_to_an_empty_csv_are_picked_up(tmp_path):
+    open(tmp_path / "book_mentions.csv", 'w').close()
+    store = make_store(tmp_path)
+    assert len(store) == 0
+    add_books(make_store(tmp_path), ("Beach Read", "Emily Henry"))
+    assert store.contains("Beach Read", "Emily Henry")
+
+def test_buffered_writer_commits_on_its_own_after_batch_seconds(tmp_path):
+    store = make_store(tmp_path)
+    writer = BufferedBookWriter(store, batch_rows=100, batch_seconds=0.1)
+    assert writer.add({'title': "Beach Read", 'author': "Emily Henry"})
+    assert not store.contains("Beach Read", "Emily Henry")
+    deadline = time.monotonic() + 5
+    while not store.contains("Beach Read", "Emily Henry") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert store.contains("Beach Read", "Emily Henry")
+    assert writer.stats['commits'] == 1
+
+def test_buffered_writer_rekeys_a_renamed_pending_row(tmp_path):
+    store = make_store(tmp_path)
+    writer = BufferedBookWriter(store, batch_rows=100, batch_seconds=60)
+    writer.add({'title': "Beach Raed", 'author': "Emily Henry"})
+    assert writer.update("Beach Raed", "Emily Henry", {'title': "Beach Read"})
+    assert writer.contains("Beach Read", "Emily Henry")
+    assert not writer.contains("Beach Raed", "Emily Henry")
+    assert not writer.add({'title': "Beach Read", 'author': "Emily Henry"})
+    writer.commit()
+    assert list(rows_by_title(store)) == ["Beach Read"]
+
+def test_rename_does_not_apply_to_a_row_added_later_under_the_old_key(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    store.update("Beach Read", "Emily Henry", {'title': 'Book Lovers'})
+    assert add_books(store, ("Beach Read", "Emily Henry")) == 1
+    store.update("Beach Read", "Emily Henry", {'tags': 'romance'})
+
+    for reader in (store, make_store(tmp_path)):
+        assert [(row['title'], row['tags']) for row in reader.all_rows()] == [("Book Lovers", ''), ("Beach Read", 'romance')]
+        assert reader.contains("Beach Read", "Emily Henry")
+        assert reader.contains("Book Lovers", "Emily Henry")
+    os.remove(store.snapshot_path)
+    assert make_store(tmp_path).contains("Beach Read", "Emily Henry")
+    store.compact()
+    assert [row['title'] for row in make_store(tmp_path).all_rows()] == ["Book Lovers", "Beach Read"]
+
+def test_rename_and_append_by_another_process_are_replayed_in_order(tmp_path):
+    store = make_store(tmp_path)
+    add_books(store, ("Beach Read", "Emily Henry"))
+    assert len(store) == 1
+    other = make_store(tmp_path)
+    other.update("Beach Read", "Emily Henry", {'title': 'Book Lovers'})
+    add_books(other, ("Beach Read", "Emily Henry"))
+    assert store.contains("Beach Read", "Emily Henry")
+    assert store.contains("Book Lovers", "Emily Henry")
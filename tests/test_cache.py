@@ -0,0 +1,139 @@
+import threading
+import time
+import pytest
+from handlers.web_search import cache as cache_module
+from handlers.web_search.cache import EnrichmentCache, cached_lookup, lookup_failed, cache_stats, cache_stats_since, MISSING
+
+BOOK = {'title': 'Beach Read', 'author': 'Emily Henry', 'tags': ['romance']}
+FOLLOWERS = 5
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    enrichment_cache = EnrichmentCache(str(tmp_path / "enrichment_cache.db"), 3600, 3600, 1000)
+    monkeypatch.setattr(cache_module, 'get_enrichment_cache', lambda: enrichment_cache)
+    monkeypatch.setattr(cache_module, 'CLAIM_POLL_SECONDS', 0.01)
+    return enrichment_cache
+
+def other_process(cache):
+    # A second connection to the same database, as another bot process would have
+    return EnrichmentCache(cache.path, 3600, 3600, 1000)
+
+def run_threads(target, count):
+    results = [None] * count
+
+    def run(i):
+        results[i] = target()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_concurrent_lookups_share_one_call(cache):
+    calls = []
+    release = threading.Event()
+
+    @cached_lookup('test')
+    def lookup(title, author):
+        calls.append(title)
+        release.wait(5)
+        return dict(BOOK)
+
+    before = dict(cache_stats)
+    threads, results = run_threads(lambda: lookup("Beach Read", "Emily Henry"), FOLLOWERS + 1)
+    time.sleep(0.2)  # let every thread join the flight
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == BOOK for result in results)
+    # Callers add their own fields, so none of them may share a dict
+    assert len({id(result) for result in results}) == len(results)
+    assert cache_stats_since(before)['coalesced'] == FOLLOWERS
+    assert cache.get('test', "Beach Read", "Emily Henry") == BOOK
+
+def test_followers_look_up_again_when_the_leader_fails(cache):
+    calls = []
+    release = threading.Event()
+
+    @cached_lookup('test')
+    def lookup(title, author):
+        calls.append(title)
+        if len(calls) == 1:
+            release.wait(5)
+            lookup_failed()
+            return None
+        return dict(BOOK)
+
+    threads, results = run_threads(lambda: lookup("Beach Read", "Emily Henry"), 3)
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(None) == 1
+    assert results.count(BOOK) == 2
+    # The first follower's result is cached, so the other may not need its own call
+    assert 2 <= len(calls) <= 3
+
+def test_failed_lookups_are_not_cached(cache):
+    @cached_lookup('test')
+    def lookup(title, author):
+        lookup_failed()
+        return None
+
+    assert lookup("Beach Read", "Emily Henry") is None
+    assert cache.get('test', "Beach Read", "Emily Henry") is MISSING
+
+def test_waits_for_a_lookup_claimed_by_another_process(cache):
+    other = other_process(cache)
+    assert other.claim('test', "Beach Read", "Emily Henry")
+    calls = []
+
+    @cached_lookup('test')
+    def lookup(title, author):
+        calls.append(title)
+        return None
+
+    def answer():
+        time.sleep(0.1)
+        other.put('test', "Beach Read", "Emily Henry", BOOK)
+        other.release_claim('test', "Beach Read", "Emily Henry")
+    threading.Thread(target=answer).start()
+
+    before = dict(cache_stats)
+    assert lookup("Beach Read", "Emily Henry") == BOOK
+    assert calls == []
+    assert cache_stats_since(before)['coalesced'] == 1
+
+def test_looks_up_itself_when_the_other_process_gives_up(cache):
+    other = other_process(cache)
+    assert other.claim('test', "Beach Read", "Emily Henry")
+
+    @cached_lookup('test')
+    def lookup(title, author):
+        return dict(BOOK)
+
+    # The other process released its claim without caching anything (its lookup failed)
+    threading.Timer(0.1, other.release_claim, ('test', "Beach Read", "Emily Henry")).start()
+    assert lookup("Beach Read", "Emily Henry") == BOOK
+
+def test_looks_up_itself_when_the_claim_is_never_answered(cache, monkeypatch):
+    monkeypatch.setattr(cache_module, 'CLAIM_WAIT_SECONDS', 0.1)
+    other = other_process(cache)
+    assert other.claim('test', "Beach Read", "Emily Henry")
+
+    @cached_lookup('test')
+    def lookup(title, author):
+        return dict(BOOK)
+
+    assert lookup("Beach Read", "Emily Henry") == BOOK
+    assert cache.get('test', "Beach Read", "Emily Henry") == BOOK
+
+def test_stale_claims_can_be_taken_over(cache, monkeypatch):
+    other = other_process(cache)
+    assert other.claim('test', "Beach Read", "Emily Henry")
+    assert not cache.claim('test', "Beach Read", "Emily Henry")
+    # A process that died mid-lookup never releases its claim
+    monkeypatch.setattr(cache_module, 'CLAIM_TTL_SECONDS', -1)
+    assert cache.claim('test', "Beach Read", "Emily Henry")
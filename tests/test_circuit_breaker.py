@@ -0,0 +1,48 @@
+import pytest
+from handlers.web_search.circuit_breaker import CircuitBreaker, ProviderUnavailable, CLOSED, OPEN, HALF_OPEN
+
+def open_breaker():
+    breaker = CircuitBreaker('test', failure_threshold=2, cooldown_seconds=0)
+    for _ in range(2):
+        breaker.record(False, breaker.before_request())
+    assert breaker.state == OPEN
+    return breaker
+
+def test_opens_after_consecutive_failures_and_closes_on_a_good_probe():
+    breaker = open_breaker()
+    probe = breaker.before_request()
+    assert probe is not None and breaker.state == HALF_OPEN
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_request()
+    breaker.record(True, probe)
+    assert breaker.state == CLOSED
+    assert breaker.before_request() is None
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = open_breaker()
+    breaker.record(False, breaker.before_request())
+    assert breaker.state == OPEN
+
+def test_requests_from_before_the_breaker_opened_dont_end_the_probe():
+    breaker = CircuitBreaker('test', failure_threshold=2, cooldown_seconds=0)
+    slow = breaker.before_request()
+    for _ in range(2):
+        breaker.record(False, breaker.before_request())
+    probe = breaker.before_request()
+    assert breaker.state == HALF_OPEN
+
+    # The slow request started while the breaker was closed and finishes during the probe
+    breaker.record(True, slow)
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_request()
+    breaker.record(False, slow)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(True, probe)
+    assert breaker.state == CLOSED
+
+def test_probe_that_was_not_sent_lets_another_one_through():
+    breaker = open_breaker()
+    breaker.record(None, breaker.before_request())
+    assert breaker.before_request() is not None
@@ -0,0 +1,71 @@
+import time
+import pytest
+from handlers.double_check_state import DoubleCheckState, MAX_RETRY_DAYS
+
+RETRY_HOURS = 6
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "double_check_state.db")
+
+def row_state(state, title, author):
+    return state.rows()[(title.lower(), author.lower())]
+
+def test_interrupted_run_is_resumed(state_path):
+    state = DoubleCheckState(state_path)
+    started_at, rows_done, resumed = state.start_run('missing')
+    assert (rows_done, resumed) == (0, False)
+    state.checkpoint('missing', [("Beach Read", "Emily Henry", ['openlibrary'], 'updated'),
+                                 ("Book Lovers", "Emily Henry", ['openlibrary'], 'not_found')])
+
+    # The process died before finish_run; the next run of the same mode picks it up
+    reopened = DoubleCheckState(state_path)
+    assert reopened.start_run('missing') == (started_at, 2, True)
+    attempted = {key for key, row in reopened.rows().items() if row['last_attempt'] >= started_at}
+    assert attempted == {("beach read", "emily henry"), ("book lovers", "emily henry")}
+    # Runs of another mode are tracked separately
+    assert reopened.start_run('full')[1:] == (0, False)
+
+def test_finished_run_starts_fresh(state_path):
+    state = DoubleCheckState(state_path)
+    started_at, _, _ = state.start_run('missing')
+    state.checkpoint('missing', [("Beach Read", "Emily Henry", ['openlibrary'], 'updated')])
+    state.finish_run('missing')
+    new_started_at, rows_done, resumed = state.start_run('missing')
+    assert (rows_done, resumed) == (0, False)
+    assert new_started_at >= started_at
+
+def test_backoff_doubles_after_each_failed_attempt(state_path):
+    state = DoubleCheckState(state_path, retry_hours=RETRY_HOURS)
+    state.start_run('missing')
+    delays = []
+    for _ in range(3):
+        before = time.time()
+        state.checkpoint('missing', [("Unknown", "Nobody", ['openlibrary', 'googlebooks'], 'not_found')])
+        row = row_state(state, "Unknown", "Nobody")
+        delays.append(row['next_attempt'] - before)
+    hour = 3600
+    assert [round(delay / hour) for delay in delays] == [RETRY_HOURS, 2 * RETRY_HOURS, 4 * RETRY_HOURS]
+    assert row['failures'] == 3
+    assert row['providers'] == 'openlibrary,googlebooks'
+
+def test_backoff_is_capped(state_path):
+    state = DoubleCheckState(state_path, retry_hours=RETRY_HOURS)
+    state.start_run('missing')
+    for _ in range(20):
+        state.checkpoint('missing', [("Unknown", "Nobody", ['openlibrary'], 'unchanged')])
+    row = row_state(state, "Unknown", "Nobody")
+    assert row['next_attempt'] - row['last_attempt'] == pytest.approx(MAX_RETRY_DAYS * 86400)
+
+def test_update_resets_and_error_keeps_the_backoff_count(state_path):
+    state = DoubleCheckState(state_path, retry_hours=RETRY_HOURS)
+    state.start_run('missing')
+    state.checkpoint('missing', [("Beach Read", "Emily Henry", ['openlibrary'], 'not_found')])
+    state.checkpoint('missing', [("Beach Read", "Emily Henry", ['openlibrary_isbn'], 'error')])
+    row = row_state(state, "Beach Read", "Emily Henry")
+    # A failed request says nothing about the book: retry next run, but keep counting
+    assert (row['outcome'], row['failures'], row['next_attempt']) == ('error', 1, 0)
+
+    state.checkpoint('missing', [("Beach Read", "Emily Henry", ['openlibrary'], 'updated')])
+    row = row_state(state, "Beach Read", "Emily Henry")
+    assert (row['outcome'], row['failures'], row['next_attempt']) == ('updated', 0, 0)
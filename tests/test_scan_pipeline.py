@@ -0,0 +1,52 @@
+import random
+import time
+import pytest
+from scan_pipeline import ScanPipeline, Lookup
+
+def slow_lookup(value):
+    # Later items tend to finish first, so out-of-order completion is the norm
+    time.sleep(random.uniform(0, 0.01))
+    return value * 10
+
+def test_writer_keeps_extraction_order():
+    written = []
+
+    def extract(item):
+        yield Lookup(slow_lookup, (item,), written.append)
+        yield lambda: written.append(f"commit {item}")
+
+    pipeline = ScanPipeline(workers=8, queue_depth=4)
+    pipeline.run(range(30), fetch=lambda item: item, extract=extract)
+
+    expected = []
+    for item in range(30):
+        expected += [item * 10, f"commit {item}"]
+    assert written == expected
+    assert pipeline.stats['enrich'].count == 30
+    assert pipeline.stats['write'].count == 60
+
+def test_lookup_errors_go_to_on_error_and_the_scan_continues():
+    written, errors = [], []
+
+    def lookup(item):
+        if item == 2:
+            raise ValueError("lookup failed")
+        return item
+
+    pipeline = ScanPipeline(workers=4)
+    pipeline.run(range(5), fetch=lambda item: item,
+                 extract=lambda item: [Lookup(lookup, (item,), written.append)], on_error=errors.append)
+    assert written == [0, 1, 3, 4]
+    assert [str(e) for e in errors] == ["lookup failed"]
+
+def test_extract_errors_are_raised_after_the_queued_tasks_are_written():
+    written = []
+
+    def extract(item):
+        if item == 3:
+            raise RuntimeError("bad item")
+        return [lambda: written.append(item)]
+
+    with pytest.raises(RuntimeError, match="bad item"):
+        ScanPipeline().run(range(10), fetch=lambda item: item, extract=extract)
+    assert written == [0, 1, 2]
@@ -11,6 +11,12 @@ import zipfile
 import io
 import subprocess
 import sys
+import hashlib
+from book_store import get_book_store
+from search_index import SearchIndex
+from tag_index import TagIndex, LGBT_TAGS, iter_row_ids
+from handlers.web_search.circuit_breaker import provider_health, PROVIDER_LABELS
+from handlers.web_search.provider_registry import provider_stats
 try:
     from gpiozero import CPUTemperature, PWMOutputDevice
 except ImportError:
@@ -379,6 +385,14 @@ def dashboard():
         #     fan_speed = None
         # Alternatively, try to read from /sys/class/hwmon/hwmon*/fan*_input
         fan_speed = get_fan_speed()
+    # Enrichment providers' circuit breaker state, as saved by the bot processes
+    providers = provider_health()
+    for p in providers:
+        p['until_text'] = time.strftime('%H:%M', time.localtime(p['until']))
+    # Lookup stats recorded by the provider registry, in the order `provider_order = auto` would use
+    lookup_stats = provider_stats()
+    for p in lookup_stats:
+        p['label'] = PROVIDER_LABELS.get(p['provider'], p['provider'])
     return render_template(
         'dashboard.html',
         cpu_percent=cpu_percent,
@@ -386,7 +400,9 @@ def dashboard():
         mem_used=mem_used,
         mem_total=mem_total,
         temp=temp,
-        fan_speed=fan_speed
+        fan_speed=fan_speed,
+        providers=providers,
+        lookup_stats=lookup_stats
     )
 
 @app.route('/api/stats')
@@ -400,19 +416,150 @@ def api_stats():
         else:
             return jsonify(stats_history)
 
+def get_mentions_store():
+    return get_book_store(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book_mentions.csv'))
+
+# Parsed book mentions, kept until the data files' size/mtime signature changes
+book_mentions_cache = {'signature': None, 'rows': []}
+book_mentions_cache_lock = threading.Lock()
+book_search_index = SearchIndex()
+book_tag_index = TagIndex()
+BOOK_MENTIONS_DEFAULT_LIMIT = 50
+BOOK_MENTIONS_MAX_LIMIT = 500
+
+def get_cached_book_mentions():
+    store = get_mentions_store()
+    signature = store.data_signature()
+    with book_mentions_cache_lock:
+        if book_mentions_cache['signature'] != signature:
+            book_mentions_cache['rows'] = store.all_rows()
+            book_mentions_cache['signature'] = signature
+            # Only rows that are new or changed get re-tokenized
+            book_search_index.sync(book_mentions_cache['rows'])
+            book_tag_index.sync([row.get('tags') for row in book_mentions_cache['rows']])
+        return book_mentions_cache['rows']
+
+def book_mentions_etag(signature):
+    # The response depends on the data and on the query (page + filters)
+    key = f"{signature}|{request.query_string.decode('utf-8', 'replace')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def split_param(name):
+    return [v.strip().lower() for v in request.args.get(name, '').split(',') if v.strip()]
+
+def filter_book_mentions(rows):
+    subreddits = set(split_param('subreddit'))
+    tags = split_param('tags')
+    lgbt_only = request.args.get('lgbt', '').lower() in ('1', 'true', 'yes')
+    steam_ratings = set(split_param('steam_rating'))
+    date_from = request.args.get('date_from', '').strip()
+    date_to = request.args.get('date_to', '').strip()
+    if not (subreddits or tags or lgbt_only or steam_ratings or date_from or date_to):
+        return rows
+    # Tag filters are bitmap operations on the tag index rather than per-row string parsing
+    row_ids = range(len(rows))
+    if tags or lgbt_only:
+        mask = book_tag_index.rows_with_any(tags) if tags else -1
+        if lgbt_only:
+            mask &= book_tag_index.rows_with_any(LGBT_TAGS)
+        row_ids = [row_id for row_id in iter_row_ids(mask) if row_id < len(rows)]
+    filtered = []
+    for row_id in row_ids:
+        row = rows[row_id]
+        if subreddits and (row.get('subreddit') or '').strip().lower() not in subreddits:
+            continue
+        if steam_ratings and (row.get('steam_rating') or '').strip().lower() not in steam_ratings:
+            continue
+        if date_from or date_to:
+            # ISO dates compare correctly as strings; fall back to when the row was added
+            row_date = (row.get('reddit_created_date') or row.get('datetime_added') or '')[:10]
+            if not row_date or (date_from and row_date < date_from) or (date_to and row_date > date_to):
+                continue
+        filtered.append(row)
+    return filtered
+
 @app.route('/api/book_mentions')
 def api_book_mentions():
-    csv_path = os.path.join(os.path.dirname(__file__), 'book_mentions.csv')
-    if not os.path.exists(csv_path):
+    """
+    One page of book mentions.
+    Query params: offset, limit, subreddit, tags, steam_rating (comma-separated),
+    lgbt (1 = only LGBT-tagged books), date_from / date_to (YYYY-MM-DD). Supports If-None-Match for polling clients.
+    """
+    etag = book_mentions_etag(get_mentions_store().data_signature())
+    if request.if_none_match.contains(etag):
+        # Nothing changed on disk: answer without re-reading the file
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    rows = get_cached_book_mentions()
+    if not rows:
         return jsonify({'error': 'CSV file not found'}), 404
-    with open(csv_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows = list(reader)
-    return jsonify(rows)
+    offset = max(0, request.args.get('offset', default=0, type=int))
+    limit = request.args.get('limit', default=BOOK_MENTIONS_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, BOOK_MENTIONS_MAX_LIMIT))
+    filtered = filter_book_mentions(rows)
+    response = jsonify({
+        'rows': filtered[offset:offset + limit],
+        'total': len(filtered),
+        'offset': offset,
+        'limit': limit,
+        'columns': list(rows[0].keys())
+    })
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/tags')
+def api_tags():
+    """Tag facet: {tag: number of books}, most common first."""
+    etag = book_mentions_etag(get_mentions_store().data_signature())
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    get_cached_book_mentions()
+    counts = book_tag_index.counts()
+    response = jsonify({
+        'tags': dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))),
+        'lgbt': bin(book_tag_index.rows_with_any(LGBT_TAGS)).count('1')
+    })
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/search')
+def api_search():
+    """
+    Ranked full-text search over title, author and tags.
+    Query params: q (terms match as prefixes), offset, limit.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing q parameter'}), 400
+    etag = book_mentions_etag(get_mentions_store().data_signature())
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    rows = get_cached_book_mentions()
+    offset = max(0, request.args.get('offset', default=0, type=int))
+    limit = request.args.get('limit', default=BOOK_MENTIONS_DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, BOOK_MENTIONS_MAX_LIMIT))
+    started = time.perf_counter()
+    results, total = book_search_index.search_rows(query, offset, limit)
+    response = jsonify({
+        'rows': results,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'columns': list(rows[0].keys()) if rows else [],
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+    response.set_etag(etag)
+    return response
 
 @app.route('/download/book_mentions')
 def download_book_mentions():
-    csv_path = os.path.join(os.path.dirname(__file__), 'book_mentions.csv')
+    # With the SQLite backend the CSV only exists as an export, so generate it here
+    csv_path = get_mentions_store().export_csv()
     if not os.path.exists(csv_path):
         return 'CSV file not found', 404
     return send_file(csv_path, as_attachment=True, download_name='book_mentions.csv')